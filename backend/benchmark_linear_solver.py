@@ -0,0 +1,56 @@
+"""
+Compare the closed-form linear solver with Adam training.
+
+Run from the backend folder:
+    python benchmark_linear_solver.py [csv file] [ridge l2]
+
+Trains SalesPredictionModel on the same split three ways (Adam for 200
+epochs, exact least squares, ridge) and prints MAE, RMSE, R2 and training
+time for each. Exits with status 1 if least squares is worse than Adam on
+any metric, so it can be used as a check after changing the model.
+"""
+import sys
+import time
+
+from sales_prediction import SalesPredictionModel
+
+# Adam stops short of the exact optimum; allow for float32 rounding on top of that
+TOLERANCE = 1e-3
+
+
+def run(file_path, solver, l2=0.0):
+    predictor = SalesPredictionModel()
+    X, y = predictor.load_data(file_path)
+    started = time.perf_counter()
+    _, X_test, y_test = predictor.train_model(X, y, solver=solver, l2=l2)
+    seconds = time.perf_counter() - started
+    return predictor.evaluate_model(X_test, y_test), seconds
+
+
+def main(argv):
+    file_path = argv[0] if argv else "new_blk8_cafe_sales_2024.csv"
+    l2 = float(argv[1]) if len(argv) > 1 else 1.0
+
+    results = {
+        "sgd (Adam, 200 epochs)": run(file_path, "sgd"),
+        "lstsq": run(file_path, "lstsq"),
+        f"ridge (l2={l2:g})": run(file_path, "lstsq", l2)
+    }
+
+    print(f"\n{'solver':<24}{'MAE':>10}{'RMSE':>10}{'R2':>10}{'seconds':>10}")
+    for name, (metrics, seconds) in results.items():
+        print(f"{name:<24}{metrics['MAE']:>10.3f}{metrics['RMSE']:>10.3f}{metrics['R2']:>10.4f}{seconds:>10.3f}")
+
+    sgd, _ = results["sgd (Adam, 200 epochs)"]
+    exact, _ = results["lstsq"]
+    ok = (
+        exact["MAE"] <= sgd["MAE"] * (1 + TOLERANCE)
+        and exact["RMSE"] <= sgd["RMSE"] * (1 + TOLERANCE)
+        and exact["R2"] >= sgd["R2"] - TOLERANCE
+    )
+    print("\n✅ least squares matches or beats Adam" if ok else "\n❌ least squares is worse than Adam")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+"""
+Compare batched permutation importance with scikit-learn's.
+
+Run from the backend folder:
+    python benchmark_permutation_importance.py [model dir] [csv file] [n_repeats]
+
+Scores the saved model (../sales_prediction_model by default) on the cafe
+CSV both ways and prints the wall-clock time of each, the largest difference
+in mean importance and the top features from each method. The shuffles are
+random, so values differ slightly between the methods, but the ranking should
+agree.
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+from forecast_pipeline import build_feature_matrix, predict_frame
+from model_bundle import load_artifacts
+from feature_importance import permutation_importance
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(argv):
+    model_dir = argv[0] if argv else os.path.join(BACKEND_DIR, '..', 'sales_prediction_model')
+    csv_file = argv[1] if len(argv) > 1 else os.path.join(BACKEND_DIR, 'new_blk8_cafe_sales_2024.csv')
+    n_repeats = int(argv[2]) if len(argv) > 2 else 10
+
+    bundle = load_artifacts(model_dir)
+    model = bundle.build_model()
+    df = pd.read_csv(csv_file)
+    X = build_feature_matrix(df, bundle.feature_names)
+    y = df['Total Sales']
+
+    from sklearn.inspection import permutation_importance as sklearn_permutation_importance
+    from sklearn.metrics import r2_score
+
+    def r2(estimator, X, y):
+        """R² of the Keras model on unscaled rows, as a scikit-learn scorer"""
+        return r2_score(y, predict_frame(X, estimator, bundle.scaler_X, bundle.scaler_y))
+
+    started = time.perf_counter()
+    reference = sklearn_permutation_importance(
+        model, X, y, scoring=r2, n_repeats=n_repeats, random_state=42, n_jobs=-1
+    )
+    sklearn_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = permutation_importance(model, bundle.scaler_X, bundle.scaler_y, X, y, n_repeats=n_repeats)
+    batched_seconds = time.perf_counter() - started
+
+    table = pd.DataFrame({
+        'Feature': bundle.feature_names,
+        'sklearn': reference.importances_mean,
+        'batched': batched.importances_mean
+    }).sort_values('batched', ascending=False)
+
+    print(f"\n{len(X):,} rows, {len(bundle.feature_names)} features, {n_repeats} repeats")
+    print(f"sklearn permutation_importance (n_jobs=-1): {sklearn_seconds:.2f}s")
+    print(f"batched permutation_importance:             {batched_seconds:.2f}s")
+    print(f"largest difference in mean importance: {(table['sklearn'] - table['batched']).abs().max():.4f}")
+    print(f"ranking correlation (Spearman): {table['sklearn'].corr(table['batched'], method='spearman'):.3f}")
+    print("\n" + table.head(8).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+"""
+Measure how long a worker takes to import routes.py and become ready.
+
+Run from the backend folder:
+    python benchmark_startup.py
+
+Reports three things, each in a fresh interpreter:
+1. `python -X importtime -c "import routes"`: total import time and the slowest modules
+2. Lazy boot: time until /healthz answers and until the background model load finishes
+3. Eager boot: the previous behaviour, where TensorFlow, pandas, joblib and the
+   Supabase client were imported and the model loaded before routes.py finished importing
+"""
+import os
+import sys
+import json
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ["tensorflow", "keras", "pandas", "joblib", "sklearn", "supabase"]
+
+LAZY_BOOT = """
+import json, time
+t0 = time.perf_counter()
+import routes
+t1 = time.perf_counter()
+status = routes.app.test_client().get("/healthz").status_code
+t2 = time.perf_counter()
+routes.model_service.wait()
+t3 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "healthz_s": t2 - t0, "healthz_status": status,
+                  "ready_s": t3 - t0, "model_state": routes.model_service.state}))
+"""
+
+EAGER_BOOT = """
+import json, time
+t0 = time.perf_counter()
+import routes
+import pandas, joblib, tensorflow
+routes.supabase_client.table
+try:
+    routes.model_service.load()
+except Exception:
+    pass
+t1 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "healthz_s": t1 - t0, "ready_s": t1 - t0,
+                  "model_state": routes.model_service.state}))
+"""
+
+
+def run_python(args):
+    return subprocess.run([sys.executable] + args, cwd=BACKEND_DIR,
+                          capture_output=True, text=True, check=True)
+
+
+# Keep the background model load from interleaving its imports with the profile
+IMPORT_ONLY = ("import model_service; model_service.ModelService.start = lambda self: None; "
+               "import routes")
+
+
+def import_profile(top=10):
+    """Parse -X importtime output into (routes import seconds, slowest direct imports, heavy modules seen)"""
+    result = run_python(["-X", "importtime", "-c", IMPORT_ONLY])
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        head, cumulative_us, name = line.split("|", 2)
+        name = name[1:]
+        rows.append((name.strip(), len(name) - len(name.lstrip()), int(cumulative_us.strip())))
+
+    # Children are printed before their parent, two spaces deeper
+    end = next(i for i, row in enumerate(rows) if row[0] == "routes")
+    _, routes_indent, routes_us = rows[end]
+    children = []
+    for name, indent, cumulative in reversed(rows[:end]):
+        if indent <= routes_indent:
+            break
+        if indent == routes_indent + 2:
+            children.append((name, cumulative))
+
+    slowest = sorted(children, key=lambda r: r[1], reverse=True)[:top]
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+    return routes_us / 1e6, slowest, heavy
+
+
+def boot(snippet):
+    return json.loads(run_python(["-c", snippet]).stdout.strip().splitlines()[-1])
+
+
+def main():
+    total_s, slowest, heavy = import_profile()
+    print("Import profile (python -X importtime, background model load disabled)")
+    print(f"  import routes: {total_s:.3f}s")
+    print(f"  heavy modules imported: {', '.join(heavy) if heavy else 'none'}")
+    for name, cumulative in slowest:
+        print(f"  {cumulative / 1e6:8.3f}s  {name}")
+
+    lazy = boot(LAZY_BOOT)
+    eager = boot(EAGER_BOOT)
+
+    print("\nBoot time                 lazy (now)    eager (before)")
+    print(f"  import routes          {lazy['import_s']:9.3f}s    {eager['import_s']:9.3f}s")
+    print(f"  /healthz answers       {lazy['healthz_s']:9.3f}s    {eager['healthz_s']:9.3f}s")
+    print(f"  model ready (/readyz)  {lazy['ready_s']:9.3f}s    {eager['ready_s']:9.3f}s")
+    print(f"  model state            {lazy['model_state']:>10}    {eager['model_state']:>10}")
+
+
+if __name__ == "__main__":
+    main()
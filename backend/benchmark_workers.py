@@ -0,0 +1,107 @@
+"""
+Measure memory per gunicorn worker with and without the preload-and-fork mode.
+
+Run from the backend folder (Linux only, reads /proc):
+    python benchmark_workers.py [workers]
+
+Starts `gunicorn -c gunicorn.conf.py routes:app` twice, once with MODEL_PRELOAD=0
+(every worker imports TensorFlow and loads the model itself) and once with
+MODEL_PRELOAD=1 (the master preloads, workers fork from it). After every worker
+reports ready it prints, per worker:
+- RSS: resident memory, counting shared pages in full
+- PSS: proportional share, shared pages divided between the processes using them
+- Private: memory only this worker uses (what each extra worker really costs)
+"""
+import os
+import sys
+import time
+import signal
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PORT = 8765
+
+
+def memory_kb(pid):
+    """Rss, Pss and Private_* totals from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def children_of(ppid):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name can contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == ppid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def wait_until_ready(workers, timeout=180):
+    """Every worker answers /readyz with 200 (requests are spread over the workers)"""
+    deadline = time.time() + timeout
+    streak = 0
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/readyz", timeout=5) as response:
+                streak = streak + 1 if response.status == 200 else 0
+        except Exception:
+            streak = 0
+        if streak >= workers * 5:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def measure(preload, workers):
+    env = dict(os.environ, MODEL_PRELOAD="1" if preload else "0", WEB_CONCURRENCY=str(workers))
+    started = time.time()
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{PORT}", "routes:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_ready(workers):
+            raise RuntimeError("workers did not become ready")
+        ready_s = time.time() - started
+        return ready_s, memory_kb(master.pid), [memory_kb(pid) for pid in children_of(master.pid)]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+
+
+def report(label, ready_s, master, workers):
+    print(f"\n{label} (all workers ready after {ready_s:.1f}s)")
+    print(f"  {'process':<10}{'RSS MB':>10}{'PSS MB':>10}{'Private MB':>12}")
+    print(f"  {'master':<10}{master['rss'] / 1024:>10.1f}{master['pss'] / 1024:>10.1f}{master['private'] / 1024:>12.1f}")
+    for i, mem in enumerate(workers, 1):
+        print(f"  {'worker ' + str(i):<10}{mem['rss'] / 1024:>10.1f}{mem['pss'] / 1024:>10.1f}{mem['private'] / 1024:>12.1f}")
+    total_pss = (master["pss"] + sum(mem["pss"] for mem in workers)) / 1024
+    print(f"  total PSS: {total_pss:.1f} MB")
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    report("MODEL_PRELOAD=0 (before)", *measure(False, workers))
+    report("MODEL_PRELOAD=1 (preload and fork)", *measure(True, workers))
+
+
+if __name__ == "__main__":
+    main()
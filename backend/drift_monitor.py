@@ -0,0 +1,233 @@
+"""
+Feature drift: does an upload still look like the data the model learned from?
+
+The reference is the serving model's own training profile:
+- scaler_X holds the training mean and variance of every feature; each
+  upload's means and variances are compared with them as a mean shift (in
+  training standard deviations) and a variance ratio
+- 0/1 features (Holiday, Category_*, Weather_*) are fully described by their
+  training mean p (their variance is exactly p (1 - p)), so they also get a
+  PSI and KS score against Bernoulli(p)
+- other features get PSI and KS against the training quantile bins stored in
+  the bundle metadata ("feature_profile", see record_training_profile) when the
+  bundle has them; older bundles only get the moment checks
+
+All scores come from one vectorized pass over the upload's feature matrix:
+every value is binned against its feature's edges at once, and the bin
+counts give the PSI and (binned) KS of every feature together.
+
+Each result is added to the user's drift history (a JSON file per user,
+last DRIFT_HISTORY uploads). A feature drifts when its PSI is above
+PSI_DRIFT, its mean moved more than MEAN_SHIFT standard deviations or its
+variance changed more than VARIANCE_RATIO times. The retrain signal is
+raised when at least DRIFT_MIN_FEATURES features drift in DRIFT_PERSISTENCE
+of the user's last DRIFT_WINDOW uploads checked against the same model
+version, so one unusual file does not raise it on its own.
+"""
+import os
+import re
+import json
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+PROFILE_BINS = 10
+PSI_DRIFT = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.25"))
+MEAN_SHIFT = 0.5
+VARIANCE_RATIO = 2.0
+DRIFT_MIN_ROWS = 100
+DRIFT_MAX_ROWS = 100000  # Larger uploads are scored on a random sample
+DRIFT_MIN_FEATURES = 2
+DRIFT_WINDOW = 3
+DRIFT_PERSISTENCE = 2
+DRIFT_HISTORY = 20
+EPSILON = 1e-4
+
+
+def feature_profile(X, bins=PROFILE_BINS):
+    """Training quantile bins of every non-binary column of X: {feature: {"edges", "fractions"}}"""
+    profile = {}
+    for name in X.columns:
+        values = X[name].to_numpy(dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values) or np.isin(values, (0, 1)).all():
+            continue
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        profile[name] = {"edges": edges.tolist(), "fractions": (counts / len(values)).tolist()}
+    return profile
+
+
+def binary_features(scaler_X):
+    """Features whose training variance is p (1 - p) for their mean p: 0/1 columns"""
+    mean, var = scaler_X.mean_, scaler_X.var_
+    return (mean >= 0) & (mean <= 1) & np.isclose(var, mean * (1 - mean), rtol=0, atol=1e-9)
+
+
+def reference_bins(scaler_X, feature_names, profile=None):
+    """
+    Bin edges (features, width) padded with +inf, expected fractions
+    (features, width + 1) and which features have a reference at all
+    """
+    profile = profile or {}
+    binary = binary_features(scaler_X)
+    width = max([1] + [len(profile[name]["edges"]) for name in feature_names if name in profile])
+
+    edges = np.full((len(feature_names), width), np.inf)
+    expected = np.zeros((len(feature_names), width + 1))
+    has_bins = np.zeros(len(feature_names), dtype=bool)
+    for i, name in enumerate(feature_names):
+        if binary[i]:
+            p = scaler_X.mean_[i]
+            edges[i, 0] = 0.5
+            expected[i, :2] = (1 - p, p)
+        elif name in profile:
+            feature_edges = profile[name]["edges"]
+            edges[i, :len(feature_edges)] = feature_edges
+            expected[i, :len(feature_edges) + 1] = profile[name]["fractions"]
+        else:
+            continue
+        has_bins[i] = True
+    return edges, expected, has_bins
+
+
+def _value(value, digits=4):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def compare(X, scaler_X, feature_names, profile=None, seed=0):
+    """
+    Drift scores of every model feature present in X (a DataFrame of the upload).
+    Returns {"rows", "features": {name: scores}, "drifted": [names], "missing": [names]}.
+    """
+    import pandas as pd
+
+    feature_names = list(feature_names)
+    present = [name for name in feature_names if name in X.columns]
+    columns = [feature_names.index(name) for name in present]
+    values = X[present].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    if len(values) > DRIFT_MAX_ROWS:
+        values = values[np.random.default_rng(seed).choice(len(values), DRIFT_MAX_ROWS, replace=False)]
+
+    # Moments against the scaler's
+    valid = np.isfinite(values)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(values, axis=0) / count
+        var = np.nansum((values - mean) ** 2, axis=0) / count
+        mean_shift = (mean - scaler_X.mean_[columns]) / scaler_X.scale_[columns]
+        variance_ratio = np.where(scaler_X.var_[columns] > 0, var / scaler_X.var_[columns], np.nan)
+
+    # Every value binned against its own feature's edges, all features in one go
+    edges, expected, has_bins = reference_bins(scaler_X, feature_names, profile)
+    edges, expected, has_bins = edges[columns], expected[columns], has_bins[columns]
+    bins = (values[:, :, None] >= edges[None, :, :]).sum(axis=2)
+    width = expected.shape[1]
+    offsets = np.arange(len(present)) * width
+    counts = np.bincount((bins + offsets).ravel(), weights=valid.ravel(), minlength=len(present) * width)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        actual = counts.reshape(len(present), width) / count[:, None]
+
+    a, e = np.maximum(actual, EPSILON), np.maximum(expected, EPSILON)
+    psi = np.where(has_bins, ((a - e) * np.log(a / e)).sum(axis=1), np.nan)
+    ks = np.where(has_bins, np.abs(np.cumsum(actual, axis=1) - np.cumsum(expected, axis=1)).max(axis=1), np.nan)
+
+    with np.errstate(invalid="ignore"):
+        drifted = (psi > PSI_DRIFT) | (np.abs(mean_shift) > MEAN_SHIFT) | (
+            ~binary_features(scaler_X)[columns]
+            & ((variance_ratio > VARIANCE_RATIO) | (variance_ratio < 1 / VARIANCE_RATIO))
+        )
+    drifted &= count > 0
+
+    features = {
+        name: {
+            "mean": _value(mean[i]),
+            "train_mean": _value(scaler_X.mean_[columns[i]]),
+            "mean_shift": _value(mean_shift[i]),
+            "variance_ratio": _value(variance_ratio[i]),
+            "psi": _value(psi[i]),
+            "ks": _value(ks[i]),
+            "drifted": bool(drifted[i])
+        }
+        for i, name in enumerate(present)
+    }
+    return {
+        "rows": int(len(X)),
+        "features": features,
+        "drifted": [name for name, scores in features.items() if scores["drifted"]],
+        "missing": [name for name in feature_names if name not in X.columns]
+    }
+
+
+def history_path(history_dir, user_id):
+    return os.path.join(history_dir, re.sub(r"[^A-Za-z0-9_-]", "_", str(user_id)) + ".json")
+
+
+def load_history(history_dir, user_id):
+    """The user's drift history, oldest first ([] when there is none)"""
+    try:
+        with open(history_path(history_dir, user_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_history(history_dir, user_id, history):
+    """Write the history to a temporary file and rename it into place"""
+    os.makedirs(history_dir, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=history_dir, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            json.dump(history[-DRIFT_HISTORY:], f)
+        os.replace(temporary, history_path(history_dir, user_id))
+    except Exception:
+        os.remove(temporary)
+        raise
+
+
+def retrain_signal(history, model_version):
+    """Whether drift persists across the user's recent uploads checked against model_version"""
+    recent = [entry for entry in history if entry.get("model_version") == model_version][-DRIFT_WINDOW:]
+    drifted_uploads = sum(len(entry["drifted"]) >= DRIFT_MIN_FEATURES for entry in recent)
+    return {
+        "retrain": drifted_uploads >= DRIFT_PERSISTENCE,
+        "drifted_uploads": drifted_uploads,
+        "uploads_checked": len(recent)
+    }
+
+
+def monitor_upload(df, loaded, user_id=None, history_dir=None, file_name=None):
+    """
+    Drift report of an upload against the serving model (a LoadedModel),
+    recorded in the user's history when user_id and history_dir are given.
+    Returns the compare() report plus "model_version" and the retrain signal.
+    """
+    if len(df) < DRIFT_MIN_ROWS:
+        return {"rows": int(len(df)), "checked": False, "reason": f"Fewer than {DRIFT_MIN_ROWS} rows"}
+
+    profile = (loaded.metadata or {}).get("feature_profile")
+    report = compare(df, loaded.scaler_X, loaded.feature_names, profile)
+    entry = {
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+        "file_name": file_name,
+        "model_version": loaded.version,
+        "rows": report["rows"],
+        "drifted": report["drifted"],
+        "scores": {
+            name: {key: scores[key] for key in ("mean_shift", "variance_ratio", "psi", "ks")}
+            for name, scores in report["features"].items()
+        }
+    }
+
+    history = [entry]
+    if user_id and history_dir:
+        history = load_history(history_dir, user_id) + [entry]
+        save_history(history_dir, user_id, history)
+    return {
+        **report,
+        "checked": True,
+        "model_version": loaded.version,
+        "reference": "feature_profile" if profile else "scaler",
+        **retrain_signal(history, loaded.version)
+    }
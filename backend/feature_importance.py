@@ -0,0 +1,66 @@
+"""
+Permutation importance for the Keras sales models, scored in a few large batches.
+
+scikit-learn's permutation_importance calls predict once per shuffle of every
+feature, each time running the full scaler round trip, and with n_jobs=-1 it
+pickles the TensorFlow model into every worker. Here:
+- X is scaled once. Scaling works column by column, so shuffling a scaled
+  column equals scaling a shuffled column.
+- The permuted copies are stacked into one array and scored in a single
+  model.predict. When the stack would exceed max_bytes, it is built and
+  scored in chunks of whole copies instead.
+- R² is computed for all copies at once.
+"""
+import numpy as np
+
+MAX_BYTES = 256 * 1024 * 1024   # Largest stacked array built at once
+PREDICT_BATCH_SIZE = 8192
+
+
+def _r2_rows(y_true, y_pred):
+    """R² of every row of y_pred (copies x samples) against y_true"""
+    residual = np.square(y_pred - y_true).sum(axis=1)
+    total = np.square(y_true - y_true.mean()).sum()
+    return 1 - residual / total
+
+
+def permutation_importance(model, scaler_X, scaler_y, X, y, n_repeats=10, random_state=42,
+                           max_bytes=MAX_BYTES):
+    """
+    Drop in R² when each feature is shuffled, n_repeats times per feature.
+
+    Returns a scikit-learn Bunch with importances (features x repeats),
+    importances_mean and importances_std, like
+    sklearn.inspection.permutation_importance.
+    """
+    from sklearn.utils import Bunch
+
+    X_scaled = np.asarray(scaler_X.transform(X), dtype=np.float32)
+    y_true = np.asarray(y, dtype=np.float64).ravel()
+    n_samples, n_features = X_scaled.shape
+    rng = np.random.RandomState(random_state)
+
+    def predict(stacked):
+        y_scaled = model.predict(stacked, batch_size=PREDICT_BATCH_SIZE, verbose=0).reshape(-1, 1)
+        return scaler_y.inverse_transform(y_scaled).reshape(-1, n_samples)
+
+    baseline = _r2_rows(y_true, predict(X_scaled))[0]
+
+    # Every (feature, repeat) pair is one permuted copy of X
+    jobs = [(feature, rng.permutation(n_samples)) for feature in range(n_features) for _ in range(n_repeats)]
+    copies_per_chunk = max(1, int(max_bytes // X_scaled.nbytes))
+
+    scores = np.empty(len(jobs))
+    for start in range(0, len(jobs), copies_per_chunk):
+        chunk = jobs[start:start + copies_per_chunk]
+        stacked = np.tile(X_scaled, (len(chunk), 1))
+        for i, (feature, order) in enumerate(chunk):
+            stacked[i * n_samples:(i + 1) * n_samples, feature] = X_scaled[order, feature]
+        scores[start:start + len(chunk)] = _r2_rows(y_true, predict(stacked))
+
+    importances = baseline - scores.reshape(n_features, n_repeats)
+    return Bunch(
+        importances=importances,
+        importances_mean=importances.mean(axis=1),
+        importances_std=importances.std(axis=1)
+    )
@@ -0,0 +1,153 @@
+"""
+Forecast-vs-actual accuracy, updated as new sales data is uploaded.
+
+Every stored forecast has the dates it covers and the forecast of every
+product behind it (forecast_data "dates" and "product_predictions"). When an
+upload has Total Sales for some of those dates:
+- the forecasts are flattened into (forecast, product, date, predicted) rows
+  and joined to the upload's actuals indexed by (product, date), in one join
+  for every forecast at once
+- each forecast's error sums (count, absolute error, absolute percentage
+  error, signed error) are added to the running sums stored in its
+  forecast_data["accuracy"], for the forecast's own series (one product, or
+  the daily total of all products) and per product
+- the dates scored are remembered, so a date is scored once, from the first
+  upload that has actuals for it; products missing that day are left out
+
+The dashboard adds up the stored sums (summarize()) instead of comparing
+forecasts with upload history again.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+
+TARGET = "Total Sales"
+ACCURACY_LOOKBACK = 50  # Most recent forecasts checked against each upload
+SUMS = ("count", "abs_error", "abs_pct_error", "pct_count", "error")
+
+
+def actuals_index(df):
+    """Total Sales per (product, "YYYY-MM-DD") of a prepared upload, as an indexed Series"""
+    if TARGET not in df.columns:
+        return None
+    labelled = df.dropna(subset=[TARGET])
+    keys = [labelled["Product Name"], labelled["Date"].dt.strftime("%Y-%m-%d")]
+    return labelled.groupby(keys)[TARGET].sum().rename_axis(["product", "date"]).rename("actual")
+
+
+def forecast_rows(forecasts):
+    """(forecast_id, product, date, predicted) rows of every product forecast, skipping scored dates"""
+    import pandas as pd
+
+    frames = []
+    for forecast in forecasts:
+        data = forecast.get("forecast_data") or {}
+        dates = np.asarray(data.get("dates") or [])
+        products = data.get("product_predictions") or {}
+        if not len(dates) or not products:
+            continue
+
+        scored = (data.get("accuracy") or {}).get("scored_dates", [])
+        pending = ~np.isin(dates, scored)
+        if not pending.any():
+            continue
+
+        names = list(products)
+        values = np.asarray([products[name] for name in names], dtype=float)
+        frames.append(pd.DataFrame({
+            "forecast_id": forecast["id"],
+            "product": np.repeat(names, pending.sum()),
+            "date": np.tile(dates[pending], len(names)),
+            "predicted": values[:, pending].ravel()
+        }))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def error_sums(predicted, actual):
+    """The running sums behind MAE, MAPE (over days with sales) and bias"""
+    errors = predicted - actual
+    sold = actual > 0
+    return {
+        "count": int(len(errors)),
+        "abs_error": float(np.abs(errors).sum()),
+        "abs_pct_error": float((np.abs(errors[sold]) / actual[sold]).sum() * 100),
+        "pct_count": int(sold.sum()),
+        "error": float(errors.sum())
+    }
+
+
+def add_sums(previous, new):
+    sums = {key: (previous or {}).get(key, 0) + new[key] for key in SUMS}
+    return with_metrics(sums)
+
+
+def with_metrics(sums):
+    """The sums plus MAE, MAPE and bias computed from them"""
+    count, pct_count = sums["count"], sums["pct_count"]
+    return {
+        **{key: sums[key] for key in SUMS},
+        "mae": sums["abs_error"] / count if count else None,
+        "mape": sums["abs_pct_error"] / pct_count if pct_count else None,
+        "bias": sums["error"] / count if count else None
+    }
+
+
+def score_forecasts(forecasts, df):
+    """
+    New accuracy for every forecast that df has actuals for.
+    forecasts are rows of the forecasts table (id, product, forecast_data);
+    returns {forecast id: updated forecast_data["accuracy"]}.
+    """
+    actuals = actuals_index(df)
+    rows = forecast_rows(forecasts)
+    if actuals is None or rows is None:
+        return {}
+
+    joined = rows.join(actuals, on=["product", "date"], how="inner")
+    if joined.empty:
+        return {}
+
+    by_id = {forecast["id"]: forecast for forecast in forecasts}
+    updates = {}
+    for forecast_id, matched in joined.groupby("forecast_id", sort=False):
+        forecast = by_id[forecast_id]
+        previous = (forecast.get("forecast_data") or {}).get("accuracy") or {}
+
+        # The forecast's own series: its product, or all products added up per day
+        if forecast.get("product", "all") == "all":
+            series = matched.groupby("date")[["predicted", "actual"]].sum()
+        else:
+            series = matched
+        products = dict(previous.get("products", {}))
+        for product, product_rows in matched.groupby("product", sort=False):
+            products[product] = add_sums(
+                products.get(product),
+                error_sums(product_rows["predicted"].to_numpy(), product_rows["actual"].to_numpy())
+            )
+
+        updates[forecast_id] = {
+            **add_sums(previous, error_sums(series["predicted"].to_numpy(), series["actual"].to_numpy())),
+            "products": products,
+            "scored_dates": sorted(set(previous.get("scored_dates", [])) | set(matched["date"])),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+    return updates
+
+
+def summarize(accuracies):
+    """Overall accuracy from the stored sums of every forecast (unscored ones are skipped)"""
+    scored = [accuracy for accuracy in accuracies if accuracy and accuracy.get("count")]
+    if not scored:
+        return {"forecasts_scored": 0, "days_scored": 0, "mae": None, "mape": None, "bias": None}
+
+    sums = {key: sum(accuracy.get(key) or 0 for accuracy in scored) for key in SUMS}
+    metrics = with_metrics(sums)
+    return {
+        "forecasts_scored": len(scored),
+        "days_scored": sums["count"],
+        "mae": metrics["mae"],
+        "mape": metrics["mape"],
+        "bias": metrics["bias"]
+    }
@@ -0,0 +1,313 @@
+import logging
+
+# Number of forecast days sent per predictions/decisions event when streaming
+FORECAST_CHUNK_SIZE = 15
+
+# Columns added while analysing the upload that are not model features
+TIME_COLUMNS = ["Date", "Product Name", "YearMonth", "Year", "Month", "Week", "Day"]
+
+
+def prepare_forecast_frame(df):
+    """Validate an uploaded sales frame and add the time components used for analysis"""
+    import pandas as pd
+
+    if "Date" not in df.columns:
+        raise ValueError("Dataset must contain a 'Date' column")
+
+    if "Product Name" not in df.columns:
+        raise ValueError("Dataset must contain a 'Product Name' column")
+
+    # Parse dates and create periods
+    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y", dayfirst=True, errors="coerce")
+    df.dropna(subset=["Date"], inplace=True)
+
+    # Extract time components
+    df["YearMonth"] = df["Date"].dt.to_period("M")
+    df["Year"] = df["Date"].dt.year
+    df["Month"] = df["Date"].dt.month
+    df["Week"] = df["Date"].dt.isocalendar().week
+    df["Day"] = df["Date"].dt.day
+    return df
+
+
+def select_product(df, selected_product):
+    """Return (product_df, selected_product), falling back to every product"""
+    if selected_product != "all" and selected_product in df["Product Name"].unique():
+        logging.info(f"Filtering data for product: {selected_product}")
+        return df[df["Product Name"] == selected_product], selected_product
+
+    logging.info("Using all product data for forecast")
+    return df, "all"
+
+
+def analyze_data_quality(product_df):
+    """Measure how complete the upload is and pick a forecast horizon from it"""
+    date_range = (product_df["Date"].max() - product_df["Date"].min()).days
+    unique_days = product_df["Date"].nunique()
+    data_density = unique_days / max(date_range, 1)
+
+    unique_months = product_df["YearMonth"].nunique()
+    unique_weeks = product_df.groupby(["Year", "Week"]).ngroups
+
+    monthly_completeness = product_df.groupby("YearMonth")["Day"].nunique().mean() / 30
+    weekly_completeness = product_df.groupby(["Year", "Week"])["Day"].nunique().mean() / 7
+
+    # Determine forecast type based on data
+    if unique_months >= 4 and monthly_completeness >= 0.7:
+        forecast_type = "quarterly"
+        forecast_days = 90
+    elif unique_months >= 2 and monthly_completeness >= 0.5:
+        forecast_type = "monthly"
+        forecast_days = 30
+    elif unique_weeks >= 3 and weekly_completeness >= 0.6:
+        forecast_type = "weekly"
+        forecast_days = 7
+    else:
+        forecast_type = "short-term"
+        forecast_days = max(3, min(15, unique_days // 2))
+
+    data_quality = {
+        "date_range_days": date_range,
+        "unique_days": unique_days,
+        "unique_months": unique_months,
+        "unique_weeks": unique_weeks,
+        "data_density": round(data_density, 2),
+        "monthly_completeness": round(monthly_completeness, 2),
+        "weekly_completeness": round(weekly_completeness, 2)
+    }
+    return data_quality, forecast_type, forecast_days
+
+
+def build_feature_matrix(product_df, feature_names):
+    """Select the model features from the upload, in training order"""
+    from time_features import TIME_FEATURES, uses_time_features, add_time_features
+
+    if uses_time_features(feature_names) and not all(f in product_df.columns for f in TIME_FEATURES):
+        product_df = add_time_features(product_df)
+        product_df[TIME_FEATURES] = product_df[TIME_FEATURES].fillna(product_df[TIME_FEATURES].mean())
+
+    product_df_numeric = product_df.drop(columns=TIME_COLUMNS, errors="ignore").fillna(0)
+
+    if all(f in product_df_numeric.columns for f in feature_names):
+        return product_df_numeric[feature_names]
+
+    logging.warning("Feature names don't match model expectations. Using available numeric columns.")
+    return product_df_numeric
+
+
+def predict_frame(X, model, scaler_X, scaler_y, batch_size=None):
+    """Scale, predict and unscale in one batch (batch_size: rows per model step, Keras default 32)"""
+    X_scaled = scaler_X.transform(X)
+    y_pred_scaled = model.predict(X_scaled, batch_size=batch_size, verbose=0).flatten()
+    return scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
+
+
+def build_decision(day, predicted_sales, threshold, avg_sales, sales_std, selected_product):
+    """Turn one day's prediction into an icon, recommendation text, severity and trend"""
+    absolute_change = predicted_sales - threshold
+    percentage_change = (absolute_change / threshold * 100) if threshold > 0 else 0
+    z_score = (predicted_sales - avg_sales) / max(sales_std, 1)
+    product_context = f"for {selected_product}" if selected_product != "all" else "overall"
+
+    if percentage_change >= 50 or z_score > 2:
+        return {
+            "icon": "🚀",
+            "text": (
+                f"Significant sales surge expected on Day {day} {product_context}. "
+                f"Predicted sales: {predicted_sales:.2f}, which is a {percentage_change:.1f}% increase compared to the threshold ({threshold}). "
+                "This indicates a strong market demand. Ensure sufficient stock levels and optimize supply chain logistics."
+            ),
+            "severity": "high",
+            "trend": "positive"
+        }
+    elif 20 <= percentage_change < 50 or 1 < z_score <= 2:
+        return {
+            "icon": "📈",
+            "text": (
+                f"Moderate sales growth anticipated on Day {day} {product_context}. "
+                f"Sales projection: {predicted_sales:.2f}, marking a {percentage_change:.1f}% increase. "
+                "This suggests a steady upward trend. Consider slight inventory adjustments and marketing enhancements."
+            ),
+            "severity": "medium",
+            "trend": "positive"
+        }
+    elif 5 <= percentage_change < 20 or 0.5 < z_score <= 1:
+        return {
+            "icon": "🔼",
+            "text": (
+                f"Slight increase in sales on Day {day} {product_context}. "
+                f"Predicted: {predicted_sales:.2f} ({percentage_change:.1f}% above threshold). "
+                "This could be due to minor seasonal effects or increased visibility. Continue monitoring market response."
+            ),
+            "severity": "low",
+            "trend": "positive"
+        }
+    elif -5 <= percentage_change < 5 or -0.5 <= z_score <= 0.5:
+        return {
+            "icon": "🔄",
+            "text": (
+                f"Stable sales expected on Day {day} {product_context}, with a projection of {predicted_sales:.2f}. "
+                "No significant changes detected. Keep a close watch on any emerging trends."
+            ),
+            "severity": "none",
+            "trend": "neutral"
+        }
+    elif -20 <= percentage_change < -5 or -1 <= z_score < -0.5:
+        return {
+            "icon": "📉",
+            "text": (
+                f"Slight decline in sales anticipated on Day {day} {product_context}. "
+                f"Expected sales: {predicted_sales:.2f}, which is {abs(percentage_change):.1f}% lower than the threshold. "
+                "This could be a normal fluctuation, but monitoring customer behavior and promotional efforts is advised."
+            ),
+            "severity": "low",
+            "trend": "negative"
+        }
+    elif -50 <= percentage_change < -20 or -2 <= z_score < -1:
+        return {
+            "icon": "📉",
+            "text": (
+                f"Moderate drop in sales predicted on Day {day} {product_context}. "
+                f"Projected: {predicted_sales:.2f}, a {abs(percentage_change):.1f}% decrease. "
+                "Possible factors include reduced demand or increased competition. Consider running targeted promotions."
+            ),
+            "severity": "medium",
+            "trend": "negative"
+        }
+    return {
+        "icon": "🆘",
+        "text": (
+            f"Critical sales drop warning for Day {day} {product_context}. "
+            f"Forecasted sales: {predicted_sales:.2f}, a drastic {abs(percentage_change):.1f}% decline. "
+            "Immediate action is required—evaluate pricing, marketing, and inventory strategies to mitigate losses."
+        ),
+        "severity": "high",
+        "trend": "negative"
+    }
+
+
+def iter_forecast(df, selected_product, user_forecast_type, threshold,
+                  model, scaler_X, scaler_y, feature_names, chunk_size=FORECAST_CHUNK_SIZE,
+                  model_version=None, router=None, model_metadata=None, hierarchy=None):
+    """
+    Generator pipeline behind /generate_forecast and /generate_forecast_stream.
+
+    Yields (event, payload) pairs in the order the page can render them:
+    - "summary": forecast type, horizon, product list, data quality, model version and
+      interval level (before any model work)
+    - "predictions" / "decisions": alternating chunks of at most chunk_size days, with their
+      dates and prediction interval bounds (lower / upper, None when unavailable)
+    - "products": the dated forecast of every product behind the totals, with bounds
+    - "hierarchy" (when a reconciliation method is given): the total and category
+      forecasts that the product forecasts add up to (see hierarchy.py)
+
+    Predictions are for the days after the upload's last date (see
+    horizon.py): one product's sales, or all products' sales added up per day.
+    With a SegmentRouter, rows go to their product or category model and the
+    global model only scores the rest.
+    """
+    from horizon import forecast_horizon
+    from prediction_intervals import INTERVAL_LEVEL
+
+    product_df, selected_product = select_product(df, selected_product)
+    product_list = ["all"] + df["Product Name"].unique().tolist()
+
+    data_quality, forecast_type, forecast_days = analyze_data_quality(product_df)
+
+    # Allow user override
+    if user_forecast_type in ["weekly", "monthly", "quarterly"]:
+        forecast_type = user_forecast_type
+        forecast_days = {"weekly": 7, "monthly": 30, "quarterly": 90}[forecast_type]
+
+    yield "summary", {
+        "forecast_type": forecast_type,
+        "forecast_days": forecast_days,
+        "selected_product": selected_product,
+        "product_list": product_list,
+        "data_quality": data_quality,
+        "threshold": threshold,
+        "model_version": model_version,
+        "interval_level": INTERVAL_LEVEL
+    }
+
+    horizon = forecast_horizon(
+        product_df, feature_names, forecast_days, model, scaler_X, scaler_y, router=router,
+        residuals=(model_metadata or {}).get("residual_quantiles")
+    )
+    dates = horizon["dates"]
+    if hierarchy:
+        from hierarchy import forecast_hierarchy
+
+        levels = forecast_hierarchy(product_df, horizon, hierarchy)
+        horizon["products"], horizon["total"] = levels["products"], levels["total"]
+        horizon["lower"], horizon["upper"] = levels["lower"], levels["upper"]
+    y_pred = horizon["total"]
+    lower = horizon["lower"]["total"] if horizon["lower"] else None
+    upper = horizon["upper"]["total"] if horizon["upper"] else None
+
+    # Decision z-scores are relative to the spread of the forecast days
+    avg_sales = y_pred.mean()
+    sales_std = y_pred.std() if len(y_pred) > 1 else avg_sales * 0.1
+
+    for start in range(0, forecast_days, chunk_size):
+        end = min(start + chunk_size, forecast_days)
+        yield "predictions", {
+            "start": start,
+            "values": y_pred[start:end].tolist(),
+            "dates": dates[start:end],
+            "lower": lower[start:end].tolist() if lower is not None else None,
+            "upper": upper[start:end].tolist() if upper is not None else None
+        }
+        yield "decisions", {
+            "start": start,
+            "items": [
+                build_decision(i + 1, y_pred[i], threshold, avg_sales, sales_std, selected_product)
+                for i in range(start, end)
+            ]
+        }
+
+    yield "products", {
+        "dates": dates,
+        "products": {name: values.tolist() for name, values in horizon["products"].items()},
+        "lower": {name: values.tolist() for name, values in horizon["lower"]["products"].items()}
+        if horizon["lower"] else None,
+        "upper": {name: values.tolist() for name, values in horizon["upper"]["products"].items()}
+        if horizon["upper"] else None
+    }
+
+    if hierarchy:
+        yield "hierarchy", {
+            "dates": dates,
+            "method": levels["method"],
+            "total": levels["total"].tolist(),
+            "categories": {name: values.tolist() for name, values in levels["categories"].items()},
+            "product_categories": levels["product_categories"]
+        }
+
+
+def accumulate_forecast(forecast_data, event, payload):
+    """Fold one iter_forecast event into a forecast_data dict"""
+    if event == "summary":
+        forecast_data.update(payload)
+    elif event == "predictions":
+        forecast_data["predictions"].extend(payload["values"])
+        forecast_data.setdefault("dates", []).extend(payload.get("dates", []))
+        for bound in ("lower", "upper"):
+            if payload.get(bound) is not None:
+                forecast_data.setdefault(bound, []).extend(payload[bound])
+    elif event == "decisions":
+        forecast_data["decisions"].extend(payload["items"])
+    elif event == "products":
+        forecast_data["product_predictions"] = payload["products"]
+        forecast_data["product_intervals"] = {"lower": payload.get("lower"), "upper": payload.get("upper")}
+    elif event == "hierarchy":
+        forecast_data["hierarchy"] = payload
+    return forecast_data
+
+
+def collect_forecast(events):
+    """Drain iter_forecast into the single forecast_data dict returned by the JSON API"""
+    forecast_data = {"predictions": [], "decisions": []}
+    for event, payload in events:
+        accumulate_forecast(forecast_data, event, payload)
+    return forecast_data
@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for the sales prediction app.
+
+    gunicorn -c gunicorn.conf.py routes:app
+
+With MODEL_PRELOAD=1 (the default) the master imports routes.py once, which
+imports TensorFlow, pandas and scikit-learn and reads the scalers and model
+weights (ModelService.preload). Workers are forked from it and share those
+pages copy-on-write; each worker only builds its own TensorFlow model from
+the preloaded arrays. Set MODEL_PRELOAD=0 to go back to every worker
+importing and loading everything itself.
+
+Workers and bind address follow gunicorn's own WEB_CONCURRENCY and PORT
+environment variables.
+"""
+import os
+
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "1") == "1"
+
+# routes.py reads this at import to choose between preload() and start()
+os.environ["MODEL_PRELOAD"] = "1" if MODEL_PRELOAD else "0"
+
+preload_app = MODEL_PRELOAD
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    """Finish the model load in the worker; TensorFlow ops must not run in the master"""
+    if MODEL_PRELOAD:
+        import routes
+        routes.model_registry.start()
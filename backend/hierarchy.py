@@ -0,0 +1,165 @@
+"""
+Hierarchical forecasts: store total, categories and products that add up.
+
+The hierarchy comes from the upload: every product belongs to the category
+of its Category_* column (UNCATEGORIZED when it has none). The summing
+matrix S (scipy.sparse, one row per node: the total, each category, then
+each product; one column per product) turns product values into every
+level with one sparse product, S @ products.
+
+The product forecasts come from one batch (horizon.forecast_horizon).
+Reconciliation makes every level coherent:
+- "bottom_up" (default): the levels are S @ product forecasts
+- "ols" / "wls": the model's product forecasts are combined with separate
+  forecasts of the total and the categories (their average sales by day of
+  week over the last RECENT_DAYS days), projecting all of them onto coherent
+  values: S (S' W S)^-1 S' W y, with W the identity (ols) or the inverse
+  number of products under each node (wls, structural scaling)
+"""
+import numpy as np
+
+METHODS = ("bottom_up", "ols", "wls")
+UNCATEGORIZED = "Uncategorized"
+
+
+def product_categories(df, products):
+    """Category of every product (in the order given) from its Category_* columns"""
+    from segment_router import row_categories
+
+    categories = (
+        df.assign(_category=row_categories(df))
+        .groupby("Product Name")["_category"].first()
+        .reindex(products)
+    )
+    return [category if isinstance(category, str) else UNCATEGORIZED for category in categories]
+
+
+def summing_matrix(categories):
+    """
+    Sparse S with rows [total, each category, each product] and one column
+    per product. Returns (S, categories in row order).
+    """
+    from scipy import sparse
+
+    names, codes = np.unique(categories, return_inverse=True)
+    n = len(categories)
+    category_rows = sparse.csr_matrix((np.ones(n), (codes, np.arange(n))), shape=(len(names), n))
+    S = sparse.vstack([
+        sparse.csr_matrix(np.ones((1, n))),
+        category_rows,
+        sparse.identity(n, format="csr")
+    ], format="csr")
+    return S, names.tolist()
+
+
+def history_forecasts(df, S, products, dates, recent_days=None):
+    """
+    Forecast of every node of S for the future dates: its average daily sales
+    on the same day of the week over the last recent_days days of df
+    """
+    import pandas as pd
+    from horizon import RECENT_DAYS
+
+    recent_days = recent_days or RECENT_DAYS
+    recent = df[df["Date"] > df["Date"].max() - pd.Timedelta(days=recent_days)]
+    daily = recent.pivot_table(
+        index="Date", columns="Product Name", values="Total Sales", aggfunc="sum", fill_value=0
+    ).reindex(columns=products, fill_value=0)
+    nodes = S @ daily.to_numpy(dtype=float).T  # (nodes, days)
+
+    weekdays = daily.index.dayofweek.to_numpy()
+    future_weekdays = pd.DatetimeIndex(dates).dayofweek.to_numpy()
+    profile = np.stack([
+        nodes[:, weekdays == day].mean(axis=1) if (weekdays == day).any() else nodes.mean(axis=1)
+        for day in range(7)
+    ], axis=1)
+    return profile[:, future_weekdays]
+
+
+def reconcile(S, base, method="bottom_up"):
+    """
+    Coherent forecasts of every node (S.shape[0] rows) from base forecasts of
+    every node; bottom_up only uses the product rows
+    """
+    from scipy.sparse import diags
+    from scipy.sparse.linalg import spsolve
+
+    if method not in METHODS:
+        raise ValueError(f"Reconciliation must be one of {METHODS}")
+    n_products = S.shape[1]
+    if method == "bottom_up":
+        return S @ base[-n_products:]
+
+    weights = np.ones(S.shape[0]) if method == "ols" else 1 / np.asarray(S.sum(axis=1)).ravel()
+    W = diags(weights)
+    products = spsolve((S.T @ W @ S).tocsc(), S.T @ W @ base)
+    return S @ products.reshape(n_products, -1)
+
+
+def shift_bounds(horizon, products, total):
+    """
+    The horizon's prediction intervals moved with their forecasts: each band
+    shifts by (reconciled - base) and is widened to its reconciled point if
+    it still misses it. Returns (lower, upper) in the horizon's format, or
+    (None, None) when the horizon has no intervals.
+    """
+    if not horizon.get("lower") or not horizon.get("upper"):
+        return None, None
+
+    def moved(bound, base, point, keep):
+        return keep(bound + (point - base), point)
+
+    lower = {
+        "products": {
+            name: moved(horizon["lower"]["products"][name], horizon["products"][name], values, np.minimum)
+            for name, values in products.items()
+        },
+        "total": moved(horizon["lower"]["total"], horizon["total"], total, np.minimum)
+    }
+    upper = {
+        "products": {
+            name: moved(horizon["upper"]["products"][name], horizon["products"][name], values, np.maximum)
+            for name, values in products.items()
+        },
+        "total": moved(horizon["upper"]["total"], horizon["total"], total, np.maximum)
+    }
+    return lower, upper
+
+
+def forecast_hierarchy(df, horizon, method="bottom_up"):
+    """
+    Every level of a horizon.forecast_horizon result, reconciled.
+    Returns {"method", "total": array, "categories": {name: array},
+    "products": {name: array}, "product_categories": {product: category},
+    "lower", "upper"} with lower / upper the horizon's bounds shifted to
+    the reconciled forecasts (see shift_bounds).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Reconciliation must be one of {METHODS}")
+    if method != "bottom_up" and "Total Sales" not in df.columns:
+        raise ValueError(f"{method} reconciliation needs Total Sales in the upload")
+
+    products = list(horizon["products"])
+    bottom = np.vstack([horizon["products"][name] for name in products])
+    membership = product_categories(df, products)
+    S, categories = summing_matrix(membership)
+
+    if method == "bottom_up":
+        base = bottom
+    else:
+        base = history_forecasts(df, S, products, horizon["dates"])
+        base[-len(products):] = bottom
+    # No negative product sales; the levels are re-added so they stay coherent
+    reconciled = np.clip(reconcile(S, base, method)[-len(products):], 0, None)
+    levels = S @ reconciled
+    lower, upper = shift_bounds(horizon, dict(zip(products, reconciled)), levels[0])
+
+    return {
+        "method": method,
+        "total": levels[0],
+        "categories": dict(zip(categories, levels[1:1 + len(categories)])),
+        "products": dict(zip(products, reconciled)),
+        "product_categories": dict(zip(products, membership)),
+        "lower": lower,
+        "upper": upper
+    }
@@ -0,0 +1,204 @@
+"""
+Multi-step forecasts: feature rows for future dates, scored in one batch.
+
+build_future_frame() turns an upload into one row per product per future
+date, starting the day after the upload's last date:
+- calendar: Holiday from the fixed Philippine holidays plus every day/month
+  flagged as a holiday in the upload; Local Event off
+- weather: the most common weather of that calendar month in the upload
+  (of the whole upload for months it does not cover)
+- price, discount and ad spend: the product's last values, carried forward
+- other numeric features (units sold, foot traffic, engagement, ...): the
+  product's average over its last RECENT_DAYS days
+- category columns: the product's own
+
+Rows are laid out product by product (every date of the first product,
+then the next product), built with NumPy repeat/tile rather than a loop.
+
+Models trained with time features (time_features.py) also need each
+product's sales on the previous days. Those are known only one day ahead,
+so such models are scored one day (one row per product) at a time, with
+each day's predictions appended to a TimeFeatureState as the next day's
+history.
+"""
+import numpy as np
+
+HORIZONS = {"weekly": 7, "monthly": 30, "quarterly": 90}
+RECENT_DAYS = 28
+
+CARRIED_FORWARD = ["Unit Price", "Discount Applied (%)", "Ad Spend (₱)"]
+CATEGORY_PREFIX = "Category_"
+WEATHER_PREFIX = "Weather_"
+HOLIDAY_COLUMN = "Holiday"
+EVENT_COLUMN = "Local Event"
+
+# Regular holidays and fixed-date special days (month, day); movable ones come from the upload
+FIXED_HOLIDAYS = [
+    (1, 1), (4, 9), (5, 1), (6, 12), (8, 21), (11, 1), (11, 2), (11, 30),
+    (12, 8), (12, 24), (12, 25), (12, 30), (12, 31)
+]
+
+
+def _month_day(dates):
+    return dates.month * 100 + dates.day
+
+
+def holiday_flags(df, dates):
+    """1 for every future date that is a fixed holiday or was a holiday in the upload"""
+    codes = {month * 100 + day for month, day in FIXED_HOLIDAYS}
+    if HOLIDAY_COLUMN in df.columns:
+        flagged = df.loc[df[HOLIDAY_COLUMN].fillna(0) > 0, "Date"]
+        codes.update(np.unique(_month_day(flagged.dt)).tolist())
+    return np.isin(_month_day(dates), list(codes)).astype(float)
+
+
+def weather_defaults(df, weather_columns, dates):
+    """One-hot weather per future date: the upload's most common weather for that month"""
+    if not weather_columns:
+        return np.zeros((len(dates), 0))
+
+    one_hot = df.reindex(columns=weather_columns).fillna(0).to_numpy(dtype=float)
+    # Extra column for rows with no weather flag (the dropped one-hot category)
+    with_none = np.column_stack([one_hot, 1 - one_hot.sum(axis=1)])
+
+    months = df["Date"].dt.month.to_numpy()
+    overall = with_none.mean(axis=0)
+    table = np.tile(overall, (13, 1))  # row per month, 1..12
+    for month in np.unique(months):
+        table[month] = with_none[months == month].mean(axis=0)
+
+    most_common = table.argmax(axis=1)
+    lookup = np.zeros((13, len(weather_columns) + 1))
+    lookup[np.arange(13), most_common] = 1
+    return lookup[dates.month.to_numpy(), :len(weather_columns)]
+
+
+def product_defaults(df, feature_names):
+    """One row of feature values per product (in upload order): recent averages, last price/discount/ad spend"""
+    ordered = df.sort_values("Date", kind="stable")
+    products = ordered["Product Name"].unique()
+    numeric = [name for name in feature_names if name in df.columns]
+
+    # Each product's last RECENT_DAYS days of history
+    last_date = ordered.groupby("Product Name")["Date"].transform("max")
+    recent = ordered[ordered["Date"] > last_date - np.timedelta64(RECENT_DAYS, "D")]
+    defaults = recent.groupby("Product Name")[numeric].mean()
+
+    # Last known value for what the business sets, and the product's own category
+    fixed = [name for name in numeric if name in CARRIED_FORWARD or name.startswith(CATEGORY_PREFIX)]
+    if fixed:
+        defaults[fixed] = ordered.groupby("Product Name")[fixed].last()
+
+    return defaults.reindex(index=products, columns=feature_names).fillna(0)
+
+
+def build_future_frame(df, feature_names, days):
+    """
+    Feature rows for every product and each of the next `days` dates.
+    df is a prepared upload (Date parsed, Product Name); returns a DataFrame
+    with Date, Product Name and every feature in feature_names.
+    """
+    import pandas as pd
+
+    dates = pd.date_range(df["Date"].max() + pd.Timedelta(days=1), periods=days, freq="D")
+    defaults = product_defaults(df, feature_names)
+    products = defaults.index.to_numpy()
+    n_products = len(products)
+
+    values = np.repeat(defaults.to_numpy(dtype=float), days, axis=0)
+    columns = {name: i for i, name in enumerate(feature_names)}
+
+    if HOLIDAY_COLUMN in columns:
+        values[:, columns[HOLIDAY_COLUMN]] = np.tile(holiday_flags(df, dates), n_products)
+    if EVENT_COLUMN in columns:
+        values[:, columns[EVENT_COLUMN]] = 0
+
+    weather_columns = [name for name in feature_names if name.startswith(WEATHER_PREFIX)]
+    if weather_columns:
+        weather = weather_defaults(df, weather_columns, dates)
+        values[:, [columns[name] for name in weather_columns]] = np.tile(weather, (n_products, 1))
+
+    future = pd.DataFrame(values, columns=feature_names)
+    future.insert(0, "Product Name", np.repeat(products, days))
+    future.insert(0, "Date", np.tile(dates.to_numpy(), n_products))
+    return future
+
+
+def _predict(frame, X, model, scaler_X, scaler_y, router):
+    from forecast_pipeline import predict_frame
+
+    if router is not None:
+        return router.predict(frame, X, model, scaler_X, scaler_y)
+    return predict_frame(X, model, scaler_X, scaler_y)
+
+
+def predict_day_by_day(df, future, feature_names, days, model, scaler_X, scaler_y, router=None):
+    """
+    Predictions for a future frame whose model uses lag features, feeding each
+    day's predictions forward. Returns (predictions, the feature rows used).
+    """
+    from time_features import TimeFeatureState, TIME_FEATURES, TARGET
+
+    state = TimeFeatureState.from_frame(df)
+    time_columns = [name for name in feature_names if name in TIME_FEATURES]
+    fallback = future[feature_names].mean()
+
+    predictions = np.empty(len(future))
+    features = future[feature_names].copy()
+    n_products = len(future) // days
+    for day in range(days):
+        rows = np.arange(n_products) * days + day
+        day_frame = future.iloc[rows]
+        X = day_frame[feature_names].copy()
+        X[time_columns] = state.features(day_frame)[time_columns]
+        # Products with too little history have no lags yet
+        X = X.fillna(X.mean()).fillna(fallback).fillna(0)
+
+        predictions[rows] = _predict(day_frame, X, model, scaler_X, scaler_y, router)
+        features.iloc[rows] = X.to_numpy()
+        state.append(day_frame.assign(**{TARGET: predictions[rows]}))
+    return predictions, features
+
+
+def forecast_horizon(df, feature_names, days, model, scaler_X, scaler_y, router=None,
+                     intervals=True, residuals=None):
+    """
+    Dated predictions for every product over the next `days` days.
+    Returns {"dates": [...], "products": {name: array of days values}, "total": array,
+    "lower": ..., "upper": ...}; lower and upper hold {"products": ..., "total": ...}
+    bounds (see prediction_intervals.py), or None when no interval is available.
+    """
+    from time_features import uses_time_features
+    from prediction_intervals import sample_predictions, bounds
+
+    future = build_future_frame(df, feature_names, days)
+    if uses_time_features(feature_names):
+        predictions, X = predict_day_by_day(df, future, feature_names, days, model, scaler_X, scaler_y, router)
+    else:
+        X = future[feature_names]
+        predictions = _predict(future, X, model, scaler_X, scaler_y, router)
+
+    products = future["Product Name"].to_numpy()[::days]
+    per_product = np.asarray(predictions).reshape(len(products), days)
+    result = {
+        "dates": [date.strftime("%Y-%m-%d") for date in future["Date"].iloc[:days]],
+        "products": dict(zip(products, per_product)),
+        "total": per_product.sum(axis=0),
+        "lower": None,
+        "upper": None
+    }
+
+    samples = None
+    if intervals and router is not None:
+        # Each row's spread comes from the model that predicted it
+        samples = router.sample_predictions(future, X, predictions, model, scaler_X, scaler_y, residuals)
+    elif intervals:
+        samples = sample_predictions(X, predictions, model, scaler_X, scaler_y, residuals)
+    if samples is not None:
+        samples = samples.reshape(len(samples), len(products), days)
+        product_lower, product_upper = bounds(samples)
+        # Interval of the daily total from the summed samples
+        total_lower, total_upper = bounds(samples.sum(axis=1))
+        result["lower"] = {"products": dict(zip(products, product_lower)), "total": total_lower}
+        result["upper"] = {"products": dict(zip(products, product_upper)), "total": total_upper}
+    return result
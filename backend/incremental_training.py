@@ -0,0 +1,288 @@
+"""
+Fine-tune the serving model on newly uploaded sales files.
+
+Run from the backend folder (for example from a nightly cron job):
+    python incremental_training.py [uploads folder] [epochs]
+
+Every CSV that comes through /upload_csv has Total Sales next to the
+features, so it is new labelled data. One run:
+
+1. Finds upload files the serving model has not seen yet (by name, size and
+   modification time; the list travels in the bundle metadata)
+2. Splits their rows into fine-tuning rows and a holdout
+3. Updates the scalers with running moments (partial_fit), so their
+   statistics cover all data seen so far without re-reading old files, and
+   folds the change into the first and last Dense layers so the network
+   starts out predicting exactly what it did before
+4. Trains that copy for a few epochs on the new rows only
+5. Publishes it as a new version in MODELS_DIR, where every worker's
+   ModelRegistry picks it up, only if its holdout MAE is no worse than the
+   serving model's and it has not forgotten the old data: its MAE on a
+   fixed reference slice (MODELS_DIR/canary.csv, or a seeded sample of the
+   original training CSV) may be at most REFERENCE_TOLERANCE times the
+   serving model's
+
+A run costs time in proportion to the new rows, not the whole history.
+Files from a run that was not published stay pending and are used again
+together with the next uploads.
+"""
+import os
+import sys
+import copy
+import time
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+
+from model_bundle import load_artifacts
+from model_registry import ModelRegistry, publish_version
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(BASE_DIR, "models"))
+MODEL_DIR = os.path.join(BASE_DIR, "sales_prediction_model")
+UPLOAD_FOLDER = "backend/uploads"  # Same (working directory relative) folder routes.py saves uploads to
+
+TARGET = "Total Sales"
+FINE_TUNE_EPOCHS = 5
+FINE_TUNE_LEARNING_RATE = 1e-4
+HOLDOUT_SIZE = 0.2
+MIN_NEW_ROWS = 50
+
+# Fixed rows of the original data every fine-tuned model is also scored on
+REFERENCE_CSV = os.getenv("INCREMENTAL_REFERENCE_CSV", os.path.join(BASE_DIR, "training", "new_blk8_cafe_sales_2024.csv"))
+REFERENCE_ROWS = 2000
+REFERENCE_TOLERANCE = float(os.getenv("INCREMENTAL_REFERENCE_TOLERANCE", "1.0"))
+
+
+def upload_key(path):
+    """Size and modification time; a re-uploaded file with the same name counts as new"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def new_uploads(uploads_dir, seen):
+    """CSV files in uploads_dir not listed in seen ({file name: upload_key})"""
+    if not os.path.isdir(uploads_dir):
+        return {}
+
+    found = {}
+    for name in sorted(os.listdir(uploads_dir)):
+        path = os.path.join(uploads_dir, name)
+        if name.lower().endswith(".csv") and os.path.isfile(path):
+            key = upload_key(path)
+            if seen.get(name) != key:
+                found[name] = key
+    return found
+
+
+def labelled_rows(paths, feature_names):
+    """Features (in training order) and Total Sales of every labelled row in the files"""
+    import pandas as pd
+
+    frames = []
+    for path in paths:
+        try:
+            df = pd.read_csv(path)
+        except Exception as e:
+            logging.warning(f"⚠️ Skipping {path}: {e}")
+            continue
+        if TARGET not in df.columns:
+            logging.info(f"Skipping {path}: no {TARGET} column")
+            continue
+        frames.append(df.dropna(subset=[TARGET]))
+
+    if not frames:
+        return None, None
+
+    # Same cleaning as training: numbers only, gaps filled with column means
+    df = pd.concat(frames, ignore_index=True)
+    numeric = df.drop(columns=["Date", "Product Name"], errors="ignore").select_dtypes("number")
+    numeric = numeric.fillna(numeric.mean())
+    X = numeric.reindex(columns=feature_names, fill_value=0).fillna(0)
+    return X, numeric[TARGET].to_numpy(dtype=float)
+
+
+def reference_rows(models_dir, feature_names, reference_csv=REFERENCE_CSV):
+    """
+    Labelled rows of the original data that do not change between runs:
+    models_dir/canary.csv when it has Total Sales, else a seeded sample of
+    REFERENCE_ROWS rows from reference_csv. (None, None) when neither exists.
+    """
+    for path in (os.path.join(models_dir, "canary.csv"), reference_csv):
+        if not os.path.exists(path):
+            continue
+        X, y = labelled_rows([path], feature_names)
+        if X is None:
+            continue
+        if len(X) > REFERENCE_ROWS:
+            rows = np.sort(np.random.default_rng(0).choice(len(X), REFERENCE_ROWS, replace=False))
+            X, y = X.iloc[rows], y[rows]
+        return X, y
+    return None, None
+
+
+def _affine(scaler):
+    """(a, c) such that scaler.transform(x) == a * x + c"""
+    if type(scaler).__name__ == "MinMaxScaler":
+        return np.asarray(scaler.scale_, dtype=float), np.asarray(scaler.min_, dtype=float)
+
+    ones = np.ones(scaler.n_features_in_)
+    a = 1 / np.asarray(scaler.scale_, dtype=float) if scaler.with_std else ones
+    c = -np.asarray(scaler.mean_, dtype=float) * a if scaler.with_mean else 0 * ones
+    return a, c
+
+
+def rescale_network(model, old_scalers, new_scalers):
+    """
+    Fold a change of scalers into the first and last Dense layers, so the
+    network predicts the same sales from the same raw features as before
+    """
+    import tensorflow as tf
+
+    dense = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.Dense)]
+    if (not dense or model.layers[0] is not dense[0] or model.layers[-1] is not dense[-1]
+            or dense[-1].get_config()["activation"] != "linear"):
+        raise ValueError("Only networks that start with a Dense layer and end with a linear one can be fine-tuned")
+
+    (old_X, old_y), (new_X, new_y) = old_scalers, new_scalers
+
+    # Inputs: old scaled x == ratio * new scaled x + shift
+    a_old, c_old = _affine(old_X)
+    a_new, c_new = _affine(new_X)
+    ratio = a_old / a_new
+    kernel, bias = dense[0].get_weights()
+    dense[0].set_weights([kernel * ratio[:, None], bias + (c_old - ratio * c_new) @ kernel])
+
+    # Output: new scaled y == ratio * old scaled y + shift
+    a_old, c_old = _affine(old_y)
+    a_new, c_new = _affine(new_y)
+    ratio = a_new / a_old
+    kernel, bias = dense[-1].get_weights()
+    dense[-1].set_weights([kernel * ratio, (bias - c_old) * ratio + c_new])
+
+
+def fine_tune(bundle, X, y, epochs=FINE_TUNE_EPOCHS, batch_size=32, learning_rate=FINE_TUNE_LEARNING_RATE,
+              reference=None):
+    """
+    Fine-tune a copy of the bundle's network on new rows (X: DataFrame in
+    bundle.feature_names order, y: sales in pesos).
+    Returns (model, scaler_X, scaler_y, report); the report has the holdout
+    MAE of the new and the original model, the same pair on the reference
+    rows (X, y) when given, and the new model's holdout residual quantiles
+    for its prediction intervals.
+    """
+    import tensorflow as tf
+    from sklearn.model_selection import train_test_split
+    from forecast_pipeline import predict_frame
+    from prediction_intervals import residual_quantiles
+
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+        X, y, test_size=HOLDOUT_SIZE, random_state=42
+    )
+    previous_model = bundle.build_model()
+    previous_predictions = predict_frame(X_holdout, previous_model, bundle.scaler_X, bundle.scaler_y)
+
+    # Running moments: partial_fit merges the new rows into the stored statistics
+    scaler_X = copy.deepcopy(bundle.scaler_X)
+    scaler_y = copy.deepcopy(bundle.scaler_y)
+    scaler_X.partial_fit(X_fit)
+    scaler_y.partial_fit(y_fit.reshape(-1, 1))
+
+    model = bundle.build_model()
+    rescale_network(model, (bundle.scaler_X, bundle.scaler_y), (scaler_X, scaler_y))
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss="mean_squared_error", metrics=["mae"])
+    model.fit(
+        scaler_X.transform(X_fit), scaler_y.transform(y_fit.reshape(-1, 1)).ravel(),
+        epochs=epochs, batch_size=batch_size, verbose=0
+    )
+
+    predictions = predict_frame(X_holdout, model, scaler_X, scaler_y)
+    report = {
+        "new_rows": int(len(X)),
+        "holdout_rows": int(len(X_holdout)),
+        "epochs": epochs,
+        "holdout_mae": float(np.mean(np.abs(predictions - y_holdout))),
+        "previous_holdout_mae": float(np.mean(np.abs(previous_predictions - y_holdout))),
+        "residual_quantiles": residual_quantiles(y_holdout, predictions)
+    }
+    if reference is not None:
+        X_reference, y_reference = reference
+        previous_reference = predict_frame(X_reference, previous_model, bundle.scaler_X, bundle.scaler_y)
+        report.update({
+            "reference_rows": int(len(X_reference)),
+            "reference_mae": float(np.mean(np.abs(predict_frame(X_reference, model, scaler_X, scaler_y) - y_reference))),
+            "previous_reference_mae": float(np.mean(np.abs(previous_reference - y_reference)))
+        })
+    return model, scaler_X, scaler_y, report
+
+
+def run(uploads_dir=UPLOAD_FOLDER, models_dir=MODELS_DIR, fallback_dir=MODEL_DIR, epochs=FINE_TUNE_EPOCHS):
+    """One incremental training run; returns the published version, or None"""
+    source = ModelRegistry(models_dir, fallback_dir, poll_seconds=0).initial_dir()
+    bundle = load_artifacts(source)
+    if bundle.model_format != "keras":
+        logging.warning(f"⚠️ Only Keras models can be fine-tuned; {source} holds a {bundle.model_format} model")
+        return None
+
+    incremental = bundle.metadata.get("incremental", {})
+    seen = incremental.get("seen_uploads", {})
+    pending = new_uploads(uploads_dir, seen)
+    if not pending:
+        logging.info(f"No new uploads in {uploads_dir}")
+        return None
+
+    X, y = labelled_rows([os.path.join(uploads_dir, name) for name in pending], bundle.feature_names)
+    rows = 0 if X is None else len(X)
+    if rows < MIN_NEW_ROWS:
+        logging.info(f"{rows} new labelled rows in {len(pending)} file(s); waiting for at least {MIN_NEW_ROWS}")
+        return None
+
+    X_reference, y_reference = reference_rows(models_dir, bundle.feature_names)
+    if X_reference is None:
+        logging.warning(f"⚠️ No reference data (canary.csv in {models_dir} or {REFERENCE_CSV}); not fine-tuning")
+        return None
+
+    started = time.perf_counter()
+    model, scaler_X, scaler_y, report = fine_tune(bundle, X, y, epochs, reference=(X_reference, y_reference))
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    logging.info(
+        f"🔍 Fine-tuned {bundle.version} on {rows} rows in {report['seconds']}s: holdout MAE "
+        f"{report['holdout_mae']:.2f} (was {report['previous_holdout_mae']:.2f}), reference MAE "
+        f"{report['reference_mae']:.2f} (was {report['previous_reference_mae']:.2f})"
+    )
+    if report["holdout_mae"] > report["previous_holdout_mae"]:
+        logging.warning("⚠️ Fine-tuned model is worse on the holdout; not published")
+        return None
+    if report["reference_mae"] > report["previous_reference_mae"] * REFERENCE_TOLERANCE:
+        logging.warning("⚠️ Fine-tuned model is worse on the reference rows of the original data; not published")
+        return None
+
+    metadata = dict(bundle.metadata)
+    metadata.update({
+        "residual_quantiles": report.pop("residual_quantiles"),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "fine_tuned_from": bundle.version,
+        "fine_tuning": report,
+        "incremental": {
+            "seen_uploads": {**seen, **pending},
+            "runs": incremental.get("runs", 0) + 1,
+            "rows_seen": incremental.get("rows_seen", 0) + rows
+        }
+    })
+    version = publish_version(models_dir, model, scaler_X, scaler_y, bundle.feature_names, metadata)
+    logging.info(f"✅ Published model version {version} to {models_dir}")
+    return version
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    uploads_dir = argv[0] if argv else UPLOAD_FOLDER
+    epochs = int(argv[1]) if len(argv) > 1 else FINE_TUNE_EPOCHS
+    run(uploads_dir, epochs=epochs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
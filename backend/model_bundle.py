@@ -0,0 +1,359 @@
+"""
+Single-file, versioned model bundle.
+
+One file replaces keras_model.keras, scaler_X.joblib, scaler_y.joblib and
+feature_names.txt. Layout:
+
+    magic (8 bytes) | format version (uint32) | header length (uint64)
+    | JSON header | padding to 64 bytes | raw array data
+
+The JSON header holds the model architecture, the feature schema, scaler
+parameters, training metadata, the model version and a SHA-256 checksum over
+the header and the data. The model is either a Keras network (config plus
+per-layer weights) or an XGBoost booster (its UBJSON bytes as one array). Every array is stored as raw little-endian bytes at a
+64-byte aligned offset, so read_bundle() maps the file once and hands out
+NumPy views into the mapping without copying.
+
+Usage from the backend folder:
+    python model_bundle.py convert ../sales_prediction_model
+    python model_bundle.py info ../sales_prediction_model/sales_model.spmb
+"""
+import os
+import io
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import zipfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+BUNDLE_MAGIC = b"SPMBNDL\x00"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILENAME = "sales_model.spmb"
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct("<8sIQ")
+
+# Scalers that can be rebuilt from their stored parameters
+SCALER_TYPES = ("StandardScaler", "MinMaxScaler")
+
+
+class BundleError(ValueError):
+    """Raised when a bundle is malformed or fails its checksum"""
+
+
+class _DataWriter:
+    """Collects arrays into one aligned data section and returns references to them"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def add(self, array):
+        array = np.ascontiguousarray(array)
+        if array.dtype.byteorder == ">":
+            array = array.astype(array.dtype.newbyteorder("<"))
+        padding = -len(self.buffer) % ALIGNMENT
+        self.buffer.extend(b"\x00" * padding)
+        ref = {
+            "offset": len(self.buffer),
+            "dtype": array.dtype.str,
+            "shape": list(array.shape)
+        }
+        self.buffer.extend(array.tobytes())
+        return ref
+
+
+def _canonical(header):
+    return json.dumps(header, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _checksum(header, data):
+    digest = hashlib.sha256(_canonical(header))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def _pack_scaler(scaler, writer):
+    """Store a fitted scaler's constructor params and learned attributes"""
+    name = type(scaler).__name__
+    if name not in SCALER_TYPES:
+        raise BundleError(f"Unsupported scaler type: {name}")
+
+    attributes = {}
+    for attr, value in vars(scaler).items():
+        if not attr.endswith("_") or attr.startswith("_"):
+            continue
+        if isinstance(value, np.ndarray) and value.dtype == object:
+            attributes[attr] = {"list": value.tolist()}
+        elif isinstance(value, np.ndarray):
+            attributes[attr] = {"array": writer.add(value)}
+        else:
+            attributes[attr] = {"value": value.item() if isinstance(value, np.generic) else value}
+
+    params = {k: list(v) if isinstance(v, tuple) else v for k, v in scaler.get_params().items()}
+    return {"type": name, "params": params, "attributes": attributes}
+
+
+def _unpack_scaler(spec, array):
+    from sklearn import preprocessing
+
+    if spec["type"] not in SCALER_TYPES:
+        raise BundleError(f"Unsupported scaler type: {spec['type']}")
+
+    params = {k: tuple(v) if isinstance(v, list) else v for k, v in spec["params"].items()}
+    scaler = getattr(preprocessing, spec["type"])(**params)
+    for attr, stored in spec["attributes"].items():
+        if "array" in stored:
+            value = array(stored["array"])
+        elif "list" in stored:
+            value = np.array(stored["list"], dtype=object)
+        else:
+            value = stored["value"]
+        setattr(scaler, attr, value)
+    return scaler
+
+
+def pack_bundle(model_config, weights, scaler_X, scaler_y, feature_names, metadata=None, model_version=None,
+                model_format="keras"):
+    """Serialize bundle parts to bytes; returns (bytes, header)"""
+    writer = _DataWriter()
+    header = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "feature_names": list(feature_names),
+        "target": "Total Sales",
+        "model": {
+            "format": model_format,
+            "config": model_config,
+            "weights": {name: [writer.add(w) for w in arrays] for name, arrays in weights.items()}
+        },
+        "scaler_X": _pack_scaler(scaler_X, writer),
+        "scaler_y": _pack_scaler(scaler_y, writer),
+        "metadata": metadata or {}
+    }
+    data = bytes(writer.buffer)
+
+    if model_version is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        model_version = f"{stamp}-{hashlib.sha256(data).hexdigest()[:8]}"
+    header["model_version"] = model_version
+    header["checksum"] = {"algorithm": "sha256", "value": _checksum(header, data)}
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    start = _PREAMBLE.size + len(header_bytes)
+    padding = b"\x00" * (-start % ALIGNMENT)
+    preamble = _PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(header_bytes))
+    return preamble + header_bytes + padding + data, header
+
+
+def keras_parts(model):
+    """Architecture config and per-layer weights of a Keras model"""
+    config = json.loads(model.to_json())
+    weights = {layer.name: layer.get_weights() for layer in model.layers if layer.weights}
+    return config, weights
+
+
+def xgboost_parts(model):
+    """Booster parameters and the booster itself as raw UBJSON bytes (trees past early stopping dropped)"""
+    booster = model.booster if isinstance(model, XGBoostPredictor) else model.get_booster()
+    best_iteration = getattr(model, "best_iteration", None)
+    if best_iteration is not None and best_iteration + 1 < booster.num_boosted_rounds():
+        booster = booster[:best_iteration + 1]
+
+    config = {"num_boosted_rounds": booster.num_boosted_rounds(), "num_features": booster.num_features()}
+    raw = np.frombuffer(bytes(booster.save_raw(raw_format="ubj")), dtype=np.uint8)
+    return config, {"booster": [raw]}
+
+
+def model_parts(model):
+    """(format, config, weights) of a Keras model or an XGBoost regressor / loaded predictor"""
+    if isinstance(model, XGBoostPredictor) or hasattr(model, "get_booster"):
+        return ("xgboost",) + xgboost_parts(model)
+    return ("keras",) + keras_parts(model)
+
+
+def write_bundle(path, model, scaler_X, scaler_y, feature_names, metadata=None, model_version=None):
+    """Write a trained Keras or XGBoost model and its preprocessing to one bundle file; returns the header"""
+    model_format, config, weights = model_parts(model)
+    payload, header = pack_bundle(
+        config, weights, scaler_X, scaler_y, feature_names, metadata, model_version, model_format
+    )
+
+    # Write next to the target and rename, so readers never see a half-written bundle
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return header
+
+
+# Threads an XGBoost model predicts with in this process (0: XGBoost's default, all cores)
+XGBOOST_THREADS = int(os.getenv("XGBOOST_THREADS", "0"))
+
+
+class XGBoostPredictor:
+    """
+    A loaded XGBoost booster with the Keras-style predict(X, verbose=0) the
+    serving code calls, returning one column like a Dense(1) output
+    """
+
+    def __init__(self, booster, n_threads=XGBOOST_THREADS):
+        self.booster = booster
+        if n_threads:
+            self.booster.set_param({"nthread": n_threads})
+
+    def predict(self, X, verbose=0, batch_size=None):
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32)).reshape(-1, 1)
+
+
+class ModelBundle:
+    """A loaded bundle: feature schema, scalers, metadata and the weights to build the model"""
+
+    def __init__(self, header, weights, scaler_X, scaler_y, path=None):
+        self.header = header
+        self.weights = weights
+        self.scaler_X = scaler_X
+        self.scaler_y = scaler_y
+        self.path = path
+
+    @property
+    def version(self):
+        return self.header.get("model_version")
+
+    @property
+    def feature_names(self):
+        return self.header["feature_names"]
+
+    @property
+    def metadata(self):
+        return self.header.get("metadata", {})
+
+    @property
+    def model_format(self):
+        return self.header["model"].get("format", "keras")
+
+    def build_model(self):
+        """Create the Keras model and copy the stored weights into it (or load the XGBoost booster)"""
+        if self.model_format == "xgboost":
+            import xgboost
+
+            booster = xgboost.Booster()
+            booster.load_model(bytearray(self.weights["booster"][0].tobytes()))
+            return XGBoostPredictor(booster)
+
+        import tensorflow as tf
+
+        model = tf.keras.models.model_from_json(json.dumps(self.header["model"]["config"]))
+        for layer in model.layers:
+            if self.weights.get(layer.name):
+                layer.set_weights(self.weights[layer.name])
+        return model
+
+
+def read_bundle(path, verify=True):
+    """Map a bundle file once and return a ModelBundle whose arrays are views into the mapping"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < _PREAMBLE.size:
+        raise BundleError(f"{path} is too small to be a model bundle")
+    magic, format_version, header_length = _PREAMBLE.unpack_from(mapped, 0)
+    if magic != BUNDLE_MAGIC:
+        raise BundleError(f"{path} is not a model bundle")
+    if format_version > BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"Bundle format {format_version} is newer than supported ({BUNDLE_FORMAT_VERSION})")
+
+    header_end = _PREAMBLE.size + header_length
+    header = json.loads(mapped[_PREAMBLE.size:header_end].decode("utf-8"))
+    data_start = header_end + (-header_end % ALIGNMENT)
+    data = memoryview(mapped)[data_start:]
+
+    if verify:
+        unsigned = {k: v for k, v in header.items() if k != "checksum"}
+        if _checksum(unsigned, data) != header.get("checksum", {}).get("value"):
+            raise BundleError(f"Checksum mismatch in {path}")
+
+    def array(ref):
+        dtype = np.dtype(ref["dtype"])
+        count = int(np.prod(ref["shape"], dtype=np.int64))
+        return np.frombuffer(data, dtype=dtype, count=count, offset=ref["offset"]).reshape(ref["shape"])
+
+    weights = {name: [array(ref) for ref in refs] for name, refs in header["model"]["weights"].items()}
+    scaler_X = _unpack_scaler(header["scaler_X"], array)
+    scaler_y = _unpack_scaler(header["scaler_y"], array)
+    return ModelBundle(header, weights, scaler_X, scaler_y, path=path)
+
+
+def bundle_from_directory(directory):
+    """
+    Read the legacy four-file layout (keras_model.keras, scaler_X.joblib,
+    scaler_y.joblib, feature_names.txt) into a ModelBundle without running
+    any TensorFlow ops.
+    """
+    import h5py
+    import joblib
+
+    with zipfile.ZipFile(os.path.join(directory, "keras_model.keras")) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights = {}
+        with h5py.File(io.BytesIO(archive.read("model.weights.h5")), "r") as f:
+            for layer_name, group in f["layers"].items():
+                variables = group["vars"]
+                if len(variables):
+                    weights[layer_name] = [variables[str(i)][()] for i in range(len(variables))]
+
+    scaler_X = joblib.load(os.path.join(directory, "scaler_X.joblib"))
+    scaler_y = joblib.load(os.path.join(directory, "scaler_y.joblib"))
+    with open(os.path.join(directory, "feature_names.txt"), "r", encoding="utf-8") as f:
+        feature_names = f.read().splitlines()
+
+    header = {
+        "model_version": "legacy",
+        "feature_names": feature_names,
+        "model": {"format": "keras", "config": config},
+        "metadata": {"source": os.path.abspath(directory)}
+    }
+    return ModelBundle(header, weights, scaler_X, scaler_y, path=directory)
+
+
+def load_artifacts(directory):
+    """The bundle in directory when there is one, otherwise the legacy four files"""
+    bundle_path = os.path.join(directory, BUNDLE_FILENAME)
+    if os.path.exists(bundle_path):
+        return read_bundle(bundle_path)
+    return bundle_from_directory(directory)
+
+
+def convert_directory(directory, output=None):
+    """Write the legacy files in directory as a bundle; returns the bundle header"""
+    legacy = bundle_from_directory(directory)
+    payload, header = pack_bundle(
+        legacy.header["model"]["config"], legacy.weights, legacy.scaler_X, legacy.scaler_y,
+        legacy.feature_names, metadata={"converted_from": os.path.basename(os.path.abspath(directory))}
+    )
+    output = output or os.path.join(directory, BUNDLE_FILENAME)
+    with open(output, "wb") as f:
+        f.write(payload)
+    return header
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "convert":
+        header = convert_directory(argv[1], argv[2] if len(argv) > 2 else None)
+        print(f"Wrote bundle version {header['model_version']} ({len(header['feature_names'])} features)")
+    elif len(argv) == 2 and argv[0] == "info":
+        bundle = read_bundle(argv[1])
+        info = {k: v for k, v in bundle.header.items() if k not in ("model", "scaler_X", "scaler_y")}
+        print(json.dumps(info, indent=2, ensure_ascii=False))
+    else:
+        print("usage: python model_bundle.py convert <model dir> [output] | info <bundle file>")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
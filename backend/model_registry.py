@@ -0,0 +1,256 @@
+"""
+Versioned model directory with background hot-reload.
+
+Layout of MODELS_DIR:
+
+    models/
+        20260301-101500-ab12cd34/sales_model.spmb
+        20260415-090000-9f8e7d6c/sales_model.spmb
+        canary.csv            (optional labelled rows used to validate new versions)
+
+Each sub-folder is one version; names sort chronologically (bundle versions
+start with a UTC timestamp). publish_version() writes a version to a hidden
+temporary folder and renames it into place, so the watcher never sees a
+half-written model. A REJECTED file inside a version folder keeps it from
+being served again (rollback writes one).
+"""
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+
+from model_service import ModelService
+
+REJECTED_MARKER = "REJECTED"
+
+# A new version may be at most this much worse (MAE ratio) than the serving one on the canary rows
+CANARY_TOLERANCE = float(os.getenv("MODEL_CANARY_TOLERANCE", "1.10"))
+POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "30"))
+
+
+def publish_version(models_dir, model, scaler_X, scaler_y, feature_names, metadata=None):
+    """Write a new bundle version into models_dir atomically; returns the version name"""
+    from model_bundle import BUNDLE_FILENAME, write_bundle
+
+    os.makedirs(models_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=models_dir)
+    try:
+        header = write_bundle(
+            os.path.join(staging, BUNDLE_FILENAME), model, scaler_X, scaler_y, feature_names, metadata
+        )
+        version = header["model_version"]
+        os.replace(staging, os.path.join(models_dir, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return version
+
+
+class ModelRegistry:
+    """
+    Watches models_dir and swaps validated new versions into a ModelService.
+
+    Every worker process runs its own registry: the watcher thread polls the
+    folder, loads a newer version off the request path, scores the canary
+    batch with it and only then calls ModelService.activate(). Requests in
+    flight keep the LoadedModel they started with.
+    """
+
+    def __init__(self, models_dir, fallback_dir, poll_seconds=POLL_SECONDS, segments_dir=None):
+        from segment_router import SegmentRouter
+
+        self.models_dir = models_dir
+        self.fallback_dir = fallback_dir
+        self.poll_seconds = poll_seconds
+        self.rejected = {}  # version -> reason, for versions that failed to load or validate
+        self.service = ModelService(self.initial_dir())
+        self.router = SegmentRouter(segments_dir) if segments_dir else None
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def versions(self):
+        """Version folders in models_dir, oldest first"""
+        if not os.path.isdir(self.models_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.models_dir)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.models_dir, name))
+        )
+
+    def is_rejected(self, version):
+        if version in self.rejected:
+            return True
+        return os.path.exists(os.path.join(self.models_dir, version, REJECTED_MARKER))
+
+    def initial_dir(self):
+        """Newest usable version, or the single-model folder when there is none"""
+        for version in reversed(self.versions()):
+            if not self.is_rejected(version):
+                return os.path.join(self.models_dir, version)
+        return self.fallback_dir
+
+    def start(self):
+        """Load the initial version (and segment models) in the background, then keep watching for new ones"""
+        self.service.start(after_load=self._after_load)
+
+    def _after_load(self):
+        if self.router is not None:
+            try:
+                self.router.load(self.service)
+            except Exception as e:
+                logging.error(f"❌ Error loading segment models: {e}")
+        self._start_watching()
+
+    def _start_watching(self):
+        if self._watcher is None and self.poll_seconds > 0:
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"❌ Model registry poll failed: {e}")
+
+    def version_of(self, loaded):
+        """Folder name of a LoadedModel's version (None for the fallback folder)"""
+        if loaded is None or os.path.dirname(os.path.abspath(loaded.source)) != os.path.abspath(self.models_dir):
+            return None
+        return os.path.basename(loaded.source)
+
+    def serving_version(self):
+        """Folder name of the serving version (None when serving the fallback folder)"""
+        return self.version_of(self.service.current)
+
+    def poll(self):
+        """Roll back a rejected serving version, or load the newest version if it is newer"""
+        serving = self.serving_version()
+        if serving and self.is_rejected(serving):
+            self.rollback(reason="marked rejected")
+            return
+
+        candidates = [v for v in self.versions() if not self.is_rejected(v)]
+        if not candidates:
+            return
+        newest = candidates[-1]
+        if serving is not None and newest <= serving:
+            return
+
+        self.load_version(newest)
+
+    def load_version(self, version):
+        """Load, canary-check and activate one version; returns True when it is now serving"""
+        return self.load_path(os.path.join(self.models_dir, version))
+
+    def load_path(self, path, validate=True):
+        from model_bundle import load_artifacts
+
+        version = os.path.basename(path)
+        started = time.perf_counter()
+        try:
+            loaded = self.service.build(load_artifacts(path), source=path)
+            if validate:
+                self.validate(loaded)
+        except Exception as e:
+            logging.warning(f"⚠️ Model version {version} rejected: {e}")
+            self.rejected[version] = str(e)
+            return False
+
+        self.service.activate(loaded)
+        logging.info(f"✅ Model version {loaded.version} activated in {time.perf_counter() - started:.3f}s")
+        return True
+
+    def canary_batch(self, loaded):
+        """Labelled rows from models_dir/canary.csv, or synthetic rows around the training means"""
+        import numpy as np
+        import pandas as pd
+
+        canary_path = os.path.join(self.models_dir, "canary.csv")
+        if os.path.exists(canary_path):
+            df = pd.read_csv(canary_path)
+            X = df.reindex(columns=loaded.feature_names, fill_value=0).fillna(0)
+            y = df["Total Sales"].to_numpy() if "Total Sales" in df.columns else None
+            return X, y
+
+        # Training mean and mean +/- one standard deviation for every feature
+        mean = np.asarray(loaded.scaler_X.mean_)
+        scale = np.asarray(loaded.scaler_X.scale_)
+        rows = np.vstack([mean - scale, mean, mean + scale])
+        return pd.DataFrame(rows, columns=loaded.feature_names), None
+
+    def validate(self, candidate):
+        """Raise ValueError when the candidate produces unusable or clearly worse predictions"""
+        import numpy as np
+        from forecast_pipeline import predict_frame
+
+        X, y = self.canary_batch(candidate)
+        predictions = predict_frame(X, candidate.model, candidate.scaler_X, candidate.scaler_y)
+        if predictions.shape != (len(X),) or not np.all(np.isfinite(predictions)):
+            raise ValueError("canary predictions are missing or not finite")
+
+        current = self.service.current
+        if y is None or current is None:
+            return
+
+        current_X = X.reindex(columns=current.feature_names, fill_value=0)
+        current_mae = np.mean(np.abs(predict_frame(current_X, current.model, current.scaler_X, current.scaler_y) - y))
+        candidate_mae = np.mean(np.abs(predictions - y))
+        if candidate_mae > current_mae * CANARY_TOLERANCE:
+            raise ValueError(
+                f"canary MAE {candidate_mae:.2f} is worse than serving version's {current_mae:.2f}"
+            )
+
+    def rollback(self, reason="manual rollback"):
+        """
+        Serve the previous version again and mark the current one rejected;
+        returns the new version, or None when there is nothing else to serve.
+        A previous version that is rejected itself is never restored: the
+        newest other usable version (or the fallback folder) is loaded from
+        disk instead.
+        """
+        serving = self.serving_version()
+        previous = self.service.previous
+        previous_version = self.version_of(previous)
+        if previous is not None and not (previous_version and self.is_rejected(previous_version)):
+            restored = self.service.rollback()
+        else:
+            path = next(
+                (os.path.join(self.models_dir, version) for version in reversed(self.versions())
+                 if version != serving and not self.is_rejected(version)),
+                self.fallback_dir
+            )
+            current = self.service.current
+            if current is not None and os.path.abspath(path) == os.path.abspath(current.source):
+                return None
+            restored = self.service.version if self.load_path(path, validate=False) else None
+        if restored is None:
+            return None
+
+        if serving and not self.is_rejected(serving):
+            self.rejected[serving] = reason
+            try:
+                with open(os.path.join(self.models_dir, serving, REJECTED_MARKER), "w", encoding="utf-8") as f:
+                    f.write(reason)
+            except OSError as e:
+                logging.warning(f"Could not mark model version {serving} rejected: {e}")
+
+        logging.info(f"↩️ Rolled back to model version {restored}")
+        return restored
+
+    def status(self):
+        status = self.service.status()
+        status.update({
+            "models_dir": self.models_dir,
+            "available_versions": self.versions(),
+            "segment_models": self.router.status() if self.router else None,
+            "rejected_versions": {
+                v: self.rejected.get(v, "marked rejected") for v in self.versions() if self.is_rejected(v)
+            }
+        })
+        return status
@@ -0,0 +1,192 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+
+# One model version with everything needed to serve it. Requests take the
+# whole tuple from ModelService.current once, so a swap never mixes versions.
+LoadedModel = namedtuple(
+    "LoadedModel", ["model", "scaler_X", "scaler_y", "feature_names", "version", "source", "metadata"]
+)
+
+
+class ModelService:
+    """
+    Holds the sales prediction model, scalers and feature names for the web app.
+
+    TensorFlow, NumPy and joblib are only imported inside load(), so importing
+    this module (and routes.py) stays cheap. start() runs load() on a
+    background thread; request handlers call wait() before using the model.
+
+    Artifacts come from model_bundle.load_artifacts(): the single-file bundle
+    when model_dir has one (memory-mapped), otherwise the legacy four files.
+
+    Under gunicorn.conf.py the master calls preload() instead: it imports the
+    heavy modules and reads the artifacts once, then every forked worker calls
+    start() to build its own TensorFlow model from those shared, read-only
+    arrays. TensorFlow itself is not fork-safe once it has run ops, so the
+    master never builds the model.
+
+    The serving version is the LoadedModel in `current`. activate() swaps a
+    new one in with a single assignment and keeps the old one in `previous`
+    so rollback() is instant. A rollback drops the version it rolled back
+    from, so a second one cannot bring it back.
+    """
+
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.current = None
+        self.previous = None
+        self.state = "idle"  # idle [-> preloaded] -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._bundle = None  # ModelBundle read by preload()
+
+    # Shortcuts to the serving version
+    @property
+    def model(self):
+        return self.current.model if self.current else None
+
+    @property
+    def scaler_X(self):
+        return self.current.scaler_X if self.current else None
+
+    @property
+    def scaler_y(self):
+        return self.current.scaler_y if self.current else None
+
+    @property
+    def feature_names(self):
+        return self.current.feature_names if self.current else []
+
+    @property
+    def version(self):
+        return self.current.version if self.current else None
+
+    def start(self, after_load=None):
+        """Begin loading on a daemon thread (no-op if a load already started), then call after_load()"""
+        with self._lock:
+            if self.state not in ("idle", "preloaded"):
+                return
+            self.state = "loading"
+        self._thread = threading.Thread(
+            target=self._load_in_background, args=(after_load,), name="model-loader", daemon=True
+        )
+        self._thread.start()
+
+    def _load_in_background(self, after_load):
+        try:
+            self.load()
+        except Exception:
+            # load() already recorded the failure
+            pass
+        if after_load:
+            after_load()
+
+    def preload(self):
+        """
+        Read everything that can be shared across forked workers: heavy imports,
+        scalers, feature names and the model weights as NumPy arrays.
+        Runs no TensorFlow ops.
+        """
+        started = time.perf_counter()
+        logging.info(f"🔍 Preloading model from: {self.model_dir}")
+
+        try:
+            import tensorflow  # noqa: F401 - imported once here so workers share it
+            from model_bundle import load_artifacts
+
+            self._bundle = load_artifacts(self.model_dir)
+
+        except Exception as e:
+            # Workers fall back to loading from disk themselves
+            logging.error(f"❌ Error preloading sales prediction model: {e}")
+            return False
+
+        self.state = "preloaded"
+        logging.info(f"✅ Model {self._bundle.version} preloaded in {time.perf_counter() - started:.3f}s")
+        return True
+
+    def build(self, bundle, source=None):
+        """Create a LoadedModel from a ModelBundle and run a warm-up prediction"""
+        import numpy as np
+
+        model = bundle.build_model()
+
+        # Warm-up prediction builds the predict function before the first request needs it
+        model.predict(np.zeros((1, len(bundle.feature_names))), verbose=0)
+
+        return LoadedModel(
+            model, bundle.scaler_X, bundle.scaler_y, list(bundle.feature_names),
+            bundle.version, source or bundle.path, dict(bundle.metadata)
+        )
+
+    def load(self):
+        """Load the model from model_dir synchronously and make it the serving version"""
+        with self._lock:
+            self.state = "loading"
+        started = time.perf_counter()
+        logging.info(f"🔍 Checking for model in: {self.model_dir}")
+
+        try:
+            from model_bundle import load_artifacts
+
+            bundle = self._bundle or load_artifacts(self.model_dir)
+            loaded = self.build(bundle, source=self.model_dir)
+            self._bundle = None
+
+        except Exception as e:
+            logging.error(f"❌ Error loading sales prediction model: {e}")
+            with self._lock:
+                self.state = "failed"
+                self.error = str(e)
+                self.load_seconds = round(time.perf_counter() - started, 3)
+            self._ready.set()
+            raise
+
+        self.load_seconds = round(time.perf_counter() - started, 3)
+        self.activate(loaded)
+        logging.info(f"✅ Sales prediction model {loaded.version} loaded successfully in {self.load_seconds}s")
+
+    def activate(self, loaded):
+        """Make loaded the serving version; the old one is kept for rollback()"""
+        with self._lock:
+            if self.current is not None:
+                self.previous = self.current
+            self.current = loaded
+            self.state = "ready"
+            self.error = None
+        self._ready.set()
+
+    def rollback(self):
+        """Serve the previous version again and drop the current one; returns the version now serving, or None"""
+        with self._lock:
+            if self.previous is None:
+                return None
+            self.current, self.previous = self.previous, None
+            return self.current.version
+
+    def wait(self, timeout=None):
+        """Block until loading finishes; True when the model is usable"""
+        self._ready.wait(timeout)
+        return self.state == "ready"
+
+    @property
+    def is_ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        """Load state reported by /readyz"""
+        current, previous = self.current, self.previous
+        return {
+            "state": self.state,
+            "model_dir": current.source if current else self.model_dir,
+            "model_version": current.version if current else None,
+            "previous_version": previous.version if previous else None,
+            "load_seconds": self.load_seconds,
+            "features": len(current.feature_names) if current else 0,
+            "error": self.error
+        }
@@ -0,0 +1,81 @@
+"""
+Prediction intervals around point forecasts.
+
+Two sources of spread, both computed for every row at once:
+- residual quantiles: training stores RESIDUAL_QUANTILES quantiles of its
+  test-set errors in the bundle metadata ("residual_quantiles"); each
+  sample adds a randomly drawn stored error to every prediction
+- Monte-Carlo dropout: for networks with Dropout layers and no stored
+  residuals, the inputs are stacked MC_SAMPLES times and run through the
+  network in one forward pass with dropout switched on
+
+Either way the result is a (samples, rows) array, so intervals for sums
+(all products on one day) come from summing the samples, not the bounds.
+Both are seeded, so the same request gets the same bands. Rows that a
+SegmentRouter sends to a segment model get their samples from that model
+(its residuals, or dropout through it; see SegmentRouter.sample_predictions).
+"""
+import os
+
+import numpy as np
+
+INTERVAL_LEVEL = float(os.getenv("FORECAST_INTERVAL_LEVEL", "0.9"))
+MC_SAMPLES = int(os.getenv("FORECAST_INTERVAL_SAMPLES", "50"))
+RESIDUAL_QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+def residual_quantiles(y_true, y_pred):
+    """Quantiles of the errors (actual - predicted) to store with a trained model"""
+    residuals = np.asarray(y_true, dtype=float) - np.asarray(y_pred, dtype=float)
+    return np.quantile(residuals, RESIDUAL_QUANTILES).tolist()
+
+
+def has_dropout(model):
+    import tensorflow as tf
+
+    return any(isinstance(layer, tf.keras.layers.Dropout) for layer in getattr(model, "layers", []))
+
+
+def mc_dropout_samples(X, model, scaler_X, scaler_y, samples=MC_SAMPLES, seed=0):
+    """(samples, rows) predictions from one stacked forward pass with seeded dropout masks"""
+    import tensorflow as tf
+
+    X_scaled = scaler_X.transform(X).astype(np.float32)
+    outputs = tf.convert_to_tensor(np.tile(X_scaled, (samples, 1)))
+    # Layer by layer: Dropout layers get masks from a seeded generator, so the
+    # same request gets the same bands; everything else runs in inference mode
+    generator = tf.random.Generator.from_seed(seed)
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.Dropout):
+            keep = generator.uniform(tf.shape(outputs)) >= layer.rate
+            outputs = tf.where(keep, outputs / (1 - layer.rate), tf.zeros_like(outputs))
+        else:
+            outputs = layer(outputs, training=False)
+    y_scaled = np.asarray(outputs).reshape(-1, 1)
+    return scaler_y.inverse_transform(y_scaled).reshape(samples, len(X_scaled))
+
+
+def sample_predictions(X, predictions, model, scaler_X, scaler_y, residuals=None,
+                       samples=MC_SAMPLES, seed=0):
+    """
+    (samples, rows) plausible values around predictions, or None when the
+    model has neither stored residuals nor dropout
+    """
+    predictions = np.asarray(predictions, dtype=float)
+    if residuals:
+        rng = np.random.default_rng(seed)
+        draws = np.asarray(residuals, dtype=float)[rng.integers(0, len(residuals), (samples, len(predictions)))]
+        return predictions + draws
+
+    if has_dropout(model):
+        mc = mc_dropout_samples(X, model, scaler_X, scaler_y, samples, seed)
+        # Spread of the dropout samples around the served predictions
+        return predictions + (mc - mc.mean(axis=0))
+    return None
+
+
+def bounds(samples, level=INTERVAL_LEVEL, axis=0):
+    """Lower and upper quantiles of the samples for a central interval of the given level"""
+    tail = (1 - level) / 2
+    lower, upper = np.quantile(samples, [tail, 1 - tail], axis=axis)
+    return lower, upper
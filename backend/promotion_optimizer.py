@@ -0,0 +1,346 @@
+"""
+Search for the best discount and ad spend of each product.
+
+The serving model predicts Total Sales from Units Sold among its inputs, and
+in the uploads Total Sales is exactly Units Sold x Unit Price. Moving a lever
+while Units Sold stays fixed would only move the revenue identity, so the
+optimizer models demand first:
+- demand_response() fits how Units Sold moves with each lever across the
+  upload (one pooled least-squares slope per lever, within products), and
+  every candidate gets Units Sold = current units + slopes . (levers - current)
+- Unit Price is not a lever: every product has a single price in the
+  uploads, so there is nothing to learn a price response from
+- Ad Spend (₱) is a 0-1 normalized column, not pesos; it is searched only
+  when the request gives ad_spend_pesos (pesos per 1.0 of the column), which
+  also prices it in the margin; otherwise it stays at its current value
+
+Objectives, per product and day:
+- sales: predicted sales net of the discount, sales * (1 - discount / 100)
+- margin: net sales - units * unit cost - ad spend in pesos, with the unit
+  cost cost_ratio times the product's price and units = sales / price
+Discounts are searched between min_discount and max_discount (by default the
+largest discount in the upload, the range the demand slopes come from).
+
+Starting from each product's usual feature values (horizon.product_defaults),
+every round scores candidates for all products in one batch: random
+settings first, then new ones sampled around each product's best so far
+with a shrinking spread. For Keras models the best candidates also take a
+few gradient steps on the objective (through the demand slopes, scalers and
+network with tf.GradientTape); XGBoost models only use the sampling. Rounds
+run until the time budget is spent, and each product gets its top
+recommendations, rounded to settings a store can use, next to its current
+settings.
+"""
+import os
+import time
+
+import numpy as np
+
+LEVERS = ["Discount Applied (%)", "Ad Spend (₱)"]
+DEMAND = "Units Sold"
+PRICE = "Unit Price"
+OBJECTIVES = ("sales", "margin")
+OPTIMIZER_TIME_BUDGET = float(os.getenv("OPTIMIZER_TIME_BUDGET", "2"))
+MAX_TIME_BUDGET = 10.0
+CANDIDATES_PER_ROUND = 20000  # Split across the products
+ELITE = 16
+ROUNDING = (0.5, 0.01)  # Per lever in LEVERS: discount to 0.5%, normalized ad spend to 0.01
+GRADIENT_STEPS = 5
+DEFAULT_CONSTRAINTS = {
+    "min_discount": 0.0,
+    "max_discount": None,  # The largest discount in the upload
+    "max_ad_spend": 1.0,  # On the normalized 0-1 Ad Spend scale
+    "ad_spend_pesos": None,
+    "cost_ratio": 0.6
+}
+
+
+def read_constraints(constraints):
+    """DEFAULT_CONSTRAINTS updated with the given ones, checked"""
+    unknown = set(constraints or {}) - set(DEFAULT_CONSTRAINTS)
+    if unknown:
+        raise ValueError(f"Unknown constraints {sorted(unknown)}; choose from {sorted(DEFAULT_CONSTRAINTS)}")
+
+    merged = dict(DEFAULT_CONSTRAINTS)
+    for key, value in (constraints or {}).items():
+        if value is None:
+            continue
+        try:
+            merged[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number")
+
+    max_discount = merged["max_discount"] if merged["max_discount"] is not None else merged["min_discount"]
+    if not 0 <= merged["min_discount"] <= max_discount < 100:
+        raise ValueError("Discounts must satisfy 0 <= min_discount <= max_discount < 100")
+    if not 0 <= merged["max_ad_spend"] <= 1:
+        raise ValueError("max_ad_spend is on the normalized Ad Spend scale, between 0 and 1")
+    if merged["ad_spend_pesos"] is not None and merged["ad_spend_pesos"] < 0:
+        raise ValueError("ad_spend_pesos cannot be negative")
+    if not 0 <= merged["cost_ratio"] < 1:
+        raise ValueError("cost_ratio must be a fraction between 0 and 1")
+    return merged
+
+
+def demand_response(df, levers=LEVERS):
+    """
+    Change in Units Sold per unit of each lever (array in levers order), from
+    the upload's variation within each product; 0 for levers it lacks
+    """
+    import pandas as pd
+
+    levers = list(levers)
+    present = [lever for lever in levers if lever in df.columns]
+    slopes = np.zeros(len(levers))
+    if DEMAND not in df.columns or not present:
+        return slopes
+
+    values = df[[DEMAND] + present].apply(pd.to_numeric, errors="coerce")
+    centered = (values - values.groupby(df["Product Name"]).transform("mean")).dropna()
+    fitted, *_ = np.linalg.lstsq(centered[present].to_numpy(), centered[DEMAND].to_numpy(), rcond=None)
+    slopes[[levers.index(lever) for lever in present]] = fitted
+    return slopes
+
+
+def lever_bounds(current, constraints):
+    """(lower, upper) arrays of shape (products, levers) from the current settings and constraints"""
+    ad_spend = current[:, 1]
+    searched = constraints["ad_spend_pesos"] is not None
+    lower = np.column_stack([
+        np.full(len(current), constraints["min_discount"]),
+        np.zeros(len(current)) if searched else ad_spend
+    ])
+    upper = np.column_stack([
+        np.full(len(current), constraints["max_discount"]),
+        np.full(len(current), constraints["max_ad_spend"]) if searched else ad_spend
+    ])
+    return lower, upper
+
+
+def objective_values(sales, candidates, price, unit_cost, ad_spend_pesos, objective):
+    """
+    Objective of every candidate; works on NumPy arrays and TensorFlow tensors.
+    sales: (products, n), candidates: (products, n, levers), price and unit_cost: (products, 1)
+    """
+    discount, ad_spend = candidates[..., 0], candidates[..., 1]
+    net_sales = sales * (1 - discount / 100)
+    if objective == "sales":
+        return net_sales
+    units = sales / price
+    return net_sales - units * unit_cost - ad_spend * ad_spend_pesos
+
+
+class _Scorer:
+    """Predicted sales of candidate lever settings on top of each product's base row"""
+
+    def __init__(self, base, feature_names, model, scaler_X, scaler_y, slopes):
+        self.base = base  # (products, features)
+        self.feature_names = feature_names
+        self.columns = [feature_names.index(lever) for lever in LEVERS]
+        self.current = base[:, self.columns]
+        # Units Sold follows the levers along the demand slopes
+        self.demand = feature_names.index(DEMAND) if DEMAND in feature_names else None
+        self.slopes = slopes
+        self.model, self.scaler_X, self.scaler_y = model, scaler_X, scaler_y
+
+    def units(self, candidates):
+        change = (candidates - self.current[:, None, :]) @ self.slopes
+        return np.maximum(self.base[:, None, self.demand] + change, 0)
+
+    def inputs(self, candidates):
+        products, n, _ = candidates.shape
+        X = np.repeat(self.base[:, None, :], n, axis=1)
+        X[:, :, self.columns] = candidates
+        if self.demand is not None:
+            X[:, :, self.demand] = self.units(candidates)
+        return X.reshape(products * n, -1)
+
+    def sales(self, candidates):
+        import pandas as pd
+        from forecast_pipeline import predict_frame
+
+        X = pd.DataFrame(self.inputs(candidates), columns=self.feature_names)
+        predictions = predict_frame(X, self.model, self.scaler_X, self.scaler_y, batch_size=len(X))
+        return np.clip(predictions, 0, None).reshape(candidates.shape[:2])
+
+    def can_differentiate(self):
+        return hasattr(self.model, "trainable_variables")
+
+    def gradient_steps(self, candidates, lower, upper, objective_args, objective, step, steps=GRADIENT_STEPS):
+        """Signed gradient ascent on the objective, step a fraction of each lever's range, kept in bounds"""
+        import pandas as pd
+        import tensorflow as tf
+
+        # Both scalers are affine: transform(x) == x * a + c
+        n_features = self.base.shape[1]
+        edges = pd.DataFrame([np.zeros(n_features), np.ones(n_features)], columns=self.feature_names)
+        c_X, ones = self.scaler_X.transform(edges)
+        a_X = ones - c_X
+        c_y = float(self.scaler_y.transform([[0.0]])[0, 0])
+        a_y = float(self.scaler_y.transform([[1.0]])[0, 0]) - c_y
+
+        products, n, _ = candidates.shape
+        base = tf.constant(np.repeat(self.base[:, None, :], n, axis=1), dtype=tf.float32)
+        mask = np.zeros(n_features, dtype=np.float32)
+        mask[self.columns] = 1
+        scatter = np.zeros((len(LEVERS), n_features), dtype=np.float32)
+        scatter[np.arange(len(LEVERS)), self.columns] = 1
+        demand = np.zeros(n_features, dtype=np.float32)
+        base_units = np.zeros((products, 1), dtype=np.float32)
+        if self.demand is not None:
+            mask[self.demand] = 1
+            demand[self.demand] = 1
+            base_units = self.base[:, None, self.demand].astype(np.float32)
+        current = tf.constant(self.current[:, None, :], dtype=tf.float32)
+        slopes = tf.constant(self.slopes[:, None], dtype=tf.float32)
+
+        span = (upper - lower)[:, None, :]
+        levers = tf.Variable(candidates, dtype=tf.float32)
+        for _ in range(steps):
+            with tf.GradientTape() as tape:
+                units = tf.nn.relu(base_units + tf.squeeze(tf.tensordot(levers - current, slopes, axes=1), -1))
+                X = base * (1 - mask) + tf.tensordot(levers, scatter, axes=1) + units[..., None] * demand
+                X_scaled = X * a_X.astype(np.float32) + c_X.astype(np.float32)
+                y_scaled = tf.reshape(self.model(tf.reshape(X_scaled, (products * n, n_features)), training=False), (products, n))
+                sales = (y_scaled - c_y) / a_y
+                value = tf.reduce_sum(objective_values(
+                    sales, levers, *(np.asarray(arg, dtype=np.float32) for arg in objective_args), objective
+                ))
+            gradient = tape.gradient(value, levers).numpy()
+            moved = levers.numpy() + np.sign(gradient) * step * span
+            levers.assign(np.clip(moved, lower[:, None, :], upper[:, None, :]))
+        # Back to float64 inside the float64 bounds (a fixed lever gets exactly its value again)
+        return np.clip(levers.numpy().astype(float), lower[:, None, :], upper[:, None, :])
+
+
+def round_settings(candidates, lower, upper):
+    """Settings a store can use (discount to 0.5%, ad spend to 0.01 of its scale), kept in bounds"""
+    steps = np.array(ROUNDING)
+    low = np.ceil(lower / steps) * steps
+    high = np.floor(upper / steps) * steps
+    rounded = np.round(candidates / steps) * steps
+    inside = np.clip(rounded, low[:, None, :], high[:, None, :])
+    # Ranges narrower than one step keep their exact values, clipped into the range
+    return np.where((low <= high)[:, None, :], inside, np.clip(candidates, lower[:, None, :], upper[:, None, :]))
+
+
+def optimize(df, feature_names, model, scaler_X, scaler_y, products=None, objective="sales", constraints=None,
+             time_budget=OPTIMIZER_TIME_BUDGET, top=5, seed=0):
+    """
+    Ranked lever settings for every product of df, a prepared upload (or
+    only the given products). Returns {"objective", "constraints", "demand":
+    {lever: units per unit of the lever}, "products": {name: {"current": ...,
+    "recommendations": [...]}}, "rounds", "evaluated", "seconds"}.
+    """
+    from horizon import product_defaults
+
+    started = time.perf_counter()
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}")
+    feature_names = list(feature_names)
+    missing = [lever for lever in LEVERS + [PRICE] if lever not in feature_names]
+    if missing:
+        raise ValueError(f"The serving model does not use {missing}")
+    constraints = read_constraints(constraints)
+    if constraints["max_discount"] is None:
+        observed = df["Discount Applied (%)"].max() if "Discount Applied (%)" in df.columns else 0
+        constraints["max_discount"] = float(max(observed, constraints["min_discount"]))
+    try:
+        time_budget = float(time_budget)
+    except (TypeError, ValueError):
+        raise ValueError("time_budget must be a number of seconds")
+    if not np.isfinite(time_budget):
+        raise ValueError("time_budget must be a number of seconds")
+    time_budget = min(max(time_budget, 0.1), MAX_TIME_BUDGET)
+
+    defaults = product_defaults(df, feature_names)
+    if products is not None:
+        defaults = defaults.loc[products]
+    names = defaults.index.tolist()
+    base = defaults.to_numpy(dtype=float)
+    slopes = demand_response(df)
+    scorer = _Scorer(base, feature_names, model, scaler_X, scaler_y, slopes)
+    current = scorer.current
+    price = base[:, [feature_names.index(PRICE)]]
+    if (price <= 0).any():
+        raise ValueError("Every product needs a positive Unit Price")
+    lower, upper = lever_bounds(current, constraints)
+    objective_args = (price, constraints["cost_ratio"] * price, constraints["ad_spend_pesos"] or 0.0)
+
+    rng = np.random.default_rng(seed)
+    n = max(CANDIDATES_PER_ROUND // len(names), ELITE * 4)
+    rows = np.arange(len(names))[:, None]
+
+    def evaluate(candidates):
+        return objective_values(scorer.sales(candidates), candidates, *objective_args, objective)
+
+    # Round 0: the current settings (within bounds) and uniform random ones
+    pool = np.concatenate([
+        np.clip(current, lower, upper)[:, None, :],
+        lower[:, None, :] + rng.random((len(names), n - 1, len(LEVERS))) * (upper - lower)[:, None, :]
+    ], axis=1)
+    scores = evaluate(pool)
+    evaluated, rounds = pool.shape[0] * pool.shape[1], 1
+
+    spread = 0.25
+    while time.perf_counter() - started < time_budget * 0.8:
+        elite_rows = np.argsort(scores, axis=1)[:, ::-1][:, :ELITE]
+        elite = pool[rows, elite_rows]
+
+        # Sample around the best, with the spread shrinking every round
+        parents = elite[:, rng.integers(0, ELITE, n - ELITE)]
+        noise = rng.normal(size=parents.shape) * spread * (upper - lower)[:, None, :]
+        children = np.clip(parents + noise, lower[:, None, :], upper[:, None, :])
+        if scorer.can_differentiate():
+            elite = scorer.gradient_steps(elite, lower, upper, objective_args, objective, step=spread / 10)
+
+        pool = np.concatenate([elite, children], axis=1)
+        scores = evaluate(pool)
+        evaluated += pool.shape[0] * pool.shape[1]
+        rounds += 1
+        spread = max(spread * 0.7, 0.01)
+
+    # Rank rounded settings, current ones last in the batch
+    rounded = round_settings(np.concatenate([pool, np.clip(current, lower, upper)[:, None, :]], axis=1), lower, upper)
+    candidates = np.concatenate([rounded, current[:, None, :]], axis=1)
+    sales = scorer.sales(candidates)
+    units = scorer.units(candidates) if scorer.demand is not None else sales / price
+    values = objective_values(sales[:, :-1], rounded, *objective_args, objective)
+    current_value = objective_values(sales[:, -1:], current[:, None, :], *objective_args, objective)[:, 0]
+
+    results = {}
+    for i, name in enumerate(names):
+        recommendations, seen = [], set()
+        for row in np.argsort(values[i])[::-1]:
+            key = tuple(rounded[i, row])
+            if key in seen:
+                continue
+            seen.add(key)
+            recommendations.append({
+                **{lever: float(value) for lever, value in zip(LEVERS, rounded[i, row])},
+                "units": float(units[i, row]),
+                "predicted_sales": float(sales[i, row]),
+                objective: float(values[i, row]),
+                "improvement": float(values[i, row] - current_value[i])
+            })
+            if len(recommendations) == top:
+                break
+        results[name] = {
+            "current": {
+                **{lever: float(value) for lever, value in zip(LEVERS, current[i])},
+                "units": float(units[i, -1]),
+                "predicted_sales": float(sales[i, -1]),
+                objective: float(current_value[i])
+            },
+            "recommendations": recommendations
+        }
+
+    return {
+        "objective": objective,
+        "constraints": constraints,
+        "demand": dict(zip(LEVERS, slopes.tolist())),
+        "products": results,
+        "rounds": rounds,
+        "evaluated": int(evaluated),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
@@ -1,20 +1,20 @@
 import os
 import logging
 import re
-import pandas as pd
-import joblib
-import tensorflow as tf
+import json
 import csv
 import secrets
 import string
 from flask import Flask, render_template, redirect, url_for, request, session, flash, jsonify
+from flask import Response, stream_with_context
 from werkzeug.utils import secure_filename
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from flask import make_response
 from io import StringIO
 from base64 import b64encode
+from forecast_pipeline import prepare_forecast_frame, iter_forecast, accumulate_forecast, collect_forecast
+from model_registry import ModelRegistry
 
 # Load environment variables
 load_dotenv()
@@ -33,8 +33,22 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Supabase URL or Key is missing. Check your .env file.")
 
+class LazySupabaseClient:
+    """Creates the Supabase client on first use so importing routes.py stays fast"""
+
+    def __init__(self, url, key):
+        self._url = url
+        self._key = key
+        self._client = None
+
+    def __getattr__(self, name):
+        if self._client is None:
+            from supabase import create_client
+            self._client = create_client(self._url, self._key)
+        return getattr(self._client, name)
+
 # Initialize Supabase client
-supabase_client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase_client = LazySupabaseClient(SUPABASE_URL, SUPABASE_KEY)
 
 # Logging setup
 logging.basicConfig(level=logging.DEBUG)
@@ -44,35 +58,38 @@ UPLOAD_FOLDER = "backend/uploads"
 ALLOWED_EXTENSIONS = {"csv"}
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)  # Ensure upload folder exists
+# Per-user history of feature drift checks on uploads
+DRIFT_HISTORY_DIR = os.getenv("DRIFT_HISTORY_DIR", os.path.join(UPLOAD_FOLDER, "drift"))
 
-# Load Model from `sales_prediction_model` folder
+# Load Model from `sales_prediction_model` folder, or the XGBoost model with MODEL_BACKEND=xgboost
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-MODEL_DIR = os.path.join(BASE_DIR, "sales_prediction_model")
-MODEL_PATH = os.path.join(MODEL_DIR, "keras_model.keras")
-
-print(f"🔍 Checking for model at: {MODEL_PATH}")  # Debugging output
-
-if not os.path.exists(MODEL_PATH):
-    print(f"❌ Model file not found at: {MODEL_PATH}")
+MODEL_DIRS = {
+    "keras": os.path.join(BASE_DIR, "sales_prediction_model"),
+    "xgboost": os.path.join(BASE_DIR, "sales_prediction_xgboost")
+}
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "keras")
+if MODEL_BACKEND not in MODEL_DIRS:
+    raise ValueError(f"MODEL_BACKEND must be one of: {', '.join(MODEL_DIRS)}")
+MODEL_DIR = MODEL_DIRS[MODEL_BACKEND]
+
+# Versioned models (one sub-folder per version); MODEL_DIR is used while it is empty
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(BASE_DIR, "models"))
+
+# Optional per-category / per-product models (training/segment_models.py); rows without one use the global model
+SEGMENT_MODELS_DIR = os.getenv("SEGMENT_MODELS_DIR", os.path.join(BASE_DIR, "segment_models"))
+
+# Seconds a forecast request waits for a model that is still loading
+MODEL_WAIT_SECONDS = float(os.getenv("MODEL_WAIT_SECONDS", "30"))
+
+# The model loads on a background thread; /readyz reports when it is usable.
+# Under gunicorn.conf.py the master only preloads it and each worker starts the load after fork.
+# Afterwards the registry keeps watching MODELS_DIR and hot-swaps validated new versions.
+model_registry = ModelRegistry(MODELS_DIR, MODEL_DIR, segments_dir=SEGMENT_MODELS_DIR)
+model_service = model_registry.service
+if os.getenv("MODEL_PRELOAD") == "1":
+    model_service.preload()
 else:
-    print(f"✅ Model found at: {MODEL_PATH}")
-
-try:
-    model = tf.keras.models.load_model(os.path.join(MODEL_DIR, "keras_model.keras"))
-    scaler_X = joblib.load(os.path.join(MODEL_DIR, "scaler_X.joblib"))
-    scaler_y = joblib.load(os.path.join(MODEL_DIR, "scaler_y.joblib"))
-
-    with open(os.path.join(MODEL_DIR, "feature_names.txt"), "r", encoding="utf-8") as f:
-        feature_names = f.read().splitlines()
-
-    logging.info("✅ Sales prediction model loaded successfully!")
-
-except Exception as e:
-    logging.error(f"❌ Error loading sales prediction model: {e}")
-    model = None
-    scaler_X = None
-    scaler_y = None
-    feature_names = []
+    model_registry.start()
 
 def allowed_file(filename):
     """Check if the uploaded file has a valid CSV extension."""
@@ -80,11 +97,13 @@ def allowed_file(filename):
 
 # Add these helper functions at the top of routes.py
 
-def save_upload_to_supabase(file_path, user_id):
-    """Save uploaded CSV data to Supabase"""
+def save_upload_to_supabase(file_path, user_id, df=None):
+    """Save uploaded CSV data to Supabase (df: the file already read, if it was)"""
+    import pandas as pd
     try:
         # Read the CSV file
-        df = pd.read_csv(file_path)
+        if df is None:
+            df = pd.read_csv(file_path)
         
         # Convert to JSON for storage
         data_json = df.to_json(orient='records')
@@ -250,6 +269,17 @@ def validate_reset_token(token):
 def utility_processor():
     return dict(b64encode=b64encode)   
 
+@app.route("/healthz")
+def healthz():
+    """ Liveness check: the process is up and serving requests """
+    return jsonify({"status": "ok"}), 200
+
+@app.route("/readyz")
+def readyz():
+    """ Readiness check: 200 once the model and scalers are loaded, 503 until then """
+    status = model_service.status()
+    return jsonify(status), 200 if model_service.is_ready else 503
+
 @app.route("/")
 def home():
     """ Redirect authenticated users to the dashboard, otherwise to login page """
@@ -670,6 +700,7 @@ def set_threshold():
 @app.route("/upload_csv", methods=["POST"])
 def upload_csv():
     """ Handles CSV file upload """
+    import pandas as pd
     if "file" not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
@@ -681,17 +712,55 @@ def upload_csv():
     filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
     file.save(filepath)
 
+    # One chunked read checks every row for anomalies; the steps below reuse the frame
+    upload_df, anomalies = None, None
+    try:
+        from upload_anomalies import scan_upload
+        upload_df, anomalies = scan_upload(filepath)
+        if anomalies["flagged"]:
+            logging.warning(
+                f"⚠️ {anomalies['flagged']} anomalous row(s) in {filename} ({anomalies['mode']}): {anomalies['by_reason']}"
+            )
+    except pd.errors.EmptyDataError:
+        return jsonify({"error": "Uploaded CSV file is empty."}), 400
+    except Exception as e:
+        logging.warning(f"⚠️ Anomaly checks failed, proceeding without them: {e}")
+
+    # Compare the upload with the serving model's training data (skipped while the model loads)
+    drift = None
+    loaded = model_service.current
+    if upload_df is not None and loaded is not None:
+        try:
+            from drift_monitor import monitor_upload
+            drift = monitor_upload(upload_df, loaded, session.get("user_id"), DRIFT_HISTORY_DIR, filename)
+            if drift.get("retrain"):
+                logging.warning(
+                    f"⚠️ Features drifted in {drift['drifted_uploads']} recent upload(s) against model "
+                    f"{loaded.version}: {drift['drifted']}; consider running incremental_training.py"
+                )
+        except Exception as e:
+            logging.warning(f"⚠️ Drift check failed, proceeding without it: {e}")
+
     # Save to Supabase (optional, proceed even if this fails for local functionality)
     upload_id = None
     try:
-        upload_id = save_upload_to_supabase(filepath, session.get("user_id"))
+        upload_id = save_upload_to_supabase(filepath, session.get("user_id"), upload_df)
         if upload_id:
             session["upload_id"] = upload_id
     except Exception as e:
         logging.warning(f"Failed to save upload to Supabase, proceeding without it: {e}")
 
     session["uploaded_file"] = filepath
-    
+
+    # Score earlier forecasts against the actual sales in this upload
+    forecasts_scored = 0
+    try:
+        forecasts_scored = track_forecast_accuracy(session.get("user_id"), filepath, upload_df)
+        if forecasts_scored:
+            logging.info(f"✅ Updated the accuracy of {forecasts_scored} forecast(s) from {filename}")
+    except Exception as e:
+        logging.warning(f"⚠️ Forecast accuracy tracking failed, proceeding without it: {e}")
+
     # Fetch the most recent previous upload for this user (excluding the current upload)
     past_sales_data = []
     product_list = []
@@ -741,7 +810,10 @@ def upload_csv():
             "message": "File uploaded successfully!",
             "upload_id": upload_id, # Might be None if Supabase failed
             "past_sales": past_sales_data,
-            "product_list": product_list
+            "product_list": product_list,
+            "forecasts_scored": forecasts_scored,
+            "anomalies": anomalies,
+            "drift": drift
         })
 
     except pd.errors.EmptyDataError:
@@ -750,263 +822,170 @@ def upload_csv():
         logging.error(f"Error processing uploaded CSV: {e}", exc_info=True)
         return jsonify({"error": f"Failed to process CSV: {str(e)}"}), 500
 
-@app.route("/generate_forecast", methods=["POST"])
-def generate_forecast():
-    """Generates sales forecast based on data characteristics with product-specific forecasting"""
-    if model is None or scaler_X is None or scaler_y is None:
-        return jsonify({"error": "Model not loaded properly"}), 500
+@app.route("/feature_drift", methods=["GET"])
+def feature_drift():
+    """ The user's feature drift history and whether the model needs retraining """
+    from drift_monitor import load_history, retrain_signal
 
-    file_path = session.get("uploaded_file")
-    if not file_path or not os.path.exists(file_path):
-        return jsonify({"error": "No uploaded file"}), 400
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    history = load_history(DRIFT_HISTORY_DIR, session["user_id"])
+    version = model_service.version or (history[-1]["model_version"] if history else None)
+    return jsonify({"model_version": version, "history": history, **retrain_signal(history, version)}), 200
+
+def track_forecast_accuracy(user_id, filepath, df=None):
+    """Score the user's recent forecasts against the actuals in a new upload; returns how many were updated"""
+    import pandas as pd
+    from forecast_accuracy import ACCURACY_LOOKBACK, score_forecasts
+
+    if not user_id:
+        return 0
+
+    df = prepare_forecast_frame(pd.read_csv(filepath) if df is None else df.copy())
+    forecasts = supabase_client.table("forecasts") \
+        .select("id, product, forecast_data") \
+        .eq("user_id", user_id) \
+        .order("created_at", desc=True) \
+        .limit(ACCURACY_LOOKBACK) \
+        .execute().data or []
+
+    updates = score_forecasts(forecasts, df)
+    forecast_data = {forecast["id"]: forecast["forecast_data"] for forecast in forecasts}
+    for forecast_id, accuracy in updates.items():
+        supabase_client.table("forecasts") \
+            .update({"forecast_data": {**forecast_data[forecast_id], "accuracy": accuracy}}) \
+            .eq("id", forecast_id) \
+            .execute()
+    return len(updates)
 
+def record_forecast(forecast_data):
+    """Store a generated forecast in the forecasts table, returns True when saved"""
     try:
-        # Load and preprocess CSV data
-        df = pd.read_csv(file_path)
+        # Verify user exists in your custom users table
+        user_id = session.get("user_id")
+        if user_id:
+            user_response = supabase_client.table("users").select("id").eq("id", user_id).execute()
+            if not user_response.data:
+                logging.warning(f"User {user_id} not found in users table")
+                user_id = None
 
-        if "Date" not in df.columns:
-            return jsonify({"error": "Dataset must contain a 'Date' column"}), 400
-            
-        if "Product Name" not in df.columns:
-            return jsonify({"error": "Dataset must contain a 'Product Name' column"}), 400
-
-        # Parse dates and create periods
-        df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y", dayfirst=True, errors="coerce")
-        df.dropna(subset=["Date"], inplace=True)
-        
-        # Extract time components
-        df["YearMonth"] = df["Date"].dt.to_period("M")
-        df["Year"] = df["Date"].dt.year
-        df["Month"] = df["Date"].dt.month
-        df["Week"] = df["Date"].dt.isocalendar().week
-        df["Day"] = df["Date"].dt.day
-        
-        # Get product selection
-        selected_product = request.json.get("product", "all")
-        
-        # Filter by product if specified
-        if selected_product != "all" and selected_product in df["Product Name"].unique():
-            product_df = df[df["Product Name"] == selected_product]
-            logging.info(f"Filtering data for product: {selected_product}")
-        else:
-            product_df = df
-            selected_product = "all"
-            logging.info("Using all product data for forecast")
-        
-        # Get product list for dropdown
-        product_list = ["all"] + df["Product Name"].unique().tolist()
-        
-        # Analyze data characteristics
-        date_range = (product_df["Date"].max() - product_df["Date"].min()).days
-        unique_days = product_df["Date"].nunique()
-        data_density = unique_days / max(date_range, 1)
-        
-        unique_months = product_df["YearMonth"].nunique()
-        unique_weeks = product_df.groupby(["Year", "Week"]).ngroups
-        
-        monthly_completeness = product_df.groupby("YearMonth")["Day"].nunique().mean() / 30
-        weekly_completeness = product_df.groupby(["Year", "Week"])["Day"].nunique().mean() / 7
-        
-        # Determine forecast type based on data
-        if unique_months >= 4 and monthly_completeness >= 0.7:
-            forecast_type = "quarterly"
-            forecast_days = 90
-        elif unique_months >= 2 and monthly_completeness >= 0.5:
-            forecast_type = "monthly"
-            forecast_days = 30
-        elif unique_weeks >= 3 and weekly_completeness >= 0.6:
-            forecast_type = "weekly"
-            forecast_days = 7
-        else:
-            forecast_type = "short-term"
-            forecast_days = max(3, min(15, unique_days // 2))
-        
-        # Allow user override
-        user_forecast_type = request.json.get("forecast_type") or session.get("forecast_type")
-        if user_forecast_type in ["weekly", "monthly", "quarterly"]:
-            forecast_type = user_forecast_type
-            forecast_days = {"weekly": 7, "monthly": 30, "quarterly": 90}[forecast_type]
+        # Prepare insert data
+        insert_data = {
+            "forecast_data": forecast_data,
+            "product": forecast_data["product"],
+            "forecast_type": forecast_data["forecast_type"],
+            "threshold": forecast_data["threshold"],
+            "created_at": "now()"
+        }
 
-        # Prepare data for prediction
-        product_df_numeric = product_df.drop(columns=["Date", "Product Name", "YearMonth", "Year", "Month", "Week", "Day"], 
-                                           errors="ignore").fillna(0)
-        
-        if all(f in product_df_numeric.columns for f in feature_names):
-            X = product_df_numeric[feature_names]
-        else:
-            logging.warning("Feature names don't match model expectations. Using available numeric columns.")
-            X = product_df_numeric
-            
-        X_scaled = scaler_X.transform(X)
-
-        # Predict sales
-        y_pred_scaled = model.predict(X_scaled).flatten()
-        y_pred = scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
-
-        # Get threshold
-        threshold = float(session.get("threshold", 100))
-        
-        # Generate decisions
-        avg_sales = y_pred.mean()
-        sales_std = y_pred.std() if len(y_pred) > 1 else avg_sales * 0.1
-        decisions = []
-        
-        for i in range(min(len(y_pred), forecast_days)):
-            predicted_sales = y_pred[i]
-            absolute_change = predicted_sales - threshold
-            percentage_change = (absolute_change / threshold * 100) if threshold > 0 else 0
-            z_score = (predicted_sales - avg_sales) / max(sales_std, 1)
-            product_context = f"for {selected_product}" if selected_product != "all" else "overall"
-            
-            if percentage_change >= 50 or z_score > 2:
-                decisions.append({
-                    "icon": "🚀", 
-                    "text": (
-                        f"Significant sales surge expected on Day {i+1} {product_context}. "
-                        f"Predicted sales: {predicted_sales:.2f}, which is a {percentage_change:.1f}% increase compared to the threshold ({threshold}). "
-                        "This indicates a strong market demand. Ensure sufficient stock levels and optimize supply chain logistics."
-                    ),
-                    "severity": "high",
-                    "trend": "positive"
-                })
-            elif 20 <= percentage_change < 50 or 1 < z_score <= 2:
-                decisions.append({
-                    "icon": "📈", 
-                    "text": (
-                        f"Moderate sales growth anticipated on Day {i+1} {product_context}. "
-                        f"Sales projection: {predicted_sales:.2f}, marking a {percentage_change:.1f}% increase. "
-                        "This suggests a steady upward trend. Consider slight inventory adjustments and marketing enhancements."
-                    ),
-                    "severity": "medium",
-                    "trend": "positive"
-                })
-            elif 5 <= percentage_change < 20 or 0.5 < z_score <= 1:
-                decisions.append({
-                    "icon": "🔼", 
-                    "text": (
-                        f"Slight increase in sales on Day {i+1} {product_context}. "
-                        f"Predicted: {predicted_sales:.2f} ({percentage_change:.1f}% above threshold). "
-                        "This could be due to minor seasonal effects or increased visibility. Continue monitoring market response."
-                    ),
-                    "severity": "low",
-                    "trend": "positive"
-                })
-            elif -5 <= percentage_change < 5 or -0.5 <= z_score <= 0.5:
-                decisions.append({
-                    "icon": "🔄", 
-                    "text": (
-                        f"Stable sales expected on Day {i+1} {product_context}, with a projection of {predicted_sales:.2f}. "
-                        "No significant changes detected. Keep a close watch on any emerging trends."
-                    ),
-                    "severity": "none",
-                    "trend": "neutral"
-                })
-            elif -20 <= percentage_change < -5 or -1 <= z_score < -0.5:
-                decisions.append({
-                    "icon": "📉", 
-                    "text": (
-                        f"Slight decline in sales anticipated on Day {i+1} {product_context}. "
-                        f"Expected sales: {predicted_sales:.2f}, which is {abs(percentage_change):.1f}% lower than the threshold. "
-                        "This could be a normal fluctuation, but monitoring customer behavior and promotional efforts is advised."
-                    ),
-                    "severity": "low",
-                    "trend": "negative"
-                })
-            elif -50 <= percentage_change < -20 or -2 <= z_score < -1:
-                decisions.append({
-                    "icon": "📉", 
-                    "text": (
-                        f"Moderate drop in sales predicted on Day {i+1} {product_context}. "
-                        f"Projected: {predicted_sales:.2f}, a {abs(percentage_change):.1f}% decrease. "
-                        "Possible factors include reduced demand or increased competition. Consider running targeted promotions."
-                    ),
-                    "severity": "medium",
-                    "trend": "negative"
-                })
-            else:
-                decisions.append({
-                    "icon": "🆘", 
-                    "text": (
-                        f"Critical sales drop warning for Day {i+1} {product_context}. "
-                        f"Forecasted sales: {predicted_sales:.2f}, a drastic {abs(percentage_change):.1f}% decline. "
-                        "Immediate action is required—evaluate pricing, marketing, and inventory strategies to mitigate losses."
-                    ),
-                    "severity": "high",
-                    "trend": "negative"
-                })
+        # Add user_id if valid
+        if user_id:
+            insert_data["user_id"] = user_id
 
-        # Prepare data for Supabase
-        forecast_data = {
-            "forecast_type": forecast_type,
-            "forecast_days": forecast_days,
-            "predictions": y_pred[:forecast_days].tolist(),
-            "decisions": decisions,
-            "data_quality": {
-                "date_range_days": date_range,
-                "unique_days": unique_days,
-                "unique_months": unique_months,
-                "unique_weeks": unique_weeks,
-                "data_density": round(data_density, 2),
-                "monthly_completeness": round(monthly_completeness, 2),
-                "weekly_completeness": round(weekly_completeness, 2)
-            },
-            "product": selected_product,
-            "threshold": threshold
-        }
+        # Add upload_id if exists
+        upload_id = session.get("upload_id")
+        if upload_id:
+            insert_data["upload_id"] = upload_id
 
-        # Save to Supabase with proper user reference
-        saved_to_db = False
-        try:
-            # Verify user exists in your custom users table
-            user_id = session.get("user_id")
-            if user_id:
-                user_response = supabase_client.table("users").select("id").eq("id", user_id).execute()
-                if not user_response.data:
-                    logging.warning(f"User {user_id} not found in users table")
-                    user_id = None
-
-            # Prepare insert data
-            insert_data = {
-                "forecast_data": forecast_data,
-                "product": selected_product,
-                "forecast_type": forecast_type,
-                "threshold": threshold,
-                "created_at": "now()"
-            }
+        # Save to forecasts table
+        response = supabase_client.table("forecasts").insert(insert_data).execute()
+        return bool(response.data)
 
-            # Add user_id if valid
-            if user_id:
-                insert_data["user_id"] = user_id
+    except Exception as e:
+        logging.error(f"Error saving to Supabase: {e}")
+        return False
 
-            # Add upload_id if exists
-            upload_id = session.get("upload_id")
-            if upload_id:
-                insert_data["upload_id"] = upload_id
+def forecast_record(result):
+    """Shape the collected pipeline output the way it is stored in Supabase"""
+    return {
+        "forecast_type": result["forecast_type"],
+        "forecast_days": result["forecast_days"],
+        "predictions": result["predictions"],
+        "dates": result.get("dates", []),
+        "product_predictions": result.get("product_predictions", {}),
+        "lower": result.get("lower"),
+        "upper": result.get("upper"),
+        "product_intervals": result.get("product_intervals"),
+        "interval_level": result.get("interval_level"),
+        "hierarchy": result.get("hierarchy"),
+        "decisions": result["decisions"],
+        "data_quality": result["data_quality"],
+        "product": result["selected_product"],
+        "threshold": result["threshold"],
+        "model_version": result["model_version"]
+    }
+
+def load_forecast_request(selected_product, user_forecast_type, hierarchy=None):
+    """
+    Read the session upload and build the forecast event generator, or return an error response.
+    hierarchy: a reconciliation method (hierarchy.METHODS) for total and category forecasts, or None
+    """
+    from hierarchy import METHODS
+
+    if hierarchy is True:
+        hierarchy = "bottom_up"
+    if hierarchy and hierarchy not in METHODS:
+        return None, (jsonify({"error": f"hierarchy must be one of {list(METHODS)}"}), 400)
+
+    if not model_service.wait(timeout=MODEL_WAIT_SECONDS):
+        if model_service.state == "loading":
+            return None, (jsonify({"error": "Model is still loading, please try again shortly"}), 503)
+        return None, (jsonify({"error": "Model not loaded properly"}), 500)
 
-            # Save to forecasts table
-            response = supabase_client.table("forecasts").insert(insert_data).execute()
-            saved_to_db = bool(response.data)
+    file_path = session.get("uploaded_file")
+    if not file_path or not os.path.exists(file_path):
+        return None, (jsonify({"error": "No uploaded file"}), 400)
 
-        except Exception as e:
-            logging.error(f"Error saving to Supabase: {e}")
+    import pandas as pd
+    try:
+        df = prepare_forecast_frame(pd.read_csv(file_path))
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+
+    # One snapshot per request, so a hot swap mid-forecast cannot mix model versions
+    loaded = model_service.current
+    events = iter_forecast(
+        df, selected_product, user_forecast_type or session.get("forecast_type"),
+        float(session.get("threshold", 100)), loaded.model, loaded.scaler_X,
+        loaded.scaler_y, loaded.feature_names, model_version=loaded.version,
+        router=model_registry.router, model_metadata=loaded.metadata, hierarchy=hierarchy or None
+    )
+    return events, None
+
+@app.route("/generate_forecast", methods=["POST"])
+def generate_forecast():
+    """Generates sales forecast based on data characteristics with product-specific forecasting"""
+    try:
+        events, error = load_forecast_request(
+            request.json.get("product", "all"), request.json.get("forecast_type"),
+            request.json.get("hierarchy")
+        )
+        if error:
+            return error
+
+        result = collect_forecast(events)
+
+        # Save to Supabase with proper user reference
+        saved_to_db = record_forecast(forecast_record(result))
 
         # Return response
         return jsonify({
-            "forecast_type": forecast_type,
-            "forecast_days": forecast_days,
-            "predictions": y_pred[:forecast_days].tolist(),
-            "decisions": decisions,
-            "selected_product": selected_product,
-            "product_list": product_list,
-            "data_quality": {
-                "date_range_days": date_range,
-                "unique_days": unique_days,
-                "unique_months": unique_months,
-                "unique_weeks": unique_weeks,
-                "data_density": round(data_density, 2),
-                "monthly_completeness": round(monthly_completeness, 2),
-                "weekly_completeness": round(weekly_completeness, 2)
-            },
+            "forecast_type": result["forecast_type"],
+            "forecast_days": result["forecast_days"],
+            "predictions": result["predictions"],
+            "dates": result["dates"],
+            "product_predictions": result["product_predictions"],
+            "lower": result.get("lower"),
+            "upper": result.get("upper"),
+            "product_intervals": result.get("product_intervals"),
+            "interval_level": result["interval_level"],
+            "hierarchy": result.get("hierarchy"),
+            "decisions": result["decisions"],
+            "selected_product": result["selected_product"],
+            "product_list": result["product_list"],
+            "data_quality": result["data_quality"],
+            "model_version": result["model_version"],
             "saved_to_db": saved_to_db
         })
 
@@ -1014,6 +993,144 @@ def generate_forecast():
         logging.error(f"Error generating forecast: {e}", exc_info=True)
         return jsonify({"error": f"Failed to generate forecast: {str(e)}"}), 500
 
+def sse_event(event, payload):
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+@app.route("/generate_forecast_stream")
+def generate_forecast_stream():
+    """Streams the forecast as Server-Sent Events: summary first, then prediction and decision chunks"""
+    try:
+        events, error = load_forecast_request(
+            request.args.get("product", "all"), request.args.get("forecast_type"),
+            request.args.get("hierarchy")
+        )
+        if error:
+            return error
+    except Exception as e:
+        logging.error(f"Error generating forecast: {e}", exc_info=True)
+        return jsonify({"error": f"Failed to generate forecast: {str(e)}"}), 500
+
+    def stream():
+        result = {"predictions": [], "decisions": []}
+        try:
+            for event, payload in events:
+                yield sse_event(event, payload)
+                # Keep a copy so the finished forecast is stored like the JSON endpoint does
+                accumulate_forecast(result, event, payload)
+
+            saved_to_db = record_forecast(forecast_record(result))
+            yield sse_event("done", {"saved_to_db": saved_to_db})
+        except Exception as e:
+            logging.error(f"Error streaming forecast: {e}", exc_info=True)
+            yield sse_event("error", {"error": f"Failed to generate forecast: {str(e)}"})
+
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def upload_frame():
+    """The session upload, prepared for forecasting, or None"""
+    import pandas as pd
+
+    file_path = session.get("uploaded_file")
+    if not file_path or not os.path.exists(file_path):
+        return None
+    return prepare_forecast_frame(pd.read_csv(file_path))
+
+def upload_base_scenario(df, product, feature_names):
+    """A product's usual feature values from a prepared upload (all products averaged for "all")"""
+    from horizon import product_defaults
+
+    defaults = product_defaults(df, feature_names)
+    if product in defaults.index:
+        return defaults.loc[product].to_dict()
+    return defaults.mean().to_dict()
+
+@app.route("/scenarios", methods=["POST"])
+def scenarios():
+    """Scores a grid of what-if values for discount, ad spend and foot traffic in one batch"""
+    from scenarios import SCENARIO_LEVERS, score_scenarios
+    from promotion_optimizer import demand_response
+
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    if not model_service.wait(timeout=MODEL_WAIT_SECONDS):
+        if model_service.state == "loading":
+            return jsonify({"error": "Model is still loading, please try again shortly"}), 503
+        return jsonify({"error": "Model not loaded properly"}), 500
+
+    try:
+        body = request.get_json(silent=True) or {}
+        ranges = body.get("ranges") or {}
+        if not isinstance(ranges, dict):
+            return jsonify({"error": "ranges must map lever names to values"}), 400
+
+        loaded = model_service.current
+        # Units Sold follows the levers along demand slopes fitted on the upload
+        df = upload_frame()
+        if df is None:
+            return jsonify({"error": "Upload a file first: scenarios use its demand response"}), 400
+        base = body.get("base")
+        if base is None:
+            base = upload_base_scenario(df, body.get("product", "all"), loaded.feature_names)
+        if not isinstance(base, dict):
+            return jsonify({"error": "base must map feature names to values"}), 400
+
+        slopes = dict(zip(SCENARIO_LEVERS, demand_response(df, SCENARIO_LEVERS)))
+        result = score_scenarios(
+            base, ranges, loaded.model, loaded.scaler_X, loaded.scaler_y, loaded.feature_names, slopes=slopes,
+            top=max(int(body.get("top", 10)), 1)
+        )
+        result["model_version"] = loaded.version
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error scoring scenarios: {e}", exc_info=True)
+        return jsonify({"error": f"Failed to score scenarios: {str(e)}"}), 500
+
+
+@app.route("/optimize_promotions", methods=["POST"])
+def optimize_promotions():
+    """Ranks discount and ad spend settings per product for the most net sales or margin"""
+    from promotion_optimizer import OPTIMIZER_TIME_BUDGET, optimize
+
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    if not model_service.wait(timeout=MODEL_WAIT_SECONDS):
+        if model_service.state == "loading":
+            return jsonify({"error": "Model is still loading, please try again shortly"}), 503
+        return jsonify({"error": "Model not loaded properly"}), 500
+
+    try:
+        body = request.get_json(silent=True) or {}
+        loaded = model_service.current
+        df = upload_frame()
+        if df is None:
+            return jsonify({"error": "No uploaded file"}), 400
+
+        product = body.get("product", "all")
+        if product != "all" and product not in set(df["Product Name"]):
+            return jsonify({"error": f"Unknown product: {product}"}), 400
+
+        result = optimize(
+            df, loaded.feature_names, loaded.model, loaded.scaler_X, loaded.scaler_y,
+            products=None if product == "all" else [product], objective=body.get("objective", "sales"), constraints=body.get("constraints"),
+            time_budget=body.get("time_budget", OPTIMIZER_TIME_BUDGET), top=max(int(body.get("top", 5)), 1)
+        )
+        result["model_version"] = loaded.version
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error optimizing promotions: {e}", exc_info=True)
+        return jsonify({"error": f"Failed to optimize promotions: {str(e)}"}), 500
+
 
 @app.route("/reset", methods=["POST"])
 def reset():
@@ -1283,7 +1400,10 @@ def dashboard_data():
                     "type": forecast.get("forecast_type", "Unknown"),
                     "avg_prediction": round(avg_prediction, 2),
                     "threshold": forecast.get("threshold", 0),
-                    "predictions": predictions[:7] if predictions else []  # Just show first week for preview
+                    "predictions": predictions[:7] if predictions else [],  # Just show first week for preview
+                    "accuracy": {
+                        key: (forecast_data.get("accuracy") or {}).get(key) for key in ("mae", "mape")
+                    }
                 })
             except Exception as e:
                 logging.error(f"Error processing forecast: {e}")
@@ -1291,6 +1411,14 @@ def dashboard_data():
 
         # Get product performance data
         product_performance = analyze_product_performance(user_id)
+
+        # Real accuracy from the error sums stored with each forecast
+        from forecast_accuracy import SUMS, summarize
+        accuracy_rows = supabase_client.table("forecasts") \
+            .select(", ".join(f"{key}:forecast_data->accuracy->{key}" for key in SUMS)) \
+            .eq("user_id", user_id) \
+            .execute().data or []
+        forecast_accuracy = summarize(accuracy_rows)
         
         return jsonify({
             "total_forecasts": forecast_count,
@@ -1298,7 +1426,8 @@ def dashboard_data():
             "recent_forecasts": processed_recent,
             "monthly_forecasts": monthly_counts,
             "available_years": available_years,
-            "product_performance": product_performance
+            "product_performance": product_performance,
+            "forecast_accuracy": forecast_accuracy
         })
         
     except Exception as e:
@@ -1664,6 +1793,30 @@ def approve_user(user_id):
         logging.error(f"Error approving user: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/model_status")
+def model_status():
+    """Admin view of the serving, previous and available model versions"""
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    if not is_admin():
+        return jsonify({"error": "Permission denied"}), 403
+    return jsonify(model_registry.status())
+
+@app.route("/rollback_model", methods=["POST"])
+def rollback_model():
+    """Serve the previous model version again and mark the current one rejected"""
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    if not is_admin():
+        return jsonify({"error": "Permission denied"}), 403
+
+    restored = model_registry.rollback(reason=f"rolled back by {session.get('email', 'admin')}")
+    if restored is None:
+        return jsonify({"error": "No previous model version to roll back to"}), 409
+
+    # Other workers pick up the REJECTED marker on their next poll
+    return jsonify({"message": "Model rolled back", "model_version": restored})
+
 @app.route("/reject_user/<string:user_id>", methods=["POST"])
 def reject_user(user_id):
     """Endpoint to reject and delete a pending user"""
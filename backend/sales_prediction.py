@@ -5,32 +5,15 @@ import tensorflow as tf
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.base import BaseEstimator, RegressorMixin
-from sklearn.inspection import permutation_importance
 import joblib
 import os
-
-class KerasRegressor(BaseEstimator, RegressorMixin):
-    """
-    Wrapper class to make Keras model compatible with scikit-learn
-    """
-    def __init__(self, model=None, scaler_X=None, scaler_y=None):
-        self.model = model
-        self.scaler_X = scaler_X
-        self.scaler_y = scaler_y
-    
-    def fit(self, X, y):
-        return self
-    
-    def predict(self, X):
-        X_scaled = self.scaler_X.transform(X)
-        y_pred_scaled = self.model.predict(X_scaled).flatten()
-        y_pred = self.scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
-        return y_pred
-    
-    def score(self, X, y_true):
-        y_pred = self.predict(X)
-        return r2_score(y_true, y_pred)
+import sys
+import time
+from datetime import datetime, timezone
+from model_bundle import BUNDLE_FILENAME, write_bundle, read_bundle
+from feature_importance import permutation_importance
+from prediction_intervals import residual_quantiles
+from drift_monitor import feature_profile
 
 class SalesPredictionModel:
     def __init__(self, random_state=42):
@@ -41,6 +24,8 @@ class SalesPredictionModel:
         self.model = None
         self.feature_names = None  # Store feature names
         self.history = None  # Store training history
+        self.metadata = {}  # Training details stored in the model bundle
+        self.version = None  # Bundle version of the saved/loaded model
 
     def load_data(self, file_path):
         """
@@ -48,18 +33,30 @@ class SalesPredictionModel:
         """
         try:
             df = pd.read_csv(file_path)
+            # Where the training data ends, so backtests can stay out of sample
+            dates = pd.to_datetime(df['Date'], format='%d/%m/%Y', dayfirst=True, errors='coerce')
+            self.metadata['training_data_end'] = dates.max().strftime('%Y-%m-%d')
             df_numeric = df.drop(columns=['Date', 'Product Name'])
             df_numeric = df_numeric.fillna(df_numeric.mean())
 
             self.feature_names = df_numeric.drop(columns=['Total Sales']).columns.tolist()
             X = df_numeric.drop(columns=['Total Sales'])
             y = df_numeric['Total Sales']
+            self.record_training_profile(X)
 
             return X, y
         except Exception as e:
             print(f"Error loading data: {e}")
             return None, None
 
+    def record_training_profile(self, X):
+        """Store the training distribution of every feature of X, for drift checks on uploads"""
+        self.metadata['feature_profile'] = feature_profile(X)
+
+    def record_test_errors(self, y_true, y_pred):
+        """Store quantiles of the test-set errors (in pesos), for prediction intervals around forecasts"""
+        self.metadata['residual_quantiles'] = residual_quantiles(y_true, y_pred)
+
     def create_model(self, input_shape, learning_rate=0.001):
         """
         Create a TensorFlow linear regression model
@@ -74,10 +71,34 @@ class SalesPredictionModel:
 
         return model
 
-    def train_model(self, X, y, test_size=0.2, epochs=200, batch_size=32):
+    def solve_least_squares(self, X_train, y_train, l2=0.0):
+        """
+        Exact weights of the linear model: ordinary least squares, or ridge
+        when l2 > 0 (the bias is not penalized). Returns (kernel, bias)
+        shaped like the Dense(1) layer weights.
+        """
+        from scipy import linalg
+
+        A = np.column_stack([X_train, np.ones(len(X_train))])
+        if l2 > 0:
+            penalty = np.full(A.shape[1], l2)
+            penalty[-1] = 0.0
+            coef = linalg.solve(A.T @ A + np.diag(penalty), A.T @ y_train, assume_a='pos')
+        else:
+            coef = linalg.lstsq(A, y_train)[0]
+        return coef[:-1].reshape(-1, 1), coef[-1:]
+
+    def train_model(self, X, y, test_size=0.2, epochs=200, batch_size=32, solver='sgd', l2=0.0):
         """
         Train the linear regression model
+
+        solver='sgd' fits the Dense(1) layer with Adam; solver='lstsq' solves
+        the same model exactly (ridge when l2 > 0) and copies the result into
+        the layer. lstsq returns no training history.
         """
+        if solver not in ('sgd', 'lstsq'):
+            raise ValueError(f"Unknown solver: {solver}")
+
         X_scaled = self.scaler_X.fit_transform(X)
         y_scaled = self.scaler_y.fit_transform(y.values.reshape(-1, 1)).flatten()
 
@@ -87,29 +108,78 @@ class SalesPredictionModel:
 
         # Create the linear regression model
         self.model = self.create_model(X_train.shape[1])
+        started = time.perf_counter()
 
-        # Train the model (no early stopping needed for linear regression)
-        history = self.model.fit(
-            X_train, y_train, validation_split=0.2, epochs=epochs, 
-            batch_size=batch_size, verbose=1
-        )
+        if solver == 'lstsq':
+            kernel, bias = self.solve_least_squares(X_train, y_train, l2=l2)
+            self.model.layers[-1].set_weights([kernel, bias])
+            history = None
+        else:
+            # Train the model (no early stopping needed for linear regression)
+            history = self.model.fit(
+                X_train, y_train, validation_split=0.2, epochs=epochs,
+                batch_size=batch_size, verbose=1
+            )
 
         self.history = history
+        self.metadata.update({
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'model_type': 'linear',
+            'solver': solver,
+            'training_rows': int(X_train.shape[0]),
+            'test_size': test_size,
+            'training_seconds': round(time.perf_counter() - started, 4)
+        })
+        if solver == 'lstsq':
+            self.metadata['l2'] = l2
+        else:
+            self.metadata.update({
+                'epochs': epochs,
+                'epochs_run': len(history.epoch),
+                'batch_size': batch_size
+            })
         return history, X_test, y_test
 
-    def save_model(self, directory='sales_prediction_model'):
+    def save_model(self, directory='sales_prediction_model', legacy_files=True):
+        """
+        Write the model bundle (sales_model.spmb), plus the older four-file
+        layout unless legacy_files is False
+        """
+        missing = [key for key in ('feature_profile', 'residual_quantiles') if key not in self.metadata]
+        if missing:
+            print(f"Warning: saving without {', '.join(missing)} (see record_training_profile / record_test_errors)")
+
         os.makedirs(directory, exist_ok=True)
-        self.model.save(os.path.join(directory, 'keras_model.keras'))
-        joblib.dump(self.scaler_X, os.path.join(directory, 'scaler_X.joblib'))
-        joblib.dump(self.scaler_y, os.path.join(directory, 'scaler_y.joblib'))
+        header = write_bundle(
+            os.path.join(directory, BUNDLE_FILENAME), self.model, self.scaler_X, self.scaler_y,
+            self.feature_names, metadata=self.metadata
+        )
+        self.version = header['model_version']
 
-        with open(os.path.join(directory, 'feature_names.txt'), 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.feature_names))
+        if legacy_files:
+            self.model.save(os.path.join(directory, 'keras_model.keras'))
+            joblib.dump(self.scaler_X, os.path.join(directory, 'scaler_X.joblib'))
+            joblib.dump(self.scaler_y, os.path.join(directory, 'scaler_y.joblib'))
 
-        print(f"Model saved to {directory}")
+            with open(os.path.join(directory, 'feature_names.txt'), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.feature_names))
+
+        print(f"Model {self.version} saved to {directory}")
 
     def load_model(self, directory='sales_prediction_model'):
         try:
+            bundle_path = os.path.join(directory, BUNDLE_FILENAME)
+            if os.path.exists(bundle_path):
+                bundle = read_bundle(bundle_path)
+                self.model = bundle.build_model()
+                self.scaler_X = bundle.scaler_X
+                self.scaler_y = bundle.scaler_y
+                self.feature_names = bundle.feature_names
+                self.metadata = dict(bundle.metadata)
+                self.version = bundle.version
+                print(f"Model {self.version} loaded from {bundle_path}")
+                return True
+
             self.model = tf.keras.models.load_model(os.path.join(directory, 'keras_model.keras'), compile=True)
             self.scaler_X = joblib.load(os.path.join(directory, 'scaler_X.joblib'))
             self.scaler_y = joblib.load(os.path.join(directory, 'scaler_y.joblib'))
@@ -133,7 +203,10 @@ class SalesPredictionModel:
         rmse = np.sqrt(mse)
         r2 = r2_score(y_test_original, y_pred)
 
-        return {'MAE': mae, 'RMSE': rmse, 'R2': r2}
+        metrics = {'MAE': mae, 'RMSE': rmse, 'R2': r2}
+        self.metadata['metrics'] = {k: float(v) for k, v in metrics.items()}
+        self.record_test_errors(y_test_original, y_pred)
+        return metrics
 
     def predict_sales(self, input_features):
         if isinstance(input_features, dict):
@@ -151,6 +224,19 @@ class SalesPredictionModel:
 
         return max(0, prediction[0])  # Clip negative predictions to zero
 
+    def predict_scenarios(self, base, ranges, df, top=10):
+        """
+        Predicted sales for every combination of lever values on top of a base scenario,
+        e.g. predict_scenarios(sample_input, {'Discount Applied (%)': {'min': 0, 'max': 30, 'steps': 31}}, df),
+        with Units Sold following the demand response fitted on the sales data df
+        (see backend/scenarios.py)
+        """
+        from scenarios import SCENARIO_LEVERS, score_scenarios
+        from promotion_optimizer import demand_response
+        slopes = dict(zip(SCENARIO_LEVERS, demand_response(df, SCENARIO_LEVERS)))
+        return score_scenarios(base, ranges, self.model, self.scaler_X, self.scaler_y, self.feature_names,
+                               slopes=slopes, top=top)
+
     # Visualization methods
     def visualize_metrics(self, metrics_dict, save_dir='model_visualizations'):
 
@@ -379,19 +465,11 @@ def feature_importance_plot(model, X, y, feature_names, n_repeats=10,
     """
     os.makedirs(save_dir, exist_ok=True)
     
-    # Set up model for scikit-learn compatibility
-    keras_reg = KerasRegressor(
-        model=model.model,
-        scaler_X=model.scaler_X,
-        scaler_y=model.scaler_y
-    )
-    
-    # Calculate importance by testing each feature
+    # Shuffle every feature n_repeats times and score all copies in a few large batches
     result = permutation_importance(
-        keras_reg, X, y, 
+        model.model, model.scaler_X, model.scaler_y, X, y,
         n_repeats=n_repeats,  # Number of shuffle tests per feature
-        random_state=random_state,
-        n_jobs=-1  # Use all CPU cores
+        random_state=random_state
     )
     
     # Organize results
@@ -423,12 +501,12 @@ def feature_importance_plot(model, X, y, feature_names, n_repeats=10,
     print(f"Saved feature importance to {save_dir}")
     return importance_df
 
-def main():
+def main(solver='sgd'):
     sales_predictor = SalesPredictionModel()
     X, y = sales_predictor.load_data("new_blk8_cafe_sales_2024.csv")
 
     if X is not None and y is not None:
-        history, X_test, y_test = sales_predictor.train_model(X, y)
+        history, X_test, y_test = sales_predictor.train_model(X, y, solver=solver)
 
         performance = sales_predictor.evaluate_model(X_test, y_test)
         print("\n🏆 Model Performance:")
@@ -457,4 +535,5 @@ def main():
         print(f"Predicted Sales: {predicted_sales:.2f}")
 
 if __name__ == "__main__":
-    main()
+    # python sales_prediction.py [sgd|lstsq]
+    main(sys.argv[1] if len(sys.argv) > 1 else 'sgd')
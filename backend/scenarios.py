@@ -0,0 +1,145 @@
+"""
+What-if scenarios: a base scenario with value ranges for some levers.
+
+A request names a base scenario (feature values, missing ones are 0 as in
+predict_sales) and values for any of SCENARIO_LEVERS, each either a list or
+{"min": ..., "max": ..., "steps": n}. Every combination of the lever values
+is a scenario: the grid is built with NumPy (meshgrid over the levers, the
+base row tiled underneath) and scored with one batched predict call, so a
+grid of thousands of scenarios costs about one forward pass.
+
+The serving model reads Units Sold, and in the uploads Total Sales is exactly
+Units Sold x Unit Price, so a lever written into the row with Units Sold held
+at its base value only moves sales along that identity. Every scenario's
+Units Sold therefore follows the levers along demand slopes fitted on the
+upload (promotion_optimizer.demand_response): base units + slopes . (levers -
+base levers). Unit Price is not a lever: the uploads have one price per
+product, so there is no price response to fit and a price sweep would only
+scale the identity.
+
+Grids are capped at MAX_SCENARIOS rows and MAX_LEVER_VALUES values per lever.
+"""
+import os
+
+import numpy as np
+
+SCENARIO_LEVERS = ["Discount Applied (%)", "Ad Spend (₱)", "Foot Traffic"]
+DEMAND = "Units Sold"
+PRICE = "Unit Price"
+MAX_SCENARIOS = int(os.getenv("SCENARIO_MAX_GRID", "50000"))
+MAX_LEVER_VALUES = 500
+
+
+def lever_values(lever, spec):
+    """The values to try for one lever: a list, a single number or {"min", "max", "steps"}"""
+    if isinstance(spec, dict):
+        try:
+            low, high, steps = float(spec["min"]), float(spec["max"]), int(spec.get("steps", 10))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{lever}: a range needs numeric 'min', 'max' and 'steps'")
+        if steps > MAX_LEVER_VALUES:
+            raise ValueError(f"{lever}: at most {MAX_LEVER_VALUES} values per lever, got {steps}")
+        values = np.linspace(low, high, max(steps, 0))
+    else:
+        try:
+            values = np.atleast_1d(np.asarray(spec, dtype=float))
+        except (TypeError, ValueError):
+            raise ValueError(f"{lever}: values must be numbers")
+
+    if values.ndim != 1 or not len(values):
+        raise ValueError(f"{lever}: give at least one value")
+    if len(values) > MAX_LEVER_VALUES:
+        raise ValueError(f"{lever}: at most {MAX_LEVER_VALUES} values per lever, got {len(values)}")
+    if not np.isfinite(values).all():
+        raise ValueError(f"{lever}: values must be finite")
+    return values
+
+
+def expand_grid(base, ranges, feature_names, slopes=None, max_scenarios=MAX_SCENARIOS):
+    """
+    Feature matrix of every combination of the lever values on top of base,
+    with Units Sold moved along slopes ({lever: units per unit of the lever})
+    when given. Returns (levers, {lever: values}, X DataFrame in
+    feature_names order); rows vary the last lever fastest.
+    """
+    import pandas as pd
+
+    if PRICE in ranges:
+        raise ValueError(
+            f"{PRICE} is not a scenario lever: the uploads have one price per product, so a price "
+            f"sweep would only scale Total Sales = Units Sold x Unit Price; set it in base instead"
+        )
+    unknown = [lever for lever in ranges if lever not in SCENARIO_LEVERS]
+    if unknown:
+        raise ValueError(f"Unknown levers {unknown}; choose from {SCENARIO_LEVERS}")
+    missing = [lever for lever in ranges if lever not in feature_names]
+    if missing:
+        raise ValueError(f"The serving model does not use {missing}")
+
+    levers = [lever for lever in SCENARIO_LEVERS if lever in ranges]
+    values = {lever: lever_values(lever, ranges[lever]) for lever in levers}
+    shape = [len(values[lever]) for lever in levers]
+    count = int(np.prod(shape)) if shape else 1
+    if count > max_scenarios:
+        raise ValueError(f"{count} scenarios requested; the limit is {max_scenarios}")
+
+    try:
+        base_row = np.array([float(base.get(name, 0) or 0) for name in feature_names])
+    except (TypeError, ValueError):
+        raise ValueError("Base scenario values must be numbers")
+
+    X = np.tile(base_row, (count, 1))
+    if levers:
+        mesh = np.meshgrid(*(values[lever] for lever in levers), indexing="ij")
+        for lever, column in zip(levers, mesh):
+            X[:, feature_names.index(lever)] = column.ravel()
+        if slopes and DEMAND in feature_names:
+            demand = feature_names.index(DEMAND)
+            change = sum(
+                slopes.get(lever, 0.0) * (X[:, feature_names.index(lever)] - base_row[feature_names.index(lever)])
+                for lever in levers
+            )
+            X[:, demand] = np.maximum(base_row[demand] + change, 0)
+    return levers, values, pd.DataFrame(X, columns=feature_names)
+
+
+def score_scenarios(base, ranges, model, scaler_X, scaler_y, feature_names, slopes=None,
+                    max_scenarios=MAX_SCENARIOS, top=10):
+    """
+    Predicted sales for every scenario of the grid, in one batch (slopes:
+    {lever: Units Sold per unit of the lever}, see demand_response).
+    Returns {"levers", "values", "shape", "demand", "predictions" (flat,
+    last lever fastest), "base_prediction", "best" (top scenarios by
+    predicted sales, with their units)}.
+    """
+    import pandas as pd
+    from forecast_pipeline import predict_frame
+
+    feature_names = list(feature_names)
+    slopes = {lever: float(slope) for lever, slope in (slopes or {}).items()}
+    levers, values, X = expand_grid(base, ranges, feature_names, slopes, max_scenarios)
+
+    # The base scenario rides along as the last row
+    stacked = pd.concat([X, expand_grid(base, {}, feature_names)[2]], ignore_index=True)
+    predictions = np.clip(predict_frame(stacked, model, scaler_X, scaler_y, batch_size=len(stacked)), 0, None)
+    base_prediction, predictions = float(predictions[-1]), predictions[:-1]
+
+    best = np.argsort(predictions)[::-1][:top]
+    units = X[DEMAND] if DEMAND in X.columns else None
+    return {
+        "levers": levers,
+        "values": {lever: values[lever].tolist() for lever in levers},
+        "shape": [len(values[lever]) for lever in levers],
+        "demand": {lever: slopes.get(lever, 0.0) for lever in levers},
+        "count": len(predictions),
+        "predictions": predictions.tolist(),
+        "base_prediction": base_prediction,
+        "best": [
+            {
+                **{lever: float(X[lever].iloc[row]) for lever in levers},
+                **({"units": float(units.iloc[row])} if units is not None else {}),
+                "predicted_sales": float(predictions[row])
+            }
+            for row in best
+        ]
+    }
@@ -0,0 +1,148 @@
+"""
+Per-category and per-product models next to the global one.
+
+training/segment_models.py writes a folder like:
+
+    segment_models/
+        index.json
+        category/iced-coffee/sales_model.spmb
+        product/spanish-latte/sales_model.spmb
+
+index.json lists every segment model that beat the global model on its own
+rows ({"category": {"Iced Coffee": {"dir": "category/iced-coffee", ...}}, ...}).
+SegmentRouter sends each row to its product's model, else its category's
+model, else the global model, and runs one predict per model in use.
+"""
+import os
+import json
+import logging
+
+from forecast_pipeline import predict_frame
+
+CATEGORY_PREFIX = "Category_"
+
+
+def row_categories(df):
+    """Category name of every row from the one-hot Category_* columns (None when there is none)"""
+    import numpy as np
+
+    columns = [c for c in df.columns if c.startswith(CATEGORY_PREFIX)]
+    if not columns:
+        return np.full(len(df), None, dtype=object)
+    one_hot = df[columns].fillna(0).to_numpy()
+    names = np.array([c[len(CATEGORY_PREFIX):] for c in columns], dtype=object)
+    return np.where(one_hot.max(axis=1) > 0, names[one_hot.argmax(axis=1)], None)
+
+
+class SegmentRouter:
+    """Routes forecast rows to segment models; empty (everything global) until load() finds models"""
+
+    def __init__(self, segments_dir):
+        self.segments_dir = segments_dir
+        self.models = {"product": {}, "category": {}}  # kind -> segment name -> LoadedModel
+
+    def load(self, service):
+        """Build every model listed in index.json with service.build (same warm-up as the global model)"""
+        from model_bundle import load_artifacts
+
+        index_path = os.path.join(self.segments_dir, "index.json")
+        if not os.path.exists(index_path):
+            return
+
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+        models = {"product": {}, "category": {}}
+        for kind in models:
+            for name, entry in index.get(kind, {}).items():
+                path = os.path.join(self.segments_dir, entry["dir"])
+                try:
+                    models[kind][name] = service.build(load_artifacts(path), source=path)
+                except Exception as e:
+                    logging.warning(f"⚠️ Skipping {kind} model for {name}: {e}")
+
+        self.models = models
+        logging.info(
+            f"✅ Loaded {len(models['product'])} product and {len(models['category'])} category models"
+        )
+
+    def status(self):
+        return {kind: sorted(models) for kind, models in self.models.items()}
+
+    def route(self, df):
+        """Model key of every row: ("product", name), ("category", name) or ("global", None)"""
+        products = self.models["product"]
+        categories = self.models["category"]
+        row_category = row_categories(df) if categories else [None] * len(df)
+
+        keys = []
+        for product, category in zip(df["Product Name"], row_category):
+            if product in products:
+                keys.append(("product", product))
+            elif category in categories:
+                keys.append(("category", category))
+            else:
+                keys.append(("global", None))
+        return keys
+
+    def predict(self, df, X, model, scaler_X, scaler_y):
+        """
+        Predictions for every row of X (built from df), one batch per model.
+        model / scalers are the global version used for unrouted rows.
+        """
+        import numpy as np
+        import pandas as pd
+
+        if not (self.models["product"] or self.models["category"]):
+            return predict_frame(X, model, scaler_X, scaler_y)
+
+        keys = pd.Series(self.route(df))
+        predictions = np.empty(len(X))
+        for key, rows in keys.groupby(keys).groups.items():
+            rows = np.asarray(rows)
+            kind, name = key
+            if kind == "global":
+                predictions[rows] = predict_frame(X.iloc[rows], model, scaler_X, scaler_y)
+            else:
+                segment = self.models[kind][name]
+                X_segment = X.iloc[rows].reindex(columns=segment.feature_names, fill_value=0)
+                predictions[rows] = predict_frame(X_segment, segment.model, segment.scaler_X, segment.scaler_y)
+        return predictions
+
+    def sample_predictions(self, df, X, predictions, model, scaler_X, scaler_y, residuals=None, seed=0):
+        """
+        (samples, rows) interval samples where every row's spread comes from
+        the model that predicted it: its stored residuals, else dropout through
+        it (prediction_intervals.sample_predictions). None when a model in use
+        has neither.
+        """
+        import numpy as np
+        import pandas as pd
+        from prediction_intervals import sample_predictions
+
+        predictions = np.asarray(predictions, dtype=float)
+        if not (self.models["product"] or self.models["category"]):
+            return sample_predictions(X, predictions, model, scaler_X, scaler_y, residuals, seed=seed)
+
+        keys = pd.Series(self.route(df))
+        samples = None
+        for key, rows in keys.groupby(keys).groups.items():
+            rows = np.asarray(rows)
+            kind, name = key
+            if kind == "global":
+                group = sample_predictions(
+                    X.iloc[rows], predictions[rows], model, scaler_X, scaler_y, residuals, seed=seed
+                )
+            else:
+                segment = self.models[kind][name]
+                group = sample_predictions(
+                    X.iloc[rows].reindex(columns=segment.feature_names, fill_value=0), predictions[rows],
+                    segment.model, segment.scaler_X, segment.scaler_y,
+                    (segment.metadata or {}).get("residual_quantiles"), seed=seed
+                )
+            if group is None:
+                return None
+            if samples is None:
+                samples = np.empty((len(group), len(predictions)))
+            samples[:, rows] = group
+        return samples
@@ -38,6 +38,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     // Global state variables to store application data
     let predictions = []; // Array to store sales predictions
+    let forecastDates = []; // Date (YYYY-MM-DD) of each prediction
     let decisions = []; // Array to store business decisions/recommendations
     let currentPage = 0; // Current page number for pagination
     const itemsPerPage = 3; // Number of decisions to show per page
@@ -216,6 +217,12 @@ document.addEventListener("DOMContentLoaded", () => {
         
         // Show loading state
         showLoading("Generating forecast...");
+
+        // Stream results when the browser supports Server-Sent Events
+        if (window.EventSource) {
+            streamForecast();
+            return;
+        }
         
         // Send request to generate forecast
         fetch("/generate_forecast", {
@@ -233,6 +240,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
             // Update application state with new data
             predictions = data.predictions || [];
+            forecastDates = data.dates || [];
             decisions = data.decisions || [];
             
             // Update product list if provided
@@ -246,27 +254,7 @@ document.addEventListener("DOMContentLoaded", () => {
             updateDecisions();
             updateTotalSales();
             updateProductBadges();
-            
-            // Enable export functionality
-            document.getElementById('export-btn').disabled = false;
-            // Show the toggle datalabels button
-            if (toggleDataLabelsBtn) toggleDataLabelsBtn.classList.remove('hidden');
-            
-            showToast("Forecast generated successfully!", 'success');
-
-            document.getElementById('forecastChart-legend').classList.remove('hidden');
-            document.getElementById('predictionsChart-legend').classList.remove('hidden');
-            toggleDataLabelsBtn.innerHTML = '<span>👁️</span> Hide Values List';
-
-            // Disable and hide threshold and upload buttons after forecast is generated
-            document.getElementById('threshold-btn').disabled = true;
-            // Hide upload button wrapper
-            const uploadWrapper = uploadBtn.closest('.file-upload-wrapper');
-            if (uploadWrapper) {
-                uploadBtn.disabled = true;
-                uploadWrapper.classList.add('disabled');
-                uploadWrapper.style.display = 'none';
-            }
+            finishForecast();
         })
         .catch(error => {
             console.error(error);
@@ -277,6 +265,89 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     });
 
+    // Receives the forecast over SSE and renders each chunk as soon as it arrives
+    function streamForecast() {
+        const params = new URLSearchParams({ product: selectedProduct });
+        const source = new EventSource(`/generate_forecast_stream?${params}`);
+        let received = false;
+
+        // Reset state so chunks are appended to a clean forecast
+        predictions = [];
+        forecastDates = [];
+        decisions = [];
+        currentPage = 0;
+
+        source.addEventListener("summary", (event) => {
+            const data = JSON.parse(event.data);
+            received = true;
+
+            // Update product list as soon as the data summary is known
+            if (data.product_list) {
+                productList = ["all", ...data.product_list];
+                updateProductDropdown();
+            }
+            updateProductBadges();
+            showLoading(`Generating ${data.forecast_type} forecast (${data.forecast_days} days)...`);
+        });
+
+        source.addEventListener("predictions", (event) => {
+            const data = JSON.parse(event.data);
+            predictions = predictions.concat(data.values);
+            forecastDates = forecastDates.concat(data.dates || []);
+            hideLoading();
+            updateCharts();
+            updateTotalSales();
+        });
+
+        source.addEventListener("decisions", (event) => {
+            const data = JSON.parse(event.data);
+            decisions = decisions.concat(data.items);
+            updateDecisions();
+        });
+
+        source.addEventListener("done", () => {
+            source.close();
+            hideLoading();
+            finishForecast();
+        });
+
+        // Server-side failures arrive as an "error" event with a JSON body,
+        // connection failures as a plain error event without data
+        source.addEventListener("error", (event) => {
+            source.close();
+            hideLoading();
+            if (event.data) {
+                showToast(JSON.parse(event.data).error, 'error');
+            } else if (!received) {
+                showToast("Failed to generate forecast", 'error');
+            }
+        });
+    }
+
+    // Enables export and locks the inputs once a forecast has been fully received
+    function finishForecast() {
+        // Enable export functionality
+        document.getElementById('export-btn').disabled = false;
+        // Show the toggle datalabels button
+        if (toggleDataLabelsBtn) toggleDataLabelsBtn.classList.remove('hidden');
+        
+        showToast("Forecast generated successfully!", 'success');
+
+        document.getElementById('forecastChart-legend').classList.remove('hidden');
+        document.getElementById('predictionsChart-legend').classList.remove('hidden');
+        toggleDataLabelsBtn.innerHTML = '<span>👁️</span> Hide Values List';
+
+        // Disable and hide threshold and upload buttons after forecast is generated
+        document.getElementById('threshold-btn').disabled = true;
+        // Hide upload button wrapper
+        const uploadWrapper = uploadBtn.closest('.file-upload-wrapper');
+        if (uploadWrapper) {
+            uploadBtn.disabled = true;
+            uploadWrapper.classList.add('disabled');
+            uploadWrapper.style.display = 'none';
+        }
+    }
+
     // Add event listener for report export
     document.getElementById('export-btn').addEventListener("click", () => {
         // Validate that forecast data exists
@@ -303,6 +374,7 @@ document.addEventListener("DOMContentLoaded", () => {
             .then(data => {
                 // Reset all state variables
                 predictions = [];
+                forecastDates = [];
                 decisions = [];
                 currentPage = 0;
                 productList = ["all"];
@@ -425,6 +497,11 @@ document.addEventListener("DOMContentLoaded", () => {
         updateComparisonCharts();
     }
 
+    // Label of the idx-th forecast day: its date when the server sent one
+    function dayLabel(idx) {
+        return forecastDates[idx] || `Day ${idx + 1}`;
+    }
+
     // Creates/updates the forecast line chart
     function updateForecastChart() {
         const ctx = document.getElementById("forecastChart").getContext("2d");
@@ -438,7 +515,7 @@ document.addEventListener("DOMContentLoaded", () => {
         forecastChart = new Chart(ctx, {
             type: "line",
             data: {
-                labels: predictions.map((_, i) => `Day ${i + 1}`),
+                labels: predictions.map((_, i) => dayLabel(i)),
                 datasets: [
                     {
                         label: selectedProduct === "all" ? "All Products" : selectedProduct,
@@ -536,7 +613,7 @@ document.addEventListener("DOMContentLoaded", () => {
             return;
         }
         legendDiv.innerHTML = predictions.map((value, idx) =>
-            `<span class="legend-item">Day ${idx + 1}: ₱${value.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}</span>`
+            `<span class="legend-item">${dayLabel(idx)}: ₱${value.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}</span>`
         ).join('');
     }
 
@@ -553,7 +630,7 @@ document.addEventListener("DOMContentLoaded", () => {
         predictionsChart = new Chart(ctx, {
             type: "bar",
             data: {
-                labels: predictions.map((_, i) => `Day ${i + 1}`),
+                labels: predictions.map((_, i) => dayLabel(i)),
                 datasets: [
                     {
                         label: selectedProduct === "all" ? "All Products" : selectedProduct,
@@ -645,7 +722,7 @@ document.addEventListener("DOMContentLoaded", () => {
             return;
         }
         legendDiv.innerHTML = predictions.map((value, idx) =>
-            `<span class="legend-item">Day ${idx + 1}: ₱${value.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}</span>`
+            `<span class="legend-item">${dayLabel(idx)}: ₱${value.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}</span>`
         ).join('');
     }
 
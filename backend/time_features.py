@@ -0,0 +1,165 @@
+"""
+Lag, rolling-window and calendar features for the daily sales series.
+
+Used by training/train.py (python train.py --time-features) and by the web
+app when the serving model was trained with them.
+
+For every row (one product on one day) it adds:
+- Sales Lag 1 / 7: the product's sales 1 and 7 rows (days) earlier
+- Sales Rolling Mean / Std 7 and 28: over the product's previous 7 and 28
+  rows, not counting the row itself
+- Day of Week Sin / Cos, Month Sin / Cos: cyclical calendar encodings
+
+add_time_features() works on a whole upload at once: rows are sorted by
+product and date, and lags and windows come from shifted indexes and
+cumulative sums within each product, with no per-product loop.
+TimeFeatureState keeps only the last MAX_WINDOW sales of every product, so
+features for newly appended days are computed from the new rows alone.
+Lags and windows count rows, so a missing day shortens the look-back by one.
+"""
+import numpy as np
+
+TARGET = "Total Sales"
+LAGS = (1, 7)
+WINDOWS = (7, 28)
+MAX_WINDOW = max(max(LAGS), max(WINDOWS))
+
+CALENDAR_FEATURES = ["Day of Week Sin", "Day of Week Cos", "Month Sin", "Month Cos"]
+WINDOW_FEATURES = (
+    [f"Sales Lag {lag}" for lag in LAGS]
+    + [f"Sales Rolling {stat} {window}" for window in WINDOWS for stat in ("Mean", "Std")]
+)
+TIME_FEATURES = WINDOW_FEATURES + CALENDAR_FEATURES
+
+
+def uses_time_features(feature_names):
+    return any(name in TIME_FEATURES for name in feature_names)
+
+
+def calendar_features(dates):
+    """Cyclical day-of-week and month encodings for a DatetimeIndex or datetime Series"""
+    import pandas as pd
+
+    dates = pd.DatetimeIndex(dates)
+    day_angle = 2 * np.pi * dates.dayofweek.to_numpy() / 7
+    month_angle = 2 * np.pi * (dates.month.to_numpy() - 1) / 12
+    return {
+        "Day of Week Sin": np.sin(day_angle),
+        "Day of Week Cos": np.cos(day_angle),
+        "Month Sin": np.sin(month_angle),
+        "Month Cos": np.cos(month_angle)
+    }
+
+
+def window_features(keys, values):
+    """
+    Lag and rolling features for rows sorted by product key (then date).
+    values may hold NaN for unknown sales; those are skipped by the windows.
+    Rows without enough history get NaN lags and means (std 0 for one value).
+    """
+    n = len(values)
+    rows = np.arange(n)
+    starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1] if n else np.array([], dtype=int)
+    group_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+    position = rows - group_start
+
+    features = {}
+    for lag in LAGS:
+        features[f"Sales Lag {lag}"] = np.where(position >= lag, values[np.maximum(rows - lag, 0)], np.nan)
+
+    # Window sums from cumulative sums: rows [lo, i) of the same product
+    known = ~np.isnan(values)
+    filled = np.where(known, values, 0.0)
+    sums = np.r_[0.0, np.cumsum(filled)]
+    squares = np.r_[0.0, np.cumsum(filled ** 2)]
+    counts = np.r_[0, np.cumsum(known)]
+    for window in WINDOWS:
+        lo = np.maximum(rows - window, group_start)
+        count = counts[rows] - counts[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (sums[rows] - sums[lo]) / count
+            variance = (squares[rows] - squares[lo] - count * mean ** 2) / (count - 1)
+        features[f"Sales Rolling Mean {window}"] = np.where(count > 0, mean, np.nan)
+        features[f"Sales Rolling Std {window}"] = np.where(
+            count > 1, np.sqrt(np.clip(variance, 0, None)), np.where(count == 1, 0.0, np.nan)
+        )
+    return features
+
+
+def add_time_features(df, target=TARGET):
+    """Copy of df (with Date parsed, Product Name and target) plus every TIME_FEATURES column"""
+    import pandas as pd
+
+    df = df.copy()
+    keys = pd.factorize(df["Product Name"])[0]
+    dates = df["Date"].to_numpy()
+    order = np.lexsort((dates, keys))
+
+    values = df[target].to_numpy(dtype=float) if target in df.columns else np.full(len(df), np.nan)
+    features = window_features(keys[order], values[order])
+    for name, sorted_values in features.items():
+        column = np.empty(len(df))
+        column[order] = sorted_values
+        df[name] = column
+
+    for name, column in calendar_features(df["Date"]).items():
+        df[name] = column
+    return df
+
+
+class TimeFeatureState:
+    """
+    The last MAX_WINDOW sales of every product. features() computes the time
+    features of new rows from those tails plus the new rows; append() also
+    rolls the new sales into the tails.
+    """
+
+    def __init__(self, target=TARGET):
+        self.target = target
+        self.tails = {}  # product -> array of its latest sales, oldest first
+
+    @classmethod
+    def from_frame(cls, df, target=TARGET):
+        state = cls(target)
+        state.append(df)
+        return state
+
+    def features(self, df):
+        """DataFrame of TIME_FEATURES for the rows of df (same index), using the stored history"""
+        import pandas as pd
+
+        products = df["Product Name"].to_numpy()
+        codes, names = pd.factorize(products)
+        values = df[self.target].to_numpy(dtype=float) if self.target in df.columns else np.full(len(df), np.nan)
+
+        tails = [self.tails.get(name, np.empty(0)) for name in names]
+        tail_keys = np.repeat(np.arange(len(names)), [len(tail) for tail in tails])
+        tail_values = np.concatenate(tails) if tails else np.empty(0)
+
+        # History first, then the new rows by date, product by product
+        keys = np.r_[tail_keys, codes]
+        is_new = np.r_[np.zeros(len(tail_keys), dtype=bool), np.ones(len(df), dtype=bool)]
+        sequence = np.r_[np.arange(len(tail_keys)), df["Date"].to_numpy().argsort(kind="stable").argsort()]
+        order = np.lexsort((sequence, is_new, keys))
+
+        computed = window_features(keys[order], np.r_[tail_values, values][order])
+        new_rows = order[is_new[order]] - len(tail_keys)
+
+        result = pd.DataFrame(index=df.index, columns=TIME_FEATURES, dtype=float)
+        for name, column in computed.items():
+            ordered = np.empty(len(df))
+            ordered[new_rows] = column[is_new[order]]
+            result[name] = ordered
+        for name, column in calendar_features(df["Date"]).items():
+            result[name] = column
+        return result
+
+    def append(self, df):
+        """Features of the new rows, then keep their sales as the latest history"""
+        features = self.features(df)
+        ordered = df.sort_values("Date", kind="stable")
+        values = ordered[self.target].to_numpy(dtype=float)
+        for product, rows in ordered.groupby("Product Name", sort=False).indices.items():
+            tail = np.r_[self.tails.get(product, np.empty(0)), values[rows]]
+            self.tails[product] = tail[-MAX_WINDOW:]
+        return features
@@ -0,0 +1,191 @@
+"""
+Anomaly checks for uploaded sales files, run while the upload is read.
+
+scan_upload() reads the saved CSV once, in chunks of ANOMALY_CHUNK_ROWS, and
+scores every chunk with vectorized checks:
+- rules: negative units, prices, sales, ad spend or foot traffic, discounts
+  outside 0-100%, dates that do not parse
+- duplicated days: a product with the same date twice (within the chunk or
+  in an earlier one)
+- robust outliers per product: |0.6745 (x - median) / MAD| above ROBUST_Z
+  for Unit Price (price spikes), Units Sold and Total Sales, with the median
+  and MAD of the product's last ANOMALY_WINDOW clean values plus the chunk
+- sales jumps: Total Sales more than ROLLING_Z standard deviations from the
+  product's rolling mean over the previous 28 days (time_features state)
+
+Only clean rows are added to the median / MAD history, so one bad row does
+not shift the baseline of the next. Flagged rows are reported
+("flag", the default) or taken out of the upload and written to the
+quarantine folder ("quarantine", ANOMALY_MODE).
+"""
+import os
+
+import numpy as np
+
+ANOMALY_MODE = os.getenv("ANOMALY_MODE", "flag")
+MODES = ("flag", "quarantine")
+ANOMALY_CHUNK_ROWS = 5000
+ANOMALY_WINDOW = 56
+MIN_HISTORY = 8
+ROBUST_Z = 3.5
+ROLLING_Z = 4.0
+MIN_SPREAD = 0.05  # MAD and std floors, as a fraction of the typical value
+EXAMPLES = 20
+
+NON_NEGATIVE = ["Units Sold", "Unit Price", "Total Sales", "Ad Spend (₱)", "Foot Traffic"]
+ROBUST_COLUMNS = {"Unit Price": "price_spike", "Units Sold": "units_outlier", "Total Sales": "sales_outlier"}
+REASONS = [
+    "negative_value", "discount_out_of_range", "bad_date", "duplicate_day",
+    *ROBUST_COLUMNS.values(), "sales_jump"
+]
+BITS = {reason: 1 << i for i, reason in enumerate(REASONS)}
+
+
+def reason_names(mask):
+    return [reason for reason in REASONS if mask & BITS[reason]]
+
+
+class AnomalyDetector:
+    """Per-product history carried from chunk to chunk; score() returns a reason bitmask per row"""
+
+    def __init__(self):
+        from time_features import TimeFeatureState
+
+        self.seen_days = set()
+        self.tails = {}  # column -> Series of recent clean values indexed by product
+        self.sales_state = TimeFeatureState("Total Sales")
+
+    def score(self, chunk, dates):
+        import pandas as pd
+
+        mask = np.zeros(len(chunk), dtype=np.int64)
+        products = chunk["Product Name"].astype(str).to_numpy()
+
+        for column in NON_NEGATIVE:
+            if column in chunk.columns:
+                mask[(pd.to_numeric(chunk[column], errors="coerce") < 0).to_numpy()] |= BITS["negative_value"]
+        if "Discount Applied (%)" in chunk.columns:
+            discount = pd.to_numeric(chunk["Discount Applied (%)"], errors="coerce")
+            mask[((discount < 0) | (discount > 100)).to_numpy()] |= BITS["discount_out_of_range"]
+
+        valid_date = dates.notna().to_numpy()
+        mask[~valid_date] |= BITS["bad_date"]
+
+        keys = pd.Series(products) + "|" + dates.dt.strftime("%Y-%m-%d").fillna("").to_numpy()
+        duplicate = keys.duplicated().to_numpy() | keys.isin(self.seen_days).to_numpy()
+        mask[duplicate & valid_date] |= BITS["duplicate_day"]
+        self.seen_days.update(keys[valid_date])
+
+        values = {
+            column: pd.Series(pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=float), index=products)
+            for column in ROBUST_COLUMNS if column in chunk.columns
+        }
+        for column, series in values.items():
+            mask[self._robust_outliers(column, series)] |= BITS[ROBUST_COLUMNS[column]]
+
+        if "Total Sales" in values:
+            mask[self._sales_jumps(chunk, dates, valid_date)] |= BITS["sales_jump"]
+
+        # Only clean rows extend the baseline
+        clean = mask == 0
+        for column, series in values.items():
+            history = pd.concat([self.tails.get(column, series.iloc[:0]), series[clean]])
+            self.tails[column] = history.groupby(level=0, sort=False).tail(ANOMALY_WINDOW)
+        return mask
+
+    def _robust_outliers(self, column, series):
+        import pandas as pd
+
+        combined = pd.concat([self.tails.get(column, series.iloc[:0]), series])
+        grouped = combined.groupby(level=0)
+        median = grouped.median()
+        mad = (combined - median.reindex(combined.index).to_numpy()).abs().groupby(level=0).median()
+        count = grouped.count()
+
+        row_median = median.reindex(series.index).to_numpy()
+        spread = np.maximum(mad.reindex(series.index).to_numpy(), MIN_SPREAD * np.abs(row_median))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = 0.6745 * (series.to_numpy() - row_median) / spread
+        enough = count.reindex(series.index).to_numpy() >= MIN_HISTORY
+        return enough & (np.abs(z) > ROBUST_Z)
+
+    def _sales_jumps(self, chunk, dates, valid_date):
+        import pandas as pd
+
+        rows = chunk.loc[valid_date, ["Product Name", "Total Sales"]].assign(Date=dates[valid_date].to_numpy())
+        rows["Total Sales"] = pd.to_numeric(rows["Total Sales"], errors="coerce")
+        features = self.sales_state.append(rows)
+
+        mean = features["Sales Rolling Mean 28"].to_numpy()
+        std = np.maximum(features["Sales Rolling Std 28"].to_numpy(), MIN_SPREAD * np.abs(mean))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (rows["Total Sales"].to_numpy() - mean) / std
+        # At least a week of history
+        enough = features["Sales Lag 7"].notna().to_numpy()
+
+        jumps = np.zeros(len(chunk), dtype=bool)
+        jumps[np.flatnonzero(valid_date)] = enough & (np.abs(z) > ROLLING_Z)
+        return jumps
+
+
+def scan_upload(path, mode=ANOMALY_MODE, chunk_rows=ANOMALY_CHUNK_ROWS, quarantine_dir=None):
+    """
+    Read an uploaded CSV once, checking every chunk as it arrives.
+    Returns (DataFrame of the upload, without quarantined rows, summary dict).
+    In quarantine mode flagged rows are written to quarantine_dir and the file
+    at path is rewritten without them.
+    """
+    import pandas as pd
+
+    if mode not in MODES:
+        raise ValueError(f"ANOMALY_MODE must be one of {MODES}")
+
+    detector = AnomalyDetector()
+    chunks, masks = [], []
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        if "Product Name" in chunk.columns and "Date" in chunk.columns:
+            dates = pd.to_datetime(chunk["Date"], format="%d/%m/%Y", dayfirst=True, errors="coerce")
+            masks.append(detector.score(chunk, dates))
+        else:
+            masks.append(np.zeros(len(chunk), dtype=np.int64))
+        chunks.append(chunk)
+
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    mask = np.concatenate(masks) if masks else np.zeros(0, dtype=np.int64)
+    flagged = np.flatnonzero(mask)
+
+    summary = {
+        "mode": mode,
+        "rows": int(len(df)),
+        "flagged": int(len(flagged)),
+        "quarantined": 0,
+        "by_reason": {reason: int(((mask & bit) > 0).sum()) for reason, bit in BITS.items() if (mask & bit).any()},
+        "by_product": {},
+        "examples": [
+            {
+                "row": int(row) + 2,  # Line number in the file, after the header
+                "product": str(df["Product Name"].iloc[row]) if "Product Name" in df.columns else None,
+                "date": str(df["Date"].iloc[row]) if "Date" in df.columns else None,
+                "reasons": reason_names(int(mask[row]))
+            }
+            for row in flagged[:EXAMPLES]
+        ]
+    }
+    if len(flagged) and "Product Name" in df.columns:
+        counts = df["Product Name"].iloc[flagged].value_counts().head(10)
+        summary["by_product"] = {str(name): int(count) for name, count in counts.items()}
+
+    if mode == "quarantine" and len(flagged):
+        quarantine_dir = quarantine_dir or os.path.join(os.path.dirname(path), "quarantine")
+        os.makedirs(quarantine_dir, exist_ok=True)
+        quarantined = df.iloc[flagged].assign(**{"Anomaly Reasons": [
+            ";".join(reason_names(int(value))) for value in mask[flagged]
+        ]})
+        quarantine_path = os.path.join(quarantine_dir, os.path.basename(path))
+        quarantined.to_csv(quarantine_path, index=False)
+
+        df = df[mask == 0].reset_index(drop=True)
+        df.to_csv(path, index=False)
+        summary["quarantined"] = int(len(flagged))
+        summary["quarantine_file"] = quarantine_path
+    return df, summary
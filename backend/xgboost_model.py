@@ -0,0 +1,115 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+from sales_prediction import SalesPredictionModel
+
+# Where the server looks for it with MODEL_BACKEND=xgboost; built by main(), not kept in git
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sales_prediction_xgboost')
+
+
+class XGBoostSalesModel(SalesPredictionModel):
+    """
+    Gradient-boosted trees behind the SalesPredictionModel interface.
+
+    Uses XGBoost's hist tree method with n_threads threads (None: all cores).
+    Features and target go through the same scalers as the Keras model, so
+    the saved bundle is served by the same code; the trees themselves do not
+    need the scaling.
+    """
+
+    def __init__(self, random_state=42, n_threads=None):
+        super().__init__(random_state)
+        self.random_state = random_state
+        self.n_threads = n_threads
+
+    def create_model(self, input_shape=None, n_estimators=1000, learning_rate=0.05, max_depth=6,
+                     early_stopping_rounds=30):
+        """
+        Create the XGBoost regressor (input_shape is unused, kept for the shared interface)
+        """
+        return xgb.XGBRegressor(
+            tree_method='hist',
+            n_estimators=n_estimators,
+            learning_rate=learning_rate,
+            max_depth=max_depth,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            n_jobs=self.n_threads,
+            random_state=self.random_state,
+            early_stopping_rounds=early_stopping_rounds,
+            eval_metric='rmse'
+        )
+
+    def train_model(self, X, y, test_size=0.2, **params):
+        """
+        Train the boosted trees; 20% of the training rows are used for early stopping
+        """
+        X_scaled = self.scaler_X.fit_transform(X)
+        y_scaled = self.scaler_y.fit_transform(y.values.reshape(-1, 1)).flatten()
+
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_scaled, y_scaled, test_size=test_size, random_state=42
+        )
+        X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=42)
+
+        self.model = self.create_model(X_train.shape[1], **params)
+        self.model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+
+        history = self.model.evals_result()
+        self.history = None  # No Keras history to plot
+        self.metadata.update({
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'model_type': 'xgboost',
+            'tree_method': 'hist',
+            'training_rows': int(X_fit.shape[0]),
+            'test_size': test_size,
+            'n_estimators': int(self.model.n_estimators),
+            'best_iteration': int(self.model.best_iteration),
+            'params': params
+        })
+        return history, X_test, y_test
+
+    def save_model(self, directory=MODEL_DIR, legacy_files=False):
+        """
+        Write the model bundle; there is no legacy layout for XGBoost models
+        """
+        super().save_model(directory, legacy_files=False)
+
+    def load_model(self, directory=MODEL_DIR):
+        return super().load_model(directory)
+
+    def feature_importances(self):
+        """Gain-based importance of every feature, highest first"""
+        booster = self.model.get_booster() if hasattr(self.model, 'get_booster') else self.model.booster
+        gains = booster.get_score(importance_type='gain')
+        scores = np.array([gains.get(f'f{i}', 0.0) for i in range(len(self.feature_names))])
+        order = np.argsort(scores)[::-1]
+        return [(self.feature_names[i], float(scores[i])) for i in order]
+
+
+def main(n_threads=None):
+    sales_predictor = XGBoostSalesModel(n_threads=n_threads)
+    X, y = sales_predictor.load_data("new_blk8_cafe_sales_2024.csv")
+
+    if X is not None and y is not None:
+        history, X_test, y_test = sales_predictor.train_model(X, y)
+
+        performance = sales_predictor.evaluate_model(X_test, y_test)
+        print("\n🏆 Model Performance:")
+        for metric, value in performance.items():
+            print(f"{metric}: {value}")
+
+        print("\nTop features:")
+        for name, gain in sales_predictor.feature_importances()[:5]:
+            print(f"{name}: {gain:.3f}")
+
+        sales_predictor.save_model()
+
+if __name__ == "__main__":
+    # python xgboost_model.py [threads]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
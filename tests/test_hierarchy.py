@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from forecast_pipeline import prepare_forecast_frame
+from hierarchy import METHODS, forecast_hierarchy
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "training", "new_blk8_cafe_sales_2024.csv")
+
+
+@pytest.fixture(scope="module")
+def upload():
+    return prepare_forecast_frame(pd.read_csv(DATA))
+
+
+def synthetic_horizon(df, days=14, seed=0):
+    """Product forecasts well below recent sales, with narrow bands, like a pessimistic model"""
+    rng = np.random.default_rng(seed)
+    products = df["Product Name"].unique()
+    dates = pd.date_range(df["Date"].max() + pd.Timedelta(days=1), periods=days)
+    forecasts = {name: rng.uniform(50, 500, days) for name in products}
+    samples = np.stack([
+        np.stack([forecasts[name] + rng.normal(0, 10, days) for name in products]) for _ in range(50)
+    ])
+    lower, upper = np.quantile(samples, [0.05, 0.95], axis=0)
+    total_lower, total_upper = np.quantile(samples.sum(axis=1), [0.05, 0.95], axis=0)
+    return {
+        "dates": [date.strftime("%Y-%m-%d") for date in dates],
+        "products": forecasts,
+        "total": np.sum(list(forecasts.values()), axis=0),
+        "lower": {"products": dict(zip(products, lower)), "total": total_lower},
+        "upper": {"products": dict(zip(products, upper)), "total": total_upper}
+    }
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_reconciled_points_stay_inside_their_intervals(upload, method):
+    levels = forecast_hierarchy(upload, synthetic_horizon(upload), method)
+
+    assert np.all(levels["lower"]["total"] <= levels["total"])
+    assert np.all(levels["total"] <= levels["upper"]["total"])
+    for name, values in levels["products"].items():
+        assert np.all(levels["lower"]["products"][name] <= values)
+        assert np.all(values <= levels["upper"]["products"][name])
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_levels_add_up(upload, method):
+    levels = forecast_hierarchy(upload, synthetic_horizon(upload), method)
+
+    products = np.sum(list(levels["products"].values()), axis=0)
+    assert np.allclose(levels["total"], products)
+    assert np.allclose(levels["total"], np.sum(list(levels["categories"].values()), axis=0))
+
+
+def test_no_intervals_without_horizon_intervals(upload):
+    horizon = {**synthetic_horizon(upload), "lower": None, "upper": None}
+
+    levels = forecast_hierarchy(upload, horizon, "ols")
+    assert levels["lower"] is None and levels["upper"] is None
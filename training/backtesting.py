@@ -0,0 +1,324 @@
+"""
+Rolling-origin backtest: how the web app's forecasts would have done.
+
+Run from the training folder:
+    python backtesting.py [csv file] [step days] [workers] [model folder] [refit|saved]
+or: python train.py --backtest [args]
+
+How it works:
+1. Forecast origins are placed every `step` days (default 7), from the first
+   date with MIN_HISTORY days of history up to the last date that still has
+   a week of actuals after it
+2. At every origin the data is cut off, and the future rows for every
+   product are built exactly as /generate_forecast builds them (horizon.py),
+   for the longest horizon (90 days); the weekly and monthly forecasts are
+   its first 7 and 30 days
+3. The origins are split into windows of REFIT_EVERY origins, scored in
+   parallel worker processes (see worker_pool.py). In "refit" mode (the
+   default) every window first trains a fresh network (the model folder's
+   features and hyperparameters) on the data up to its first origin, so no
+   forecast is made by a model that saw the days it predicts. Each window
+   stacks the rows of all its origins and runs them through the model in
+   one batch (models with time features are scored day by day, as in the app)
+4. Predictions are joined to the actual Total Sales by product and date, and
+   MAE / MAPE are reported per product ("all" is the daily total of every
+   product), forecast type and days ahead
+
+"saved" mode replays the saved model as it is. Only origins after the last
+date of its training data (metadata "training_data_end") are kept; a model
+without that date gets a loud warning, since its scores are likely in-sample.
+
+The results go to BACKTEST_RESULTS_FILE (per product and forecast type) and
+BACKTEST_HORIZON_FILE (per day ahead). Only the global model is replayed,
+not the per-product or per-category segment models.
+"""
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from worker_pool import spawn_pool
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sales_prediction_model')
+BACKTEST_RESULTS_FILE = 'backtest_results.csv'
+BACKTEST_HORIZON_FILE = 'backtest_by_horizon.csv'
+
+TARGET = 'Total Sales'
+FORECAST_TYPES = {'weekly': 7, 'monthly': 30, 'quarterly': 90}
+MIN_HISTORY = 28
+MIN_ACTUAL_DAYS = 7
+MODES = ('refit', 'saved')
+REFIT_EVERY = 4  # Origins per window, each window trains its own model
+REFIT_EPOCHS = 50
+REFIT_PATIENCE = 10
+
+# Set in every worker by _init_worker
+_worker = {}
+
+
+def load_sales(csv_path):
+    """The CSV with dates parsed the way the web app parses uploads"""
+    from forecast_pipeline import prepare_forecast_frame
+
+    return prepare_forecast_frame(pd.read_csv(csv_path))
+
+
+def forecast_origins(dates, step=7, min_history=MIN_HISTORY, min_actual_days=MIN_ACTUAL_DAYS):
+    """Origin dates every `step` days with enough history before and actuals after"""
+    first, last = dates.min(), dates.max()
+    start = first + pd.Timedelta(days=min_history - 1)
+    end = last - pd.Timedelta(days=min_actual_days)
+    if start > end:
+        return pd.DatetimeIndex([])
+    return pd.date_range(start, end, freq=f'{step}D')
+
+
+def _init_worker(cores, csv_path, model_dir, mode):
+    from model_bundle import load_artifacts
+
+    bundle = load_artifacts(model_dir)
+    _worker.update({
+        'df': load_sales(csv_path),
+        'feature_names': bundle.feature_names,
+        'hyperparameters': bundle.metadata.get('hyperparameters') or {}
+    })
+    if mode == 'saved':
+        _worker.update({'model': bundle.build_model(), 'scaler_X': bundle.scaler_X, 'scaler_y': bundle.scaler_y})
+
+
+def fit_window_model(history, feature_names, hyperparameters, epochs=REFIT_EPOCHS):
+    """A fresh network and scalers trained only on history; returns (model, scaler_X, scaler_y)"""
+    import tensorflow as tf
+    from sklearn.model_selection import train_test_split
+    from train import SalesPredictionModel
+    from time_features import uses_time_features, add_time_features
+
+    if uses_time_features(feature_names):
+        history = add_time_features(history)
+    X = history[feature_names]
+    X = X.fillna(X.mean())
+    y = history[TARGET].to_numpy().reshape(-1, 1)
+
+    predictor = SalesPredictionModel()
+    X_scaled = predictor.scaler_X.fit_transform(X)
+    y_scaled = predictor.scaler_y.fit_transform(y).ravel()
+    X_fit, X_val, y_fit, y_val = train_test_split(X_scaled, y_scaled, test_size=0.2, random_state=42)
+
+    model = predictor.create_model(X.shape[1], **hyperparameters)
+    early_stopping = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=REFIT_PATIENCE, restore_best_weights=True
+    )
+    model.fit(
+        X_fit, y_fit, validation_data=(X_val, y_val),
+        epochs=epochs, batch_size=32, callbacks=[early_stopping], verbose=0
+    )
+    return model, predictor.scaler_X, predictor.scaler_y
+
+
+def run_window(window, origins, mode='refit', epochs=REFIT_EPOCHS, days=max(FORECAST_TYPES.values())):
+    """
+    Forecast `days` days from every origin in the window, after training the
+    window's model on the data up to its first origin (refit mode).
+    Returns one row per origin, product and forecast date with the prediction.
+    """
+    from horizon import build_future_frame, forecast_horizon
+    from forecast_pipeline import predict_frame
+    from time_features import uses_time_features
+
+    started = time.perf_counter()
+    df, feature_names = _worker['df'], _worker['feature_names']
+    if mode == 'refit':
+        model, scaler_X, scaler_y = fit_window_model(
+            df[df['Date'] <= origins[0]], feature_names, _worker['hyperparameters'], epochs
+        )
+    else:
+        model, scaler_X, scaler_y = _worker['model'], _worker['scaler_X'], _worker['scaler_y']
+
+    frames = []
+    for origin in origins:
+        history = df[df['Date'] <= origin]
+        future = build_future_frame(history, feature_names, days)
+        future['Origin'] = origin
+        future['Days Ahead'] = (future['Date'] - origin).dt.days
+        if uses_time_features(feature_names):
+            # Lag features need each day's predictions first, so no stacking across origins
+            horizon = forecast_horizon(history, feature_names, days, model, scaler_X, scaler_y, intervals=False)
+            future['Predicted'] = np.concatenate(list(horizon['products'].values()))
+        frames.append(future)
+
+    stacked = pd.concat(frames, ignore_index=True)
+    if 'Predicted' not in stacked.columns:
+        stacked['Predicted'] = predict_frame(stacked[feature_names], model, scaler_X, scaler_y)
+
+    return {
+        'window': window,
+        'origins': len(origins),
+        'rows': len(stacked),
+        'seconds': round(time.perf_counter() - started, 2),
+        'predictions': stacked[['Origin', 'Product Name', 'Date', 'Days Ahead', 'Predicted']]
+    }
+
+
+def join_actuals(predictions, df):
+    """Predictions that have an actual Total Sales for their product and date"""
+    actuals = df.groupby(['Product Name', 'Date'])[TARGET].sum().rename('Actual')
+    joined = predictions.join(actuals, on=['Product Name', 'Date'], how='inner')
+
+    # Daily totals of every product, over the products that have actuals that day
+    totals = joined.groupby(['Origin', 'Date', 'Days Ahead'], as_index=False)[['Predicted', 'Actual']].sum()
+    totals['Product Name'] = 'all'
+    return pd.concat([joined, totals], ignore_index=True)
+
+
+def error_metrics(frame):
+    """MAE and MAPE (over days with sales) of a frame of Predicted and Actual"""
+    errors = (frame['Predicted'] - frame['Actual']).abs()
+    sold = frame['Actual'] > 0
+    return pd.Series({
+        'MAE': errors.mean(),
+        'MAPE': (errors[sold] / frame.loc[sold, 'Actual']).mean() * 100,
+        'bias': (frame['Predicted'] - frame['Actual']).mean(),
+        'forecasts': frame['Origin'].nunique(),
+        'days': len(frame)
+    })
+
+
+def score(joined):
+    """(per product and forecast type, per product and day ahead) metric tables"""
+    typed = [
+        joined[joined['Days Ahead'] <= days].assign(**{'Forecast Type': forecast_type})
+        for forecast_type, days in FORECAST_TYPES.items()
+    ]
+    by_type = (
+        pd.concat(typed, ignore_index=True)
+        .groupby(['Product Name', 'Forecast Type'], sort=False)
+        .apply(error_metrics, include_groups=False)
+        .reset_index()
+    )
+    by_horizon = (
+        joined.groupby(['Product Name', 'Days Ahead'])
+        .apply(error_metrics, include_groups=False)
+        .reset_index()
+    )
+    return by_type, by_horizon
+
+
+def out_of_sample_origins(origins, model_dir):
+    """The origins after the saved model's training data, warning when that cannot be checked"""
+    from model_bundle import load_artifacts
+
+    data_end = load_artifacts(model_dir).metadata.get('training_data_end')
+    if data_end is None:
+        print("WARNING: the saved model does not record where its training data ends; "
+              "it has probably seen these dates, so the scores below are likely in-sample. "
+              "Use refit mode for an honest backtest.")
+        return origins
+
+    kept = origins[origins >= pd.Timestamp(data_end)]
+    if len(kept) < len(origins):
+        print(f"Skipping {len(origins) - len(kept)} origin(s) before {data_end}, "
+              f"the end of the saved model's training data")
+    if not len(kept):
+        raise ValueError(f"Every origin is inside the saved model's training data (up to {data_end}); "
+                         "use refit mode")
+    return kept
+
+
+def run_backtest(csv_path, step=7, workers=None, model_dir=DEFAULT_MODEL_DIR, mode='refit',
+                 refit_every=REFIT_EVERY, epochs=REFIT_EPOCHS,
+                 results_file=BACKTEST_RESULTS_FILE, horizon_file=BACKTEST_HORIZON_FILE):
+    """
+    Replay forecasts from every origin in parallel windows.
+    Returns (per product and forecast type table, per day ahead table, summary dict).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Backtest mode must be one of {MODES}")
+
+    df = load_sales(csv_path)
+    origins = forecast_origins(df['Date'], step)
+    if not len(origins):
+        raise ValueError(f"Not enough history in {csv_path} for a backtest")
+    if mode == 'saved':
+        origins = out_of_sample_origins(origins, model_dir)
+
+    windows = [origins[i:i + refit_every] for i in range(0, len(origins), refit_every)]
+    workers = workers or min(len(windows), os.cpu_count() or 1)
+    print(f"Backtesting {len(origins)} origins every {step} days in {len(windows)} window(s) "
+          f"({mode} mode) on {workers} worker(s)...")
+
+    started = time.perf_counter()
+    results = []
+    with spawn_pool(workers, initializer=_init_worker, initargs=(csv_path, model_dir, mode)) as pool:
+        futures = [
+            pool.submit(run_window, i, list(window), mode, epochs) for i, window in enumerate(windows, 1)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"Window {result['window']}: {result['origins']} origins, "
+                  f"{result['rows']} rows in {result['seconds']}s")
+    wall_seconds = time.perf_counter() - started
+
+    predictions = pd.concat([result['predictions'] for result in results], ignore_index=True)
+    by_type, by_horizon = score(join_actuals(predictions, df))
+    by_type.to_csv(results_file, index=False)
+    by_horizon.to_csv(horizon_file, index=False)
+
+    summary = {
+        'mode': mode,
+        'origins': len(origins),
+        'first_origin': origins[0].strftime('%Y-%m-%d'),
+        'last_origin': origins[-1].strftime('%Y-%m-%d'),
+        'windows': len(windows),
+        'workers': workers,
+        'window_seconds': float(sum(result['seconds'] for result in results)),
+        'wall_seconds': round(wall_seconds, 2)
+    }
+    return by_type, by_horizon, summary
+
+
+def print_report(by_type, by_horizon, summary):
+    print(f"\nBacktest over {summary['origins']} origins "
+          f"({summary['first_origin']} to {summary['last_origin']}, {summary['mode']} mode):")
+
+    overall = by_type[by_type['Product Name'] == 'all'].set_index('Forecast Type')
+    print("\nAll products (daily total):")
+    print(overall[['MAE', 'MAPE', 'bias', 'forecasts', 'days']].round(2).to_string())
+
+    products = by_type[by_type['Product Name'] != 'all']
+    print("\nPer product, averaged over products:")
+    print(products.groupby('Forecast Type', sort=False)[['MAE', 'MAPE']].mean().round(2).to_string())
+
+    weekly = products[products['Forecast Type'] == 'weekly'].sort_values('MAPE')
+    print("\nWeekly forecasts, best and worst products by MAPE:")
+    print(pd.concat([weekly.head(3), weekly.tail(3)])[['Product Name', 'MAE', 'MAPE']].round(2).to_string(index=False))
+
+    total = by_horizon[by_horizon['Product Name'] == 'all']
+    print("\nDaily total MAPE by days ahead:")
+    for days in (1, 7, 14, 30, 60, 90):
+        row = total[total['Days Ahead'] == days]
+        if len(row):
+            print(f"- {days} days: {row['MAPE'].iloc[0]:.2f}% ({int(row['forecasts'].iloc[0])} forecasts)")
+
+    print(f"\nWindows took {summary['window_seconds']:.1f}s in total, "
+          f"finished in {summary['wall_seconds']:.1f}s on {summary['workers']} worker(s)")
+
+
+def main(argv):
+    csv_path = argv[0] if argv else 'new_blk8_cafe_sales_2024.csv'
+    step = int(argv[1]) if len(argv) > 1 else 7
+    workers = int(argv[2]) if len(argv) > 2 else None
+    model_dir = argv[3] if len(argv) > 3 else DEFAULT_MODEL_DIR
+    mode = argv[4] if len(argv) > 4 else 'refit'
+
+    print_report(*run_backtest(csv_path, step, workers, model_dir, mode))
+    print(f"Results saved to {BACKTEST_RESULTS_FILE} and {BACKTEST_HORIZON_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,37 @@
+"""
+Compare the tf.data input pipeline with plain NumPy arrays.
+
+Run from the training folder:
+    python benchmark_input_pipeline.py [epochs] [batch size]
+
+Trains the same network once per input path for a fixed number of epochs
+(early stopping still applies) and prints the first-epoch time (which also
+fills the tf.data cache), the average time of the remaining epochs and the
+training samples processed per second.
+"""
+import sys
+
+from train import SalesPredictionModel
+
+
+def main(argv):
+    epochs = int(argv[0]) if argv else 20
+    batch_size = int(argv[1]) if len(argv) > 1 else 32
+
+    results = {}
+    for pipeline in ('arrays', 'tfdata'):
+        predictor = SalesPredictionModel()
+        X, y = predictor.load_data("new_blk8_cafe_sales_2024.csv")
+        predictor.train_model(X, y, epochs=epochs, batch_size=batch_size, pipeline=pipeline)
+        results[pipeline] = predictor.metadata['epoch_timing']
+
+    print(f"\n{'pipeline':<10}{'1st epoch s':>14}{'mean epoch s':>14}{'samples/sec':>14}")
+    for pipeline, timing in results.items():
+        print(
+            f"{pipeline:<10}{timing['first_epoch_seconds']:>14.3f}"
+            f"{timing['mean_epoch_seconds']:>14.3f}{timing['mean_samples_per_sec']:>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,106 @@
+"""
+Compare the XGBoost backend with the Keras network.
+
+Run from the training folder:
+    python benchmark_xgboost.py [max MLP epochs] [xgboost threads]
+
+Trains both models on the same 80/20 split (same rows, same seed) and prints:
+- training time
+- prediction latency for batches of 1, 32, 1024 rows and the whole test set,
+  going through predict_frame like the web app does (median of a few runs)
+- MAE, RMSE and R² in pesos on the test rows
+"""
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from train import SalesPredictionModel
+from xgboost_model import XGBoostSalesModel
+from model_bundle import XGBoostPredictor
+from forecast_pipeline import predict_frame
+
+DATA_FILE = "new_blk8_cafe_sales_2024.csv"
+BATCH_SIZES = (1, 32, 1024, None)  # None: the whole test set
+REPEATS = 7
+
+
+def latency(model, scaler_X, scaler_y, X_test):
+    """Median milliseconds to predict one batch of each size"""
+    timings = {}
+    for batch_size in BATCH_SIZES:
+        batch = X_test if batch_size is None else X_test.iloc[:batch_size]
+        predict_frame(batch, model, scaler_X, scaler_y)  # warm-up
+        runs = []
+        for _ in range(REPEATS):
+            started = time.perf_counter()
+            predict_frame(batch, model, scaler_X, scaler_y)
+            runs.append(time.perf_counter() - started)
+        timings[len(batch)] = float(np.median(runs)) * 1000
+    return timings
+
+
+def accuracy(y_true, y_pred):
+    return {
+        'MAE': mean_absolute_error(y_true, y_pred),
+        'RMSE': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'R²': r2_score(y_true, y_pred)
+    }
+
+
+def run_mlp(X, y, epochs):
+    predictor = SalesPredictionModel()
+    started = time.perf_counter()
+    predictor.train_model(X, y, epochs=epochs, pipeline='arrays')
+    return predictor.model, predictor.scaler_X, predictor.scaler_y, time.perf_counter() - started
+
+
+def run_xgboost(X, y, n_threads):
+    predictor = XGBoostSalesModel(n_threads=n_threads)
+    started = time.perf_counter()
+    predictor.train_model(X, y)
+    seconds = time.perf_counter() - started
+    # Serve it the way build_model does, from the booster
+    model = XGBoostPredictor(predictor.model.get_booster(), n_threads)
+    return model, predictor.scaler_X, predictor.scaler_y, seconds
+
+
+def main(argv):
+    epochs = int(argv[0]) if argv else 200
+    n_threads = int(argv[1]) if len(argv) > 1 else None
+
+    X, y = SalesPredictionModel().load_data(DATA_FILE)
+    if X is None:
+        return 1
+    # Both models split with test_size=0.2 and random_state=42, so these are their test rows
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    results = {}
+    for name, run in (('keras mlp', lambda: run_mlp(X, y, epochs)),
+                      ('xgboost', lambda: run_xgboost(X, y, n_threads))):
+        model, scaler_X, scaler_y, seconds = run()
+        y_pred = predict_frame(X_test, model, scaler_X, scaler_y)
+        results[name] = {
+            'train_seconds': seconds,
+            'latency_ms': latency(model, scaler_X, scaler_y, X_test),
+            'metrics': accuracy(y_test.to_numpy(), y_pred)
+        }
+
+    print(f"\n{'model':<12}{'train s':>10}{'MAE':>10}{'RMSE':>10}{'R²':>10}")
+    for name, result in results.items():
+        metrics = result['metrics']
+        print(f"{name:<12}{result['train_seconds']:>10.2f}{metrics['MAE']:>10.2f}"
+              f"{metrics['RMSE']:>10.2f}{metrics['R²']:>10.4f}")
+
+    rows = list(next(iter(results.values()))['latency_ms'])
+    print(f"\nPrediction latency (ms, median of {REPEATS})")
+    print(f"{'model':<12}" + ''.join(f"{f'{n} rows':>12}" for n in rows))
+    for name, result in results.items():
+        print(f"{name:<12}" + ''.join(f"{ms:>12.2f}" for ms in result['latency_ms'].values()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,167 @@
+"""
+K-fold cross-validation with the folds trained at the same time.
+
+Run from the training folder:
+    python cross_validation.py [folds] [workers] [max epochs]
+or: python train.py --cv [folds]
+
+How it works:
+1. The data is loaded and scaled once, then placed in shared memory
+2. Every fold is trained in its own worker process (pinned to a slice of
+   cores, see worker_pool.py), reading the shared arrays instead of receiving
+   its own pickled copy
+3. Each fold keeps 20% of its training rows for early stopping and is scored
+   on its held-out fold in pesos (MAE, RMSE, R²)
+4. The fold scores are combined into a mean with a 95% confidence interval,
+   and the time each fold took is reported next to the total wall-clock time
+"""
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+
+from worker_pool import SharedArrays, spawn_pool
+
+CV_RESULTS_FILE = 'cross_validation.csv'
+CONFIDENCE = 0.95
+
+# Set in every worker by _init_worker
+_worker = {}
+
+
+def _init_worker(cores, descriptor, scaler_y, hyperparameters):
+    _worker.update({
+        'arrays': SharedArrays.attach(descriptor),
+        'scaler_y': scaler_y,
+        'hyperparameters': hyperparameters,
+        'cores': cores
+    })
+
+
+def run_fold(fold, train_index, test_index, epochs=200, batch_size=32):
+    """Train on one fold's training rows and score its held-out rows"""
+    import tensorflow as tf
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from train import SalesPredictionModel
+
+    started = time.perf_counter()
+    X, y = _worker['arrays']['X'], _worker['arrays']['y']
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X[train_index], y[train_index], test_size=0.2, random_state=42
+    )
+
+    model = SalesPredictionModel().create_model(X.shape[1], **_worker['hyperparameters'])
+    early_stopping = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=20, restore_best_weights=True
+    )
+    history = model.fit(
+        X_fit, y_fit, validation_data=(X_val, y_val),
+        epochs=epochs, batch_size=batch_size, callbacks=[early_stopping], verbose=0
+    )
+
+    scaler_y = _worker['scaler_y']
+    y_pred = scaler_y.inverse_transform(model.predict(X[test_index], verbose=0).reshape(-1, 1)).ravel()
+    y_true = scaler_y.inverse_transform(y[test_index].reshape(-1, 1)).ravel()
+
+    return {
+        'fold': fold,
+        'MAE': float(mean_absolute_error(y_true, y_pred)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'R²': float(r2_score(y_true, y_pred)),
+        'test_rows': len(test_index),
+        'epochs_run': len(history.epoch),
+        'seconds': round(time.perf_counter() - started, 2),
+        'cores': ','.join(str(core) for core in _worker['cores'])
+    }
+
+
+def confidence_interval(values, confidence=CONFIDENCE):
+    """Mean and half-width of the Student-t confidence interval of the fold scores"""
+    from scipy import stats
+
+    values = np.asarray(values, dtype=float)
+    mean = values.mean()
+    if len(values) < 2:
+        return mean, float('nan')
+    half_width = stats.t.ppf((1 + confidence) / 2, len(values) - 1) * values.std(ddof=1) / np.sqrt(len(values))
+    return mean, half_width
+
+
+def run_cross_validation(sales_predictor, X, y, folds=5, workers=None, epochs=200, batch_size=32,
+                         hyperparameters=None, results_file=CV_RESULTS_FILE):
+    """
+    Train the folds in parallel. Returns (per-fold DataFrame, summary dict);
+    the summary has mean and confidence half-width per metric plus timings.
+    """
+    X_scaled = sales_predictor.scaler_X.fit_transform(X).astype(np.float32)
+    y_scaled = sales_predictor.scaler_y.fit_transform(y.values.reshape(-1, 1)).ravel().astype(np.float32)
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=42).split(X_scaled))
+    workers = workers or min(folds, os.cpu_count() or 1)
+    print(f"Training {folds} folds on {workers} worker(s)...")
+
+    shared = SharedArrays.create({'X': X_scaled, 'y': y_scaled})
+    started = time.perf_counter()
+    results = []
+    try:
+        with spawn_pool(workers, initializer=_init_worker, initargs=(
+            shared.descriptor, sales_predictor.scaler_y, hyperparameters or {}
+        )) as pool:
+            futures = [
+                pool.submit(run_fold, fold, train_index, test_index, epochs, batch_size)
+                for fold, (train_index, test_index) in enumerate(splits, 1)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"Fold {result['fold']}: MAE ₱{result['MAE']:.2f}, R² {result['R²']:.3f} "
+                      f"({result['epochs_run']} epochs, {result['seconds']}s)")
+    finally:
+        shared.close()
+    wall_seconds = time.perf_counter() - started
+
+    fold_table = pd.DataFrame(results).sort_values('fold')
+    fold_table.to_csv(results_file, index=False)
+
+    summary = {'folds': folds, 'workers': workers, 'confidence': CONFIDENCE}
+    for metric in ('MAE', 'RMSE', 'R²'):
+        mean, half_width = confidence_interval(fold_table[metric])
+        summary[metric] = {'mean': float(mean), 'ci_half_width': float(half_width)}
+    summary['fold_seconds'] = float(fold_table['seconds'].sum())
+    summary['wall_seconds'] = round(wall_seconds, 2)
+    return fold_table, summary
+
+
+def print_summary(fold_table, summary):
+    print("\nCross-validation results:")
+    print(fold_table.to_string(index=False))
+    print(f"\nMean over {summary['folds']} folds ({summary['confidence']:.0%} confidence interval):")
+    for metric, unit in (('MAE', '₱'), ('RMSE', '₱'), ('R²', '')):
+        print(f"- {metric}: {unit}{summary[metric]['mean']:.3f} ± {summary[metric]['ci_half_width']:.3f}")
+    print(f"\nFolds took {summary['fold_seconds']:.1f}s in total, "
+          f"finished in {summary['wall_seconds']:.1f}s on {summary['workers']} worker(s)")
+
+
+def main(argv):
+    folds = int(argv[0]) if argv else 5
+    workers = int(argv[1]) if len(argv) > 1 else None
+    epochs = int(argv[2]) if len(argv) > 2 else 200
+
+    from train import SalesPredictionModel
+
+    sales_predictor = SalesPredictionModel()
+    X, y = sales_predictor.load_data("new_blk8_cafe_sales_2024.csv")
+    if X is None:
+        return 1
+
+    print_summary(*run_cross_validation(sales_predictor, X, y, folds, workers, epochs))
+    print(f"Per-fold results saved to {CV_RESULTS_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
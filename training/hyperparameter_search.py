@@ -0,0 +1,190 @@
+"""
+Search the network's hyperparameters in parallel.
+
+Run from the training folder:
+    python hyperparameter_search.py [trials] [workers] [max epochs]
+
+How it works:
+1. The data is loaded, scaled and split once (same splits as train.py)
+2. Configurations come from SEARCH_SPACE (every combination, or a random
+   sample of `trials` of them)
+3. A pool of worker processes trains them with early stopping. Every worker
+   gets its own slice of CPU cores: the process is pinned to those cores and
+   TensorFlow's intra-op threads are set to match, so workers do not fight
+   over the same cores
+4. Results go to search_leaderboard.csv, best first (lowest validation MAE).
+   Keras' val_loss includes the L2 penalty, which differs between
+   configurations, so it only drives early stopping
+5. The best network is evaluated on the test set and saved with save_model
+"""
+import os
+import sys
+import time
+import random
+import itertools
+from datetime import datetime, timezone
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+
+from worker_pool import spawn_pool
+
+# Every value to try for each create_model argument
+SEARCH_SPACE = {
+    'units': [(64, 32), (128, 64), (32, 16), (64, 32, 16)],
+    'dropout': [(0.3, 0.2), (0.2, 0.1), (0.1, 0.1)],
+    'l2': [0.001, 0.0001],
+    'learning_rate': [0.001, 0.003],
+    'decay_rate': [0.9, 0.97]
+}
+
+LEADERBOARD_FILE = 'search_leaderboard.csv'
+
+# Set in every worker by _init_worker
+_worker = {}
+
+
+def search_configs(space=SEARCH_SPACE, trials=None, seed=42):
+    """
+    Every combination of the search space, or `trials` of them picked at random.
+    Dropout rates are matched to the number of hidden layers.
+    """
+    names = list(space)
+    configs = []
+    for values in itertools.product(*(space[name] for name in names)):
+        config = dict(zip(names, values))
+        units, dropout = config['units'], config['dropout']
+        # Repeat the last dropout rate for deeper networks
+        config['dropout'] = tuple(dropout[min(i, len(dropout) - 1)] for i in range(len(units)))
+        if config not in configs:
+            configs.append(config)
+
+    if trials and trials < len(configs):
+        configs = random.Random(seed).sample(configs, trials)
+    return configs
+
+
+def _init_worker(cores, data):
+    """Keep the preprocessed arrays in every worker for all the trials it runs"""
+    _worker.update(data)
+    _worker['cores'] = cores
+
+
+def run_trial(config, epochs=200, batch_size=32):
+    """Train one configuration with early stopping; returns its scores and weights"""
+    import tensorflow as tf
+    from train import SalesPredictionModel
+
+    data = _worker
+    started = time.perf_counter()
+    predictor = SalesPredictionModel()
+    model = predictor.create_model(data['X_fit'].shape[1], **config)
+
+    early_stopping = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=20, restore_best_weights=True
+    )
+    history = model.fit(
+        data['X_fit'], data['y_fit'],
+        validation_data=(data['X_val'], data['y_val']),
+        epochs=epochs, batch_size=batch_size,
+        callbacks=[early_stopping], verbose=0
+    )
+
+    # Validation errors without the regularization penalty, with the best weights restored
+    scaler_y = data['scaler_y']
+    y_pred_scaled = model.predict(data['X_val'], verbose=0).ravel()
+    y_pred = scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).ravel()
+    y_true = scaler_y.inverse_transform(data['y_val'].reshape(-1, 1)).ravel()
+
+    return {
+        'config': config,
+        'val_mae': float(np.mean(np.abs(y_true - y_pred))),
+        'val_mse': float(np.mean((data['y_val'] - y_pred_scaled) ** 2)),
+        'val_loss': float(min(history.history['val_loss'])),
+        'epochs_run': len(history.epoch),
+        'seconds': round(time.perf_counter() - started, 2),
+        'cores': ','.join(str(core) for core in data['cores']),
+        'weights': model.get_weights()
+    }
+
+
+def run_search(X, y, sales_predictor, trials=None, workers=None, epochs=200, batch_size=32,
+               leaderboard_file=LEADERBOARD_FILE):
+    """
+    Evaluate configurations across a process pool and write the leaderboard.
+    Returns (leaderboard DataFrame, best result, test split).
+    """
+    X_fit, X_val, X_test, y_fit, y_val, y_test = sales_predictor.prepare_splits(X, y)
+    configs = search_configs(trials=trials)
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    print(f"Trying {len(configs)} configurations on {workers} worker(s)...")
+
+    data = {
+        'X_fit': X_fit, 'y_fit': y_fit, 'X_val': X_val, 'y_val': y_val,
+        'scaler_y': sales_predictor.scaler_y
+    }
+
+    results = []
+    # Every worker is pinned to its own slice of cores (see worker_pool.py)
+    with spawn_pool(workers, initializer=_init_worker, initargs=(data,)) as pool:
+        futures = [pool.submit(run_trial, config, epochs, batch_size) for config in configs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            print(f"[{done}/{len(configs)}] val MAE ₱{result['val_mae']:.2f} "
+                  f"({result['epochs_run']} epochs, {result['seconds']}s) {result['config']}")
+
+    results.sort(key=lambda result: result['val_mae'])
+    leaderboard = pd.DataFrame([
+        {**{k: v for k, v in result.items() if k not in ('config', 'weights')},
+         **{k: str(v) for k, v in result['config'].items()}}
+        for result in results
+    ])
+    leaderboard.insert(0, 'rank', range(1, len(leaderboard) + 1))
+    leaderboard.to_csv(leaderboard_file, index=False)
+    print(f"Leaderboard saved to {leaderboard_file}")
+
+    return leaderboard, results[0], (X_test, y_test)
+
+
+def main(argv):
+    trials = int(argv[0]) if argv else None
+    workers = int(argv[1]) if len(argv) > 1 else None
+    epochs = int(argv[2]) if len(argv) > 2 else 200
+
+    from train import SalesPredictionModel
+
+    sales_predictor = SalesPredictionModel()
+    X, y = sales_predictor.load_data("new_blk8_cafe_sales_2024.csv")
+    if X is None:
+        return 1
+
+    started = time.perf_counter()
+    leaderboard, best, (X_test, y_test) = run_search(X, y, sales_predictor, trials, workers, epochs)
+    print(f"\nSearch finished in {time.perf_counter() - started:.1f}s")
+    print(leaderboard.head(5).to_string(index=False))
+
+    # Rebuild the winner in this process from its trained weights
+    sales_predictor.model = sales_predictor.create_model(X_test.shape[1], **best['config'])
+    sales_predictor.model.set_weights(best['weights'])
+    sales_predictor.metadata.update({
+        'trained_at': datetime.now(timezone.utc).isoformat(),
+        'model_type': 'mlp',
+        'hyperparameters': best['config'],
+        'search': {'configurations': len(leaderboard), 'val_mae': best['val_mae'], 'val_mse': best['val_mse']},
+        'epochs_run': best['epochs_run']
+    })
+
+    performance = sales_predictor.evaluate_model(X_test, y_test)
+    print("\nBest Model Performance:")
+    print(f"- Average Error: ₱{performance['MAE']:.2f}")
+    print(f"- RMSE: ₱{performance['RMSE']:.2f}")
+    print(f"- R² Score: {performance['R²']:.3f}")
+
+    sales_predictor.save_model()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,338 @@
+"""
+tf.data input pipeline for training the sales model.
+
+Instead of handing whole NumPy arrays to model.fit, the training rows are:
+1. Written once as preprocessed (already scaled) shard files
+2. Read back shard by shard, in parallel
+3. Cached in memory after the first epoch
+4. Shuffled through a bounded buffer, batched and prefetched, so the next
+   batch is ready while the model trains on the current one
+
+EpochTimer logs how long every epoch takes and how many samples per second
+the model gets through, so different input paths can be compared.
+
+Out-of-core mode (for folders of monthly exports from many branches) never
+holds the whole dataset in memory:
+1. stream_statistics() reads the CSVs in chunks once and works out the
+   feature columns, the fill value for empty cells and the scaler statistics
+2. write_feature_shards() reads them again, fills, scales and splits every
+   chunk into train / validation / test shard files
+3. generator_dataset() feeds the shards to Keras one file at a time
+4. sample_shards() draws a bounded random sample of shard rows, for
+   statistics that need the values themselves (the drift profile)
+"""
+import os
+import time
+import glob
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.preprocessing import StandardScaler
+
+SHARD_ROWS = 2048          # Rows per shard file
+SHUFFLE_BUFFER = 4096      # Rows held by the shuffle buffer (bounds its memory use)
+CSV_CHUNK_ROWS = 100_000   # Rows read from a CSV at a time in out-of-core mode
+PROFILE_SAMPLE_ROWS = 100_000  # Rows sampled from the shards for the drift profile
+RESIDUAL_SAMPLE_ROWS = 100_000  # Test residuals kept (a uniform sample) for the interval quantiles
+
+TARGET = 'Total Sales'
+NON_FEATURE_COLUMNS = ['Date', 'Product Name']
+
+
+def write_shards(X, y, directory, shard_rows=SHARD_ROWS):
+    """
+    Save preprocessed features and targets as numbered .npz shard files.
+    Returns the shard paths in order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for old in glob.glob(os.path.join(directory, 'shard-*.npz')):
+        os.remove(old)
+
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32).reshape(-1)
+    paths = []
+    for number, start in enumerate(range(0, len(X), shard_rows)):
+        path = os.path.join(directory, f'shard-{number:05d}.npz')
+        np.savez(path, X=X[start:start + shard_rows], y=y[start:start + shard_rows])
+        paths.append(path)
+    return paths
+
+
+def read_shard(path):
+    with np.load(path.decode() if isinstance(path, bytes) else path) as shard:
+        return shard['X'], shard['y']
+
+
+def sample_shards(paths, n_rows, max_rows, seed=42):
+    """
+    A uniform random sample of at most max_rows rows (X, y) from shard files
+    holding n_rows rows in total, read one shard at a time
+    """
+    rng = np.random.default_rng(seed)
+    keep = min(max_rows / max(n_rows, 1), 1.0)
+    X_parts, y_parts = [], []
+    for path in paths:
+        X, y = read_shard(path)
+        rows = rng.random(len(X)) < keep
+        X_parts.append(X[rows])
+        y_parts.append(y[rows])
+    return np.concatenate(X_parts), np.concatenate(y_parts)
+
+
+def shard_dataset(paths, n_features, n_rows=None, batch_size=32, shuffle=True,
+                  shuffle_buffer=SHUFFLE_BUFFER, cache=True, seed=42):
+    """
+    Build the tf.data pipeline over shard files:
+    shards -> parallel read -> rows -> cache -> bounded shuffle -> batch -> prefetch
+
+    cache=True keeps decoded rows in memory after the first epoch; pass a file
+    path to cache on disk instead, or False to re-read the shards every epoch.
+    n_rows (the total row count) tells Keras the steps per epoch up front.
+    """
+    def load(path):
+        X, y = tf.numpy_function(read_shard, [path], (tf.float32, tf.float32))
+        X.set_shape([None, n_features])
+        y.set_shape([None])
+        return X, y
+
+    dataset = tf.data.Dataset.from_tensor_slices(list(paths))
+    dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    dataset = dataset.unbatch()
+    if n_rows is not None:
+        dataset = dataset.apply(tf.data.experimental.assert_cardinality(n_rows))
+
+    if cache is True:
+        dataset = dataset.cache()
+    elif cache:
+        dataset = dataset.cache(cache)
+
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def generator_dataset(paths, n_features, n_rows, batch_size=32, shuffle=True,
+                      shuffle_buffer=SHUFFLE_BUFFER, seed=42):
+    """
+    Stream shard files through a Python generator: only one shard plus the
+    shuffle buffer is in memory at a time. With shuffle=True the shard order
+    and the rows inside each shard are reshuffled every epoch.
+    """
+    rng = np.random.default_rng(seed)
+
+    def generate():
+        order = rng.permutation(len(paths)) if shuffle else range(len(paths))
+        for i in order:
+            X, y = read_shard(paths[i])
+            if shuffle:
+                rows = rng.permutation(len(X))
+                X, y = X[rows], y[rows]
+            yield X, y
+
+    dataset = tf.data.Dataset.from_generator(generate, output_signature=(
+        tf.TensorSpec(shape=(None, n_features), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32)
+    ))
+    dataset = dataset.unbatch().apply(tf.data.experimental.assert_cardinality(n_rows))
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def csv_paths(source):
+    """A single CSV file, or every CSV under a folder (sorted, so runs are repeatable)"""
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '**', '*.csv'), recursive=True))
+    return [source]
+
+
+def _iter_chunks(paths, chunk_rows):
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield chunk.drop(columns=NON_FEATURE_COLUMNS, errors='ignore')
+
+
+class _Moments:
+    """Running count, mean and sum of squared deviations, merged chunk by chunk (Chan et al.)"""
+
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def add(self, n, mean, m2):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+
+def _fitted_scaler(means, variances, n_rows, feature_names=None):
+    """A StandardScaler carrying the given statistics, as if fit() had seen every row"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(means, dtype=np.float64)
+    scaler.var_ = np.asarray(variances, dtype=np.float64)
+    scale = np.sqrt(scaler.var_)
+    # Same rule as scikit-learn: constant columns are left unscaled
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = int(n_rows)
+    scaler.n_features_in_ = len(scaler.mean_)
+    if feature_names is not None:
+        scaler.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    return scaler
+
+
+def stream_statistics(paths, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    One streaming pass over the CSVs. Returns a dict with:
+    - feature_names: every numeric column seen, in first-seen order (target excluded)
+    - fill_values: mean of each column's non-empty cells (what load_data fills gaps with)
+    - scaler_X / scaler_y: StandardScalers fitted to the filled data
+    - rows: total row count
+
+    A column missing from a whole file (e.g. a category that branch does not
+    sell) counts as 0 for those rows, like a one-hot column would.
+    """
+    columns = {}   # column -> [rows where the column exists, moments of its non-empty cells]
+    rows = 0
+    for chunk in _iter_chunks(paths, chunk_rows):
+        rows += len(chunk)
+        counts = chunk.count()
+        means = chunk.mean()
+        m2 = chunk.var(ddof=0) * counts
+        for column in chunk.columns:
+            present, moments = columns.setdefault(column, [0, _Moments()])
+            columns[column][0] = present + len(chunk)
+            moments.add(int(counts[column]), float(means[column]), float(np.nan_to_num(m2[column])))
+
+    if TARGET not in columns:
+        raise ValueError(f"No '{TARGET}' column found in {len(paths)} file(s)")
+
+    fill_values, filled_means, filled_vars = {}, {}, {}
+    for column, (present, moments) in columns.items():
+        fill_values[column] = moments.mean if moments.n else 0.0
+        filled = _Moments()
+        filled.add(moments.n, moments.mean, moments.m2)
+        # Empty cells are filled with the mean: more rows, no extra spread
+        filled.add(present - moments.n, fill_values[column], 0.0)
+        # Rows from files without this column are zeros
+        filled.add(rows - present, 0.0, 0.0)
+        filled_means[column] = filled.mean
+        filled_vars[column] = filled.m2 / rows
+
+    feature_names = [column for column in columns if column != TARGET]
+    return {
+        'feature_names': feature_names,
+        'fill_values': fill_values,
+        'scaler_X': _fitted_scaler(
+            [filled_means[c] for c in feature_names], [filled_vars[c] for c in feature_names],
+            rows, feature_names
+        ),
+        'scaler_y': _fitted_scaler([filled_means[TARGET]], [filled_vars[TARGET]], rows),
+        'rows': rows
+    }
+
+
+class _ShardWriter:
+    """Buffers rows for one split and writes a shard file every shard_rows rows"""
+
+    def __init__(self, directory, prefix, shard_rows):
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_rows = shard_rows
+        self.paths = []
+        self.rows = 0
+        self._X, self._y, self._buffered = [], [], 0
+
+    def add(self, X, y):
+        self._X.append(X)
+        self._y.append(y)
+        self._buffered += len(X)
+        while self._buffered >= self.shard_rows:
+            self._flush(self.shard_rows)
+
+    def _flush(self, count):
+        X, y = np.concatenate(self._X), np.concatenate(self._y)
+        path = os.path.join(self.directory, f'{self.prefix}-{len(self.paths):05d}.npz')
+        np.savez(path, X=X[:count], y=y[:count])
+        self.paths.append(path)
+        self.rows += count
+        self._X, self._y, self._buffered = [X[count:]], [y[count:]], len(X) - count
+
+    def close(self):
+        if self._buffered:
+            self._flush(self._buffered)
+        return self.paths
+
+
+def write_feature_shards(paths, stats, directory, test_size=0.2, validation_size=0.2,
+                         chunk_rows=CSV_CHUNK_ROWS, shard_rows=SHARD_ROWS, seed=42):
+    """
+    Second streaming pass: fill, scale and randomly split every chunk into
+    train / validation / test shards. validation_size is a share of the rows
+    left after the test split (same proportions as train_model).
+    Returns {split: {'paths': [...], 'rows': n}}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for old in glob.glob(os.path.join(directory, '*.npz')):
+        os.remove(old)
+
+    feature_names = stats['feature_names']
+    scaler_X, scaler_y = stats['scaler_X'], stats['scaler_y']
+    writers = {split: _ShardWriter(directory, split, shard_rows) for split in ('train', 'validation', 'test')}
+    rng = np.random.default_rng(seed)
+    validation_cut = test_size + (1 - test_size) * validation_size
+
+    for chunk in _iter_chunks(paths, chunk_rows):
+        chunk = chunk.fillna(stats['fill_values'])
+        X = scaler_X.transform(chunk.reindex(columns=feature_names, fill_value=0)).astype(np.float32)
+        y = scaler_y.transform(chunk[[TARGET]].to_numpy()).ravel().astype(np.float32)
+
+        draw = rng.random(len(chunk))
+        for split, rows in (
+            ('test', draw < test_size),
+            ('validation', (draw >= test_size) & (draw < validation_cut)),
+            ('train', draw >= validation_cut)
+        ):
+            writers[split].add(X[rows], y[rows])
+
+    return {split: {'paths': writer.close(), 'rows': writer.rows} for split, writer in writers.items()}
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """
+    Measures every epoch:
+    - Wall-clock seconds
+    - Training samples processed per second
+    The numbers are printed and kept in .epochs for the training metadata.
+    """
+
+    def __init__(self, samples_per_epoch, label='tf.data'):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.label = label
+        self.epochs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._started
+        samples_per_sec = self.samples_per_epoch / seconds if seconds > 0 else 0.0
+        self.epochs.append({'seconds': seconds, 'samples_per_sec': samples_per_sec})
+        print(f"[{self.label}] epoch {epoch + 1}: {seconds:.3f}s, {samples_per_sec:,.0f} samples/sec")
+
+    def summary(self):
+        """Average epoch time and throughput (the first epoch also fills the cache, so it is reported apart)"""
+        if not self.epochs:
+            return {}
+        steady = self.epochs[1:] or self.epochs
+        return {
+            'first_epoch_seconds': round(self.epochs[0]['seconds'], 4),
+            'mean_epoch_seconds': round(float(np.mean([e['seconds'] for e in steady])), 4),
+            'mean_samples_per_sec': round(float(np.mean([e['samples_per_sec'] for e in steady])), 1)
+        }
@@ -0,0 +1,200 @@
+"""
+Train one model per category or per high-volume product, in parallel.
+
+Run from the training folder:
+    python segment_models.py [category|product] [min rows] [workers] [max epochs]
+
+How it works:
+1. The data is loaded and scaled once with the global scalers, then the
+   feature matrix is placed in shared memory
+2. Every segment (a category from the Category_* columns, or a product with
+   at least `min rows` rows) trains its own network in a worker process,
+   reading only its rows from the shared matrix
+3. A global network is trained in the same pool on every row outside the
+   segments' held-out rows, so each segment model is compared with a global
+   model that has not seen its test rows either (the saved
+   sales_prediction_model was trained on the same file). A segment model is
+   kept only if it does better on its held-out rows
+4. Kept models are saved as bundles under segment_models/<kind>/<name>/, and
+   segment_models/index.json tells the web app (backend/segment_router.py)
+   which products and categories have their own model
+"""
+import os
+import re
+import sys
+import json
+import time
+from datetime import datetime, timezone
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from worker_pool import SharedArrays, spawn_pool
+
+SEGMENTS_DIR = 'segment_models'
+CATEGORY_PREFIX = 'Category_'
+
+# Set in every worker by _init_worker
+_worker = {}
+
+
+def _init_worker(cores, descriptor, scaler_y):
+    _worker.update({'arrays': SharedArrays.attach(descriptor), 'scaler_y': scaler_y})
+
+
+def slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'segment'
+
+
+def find_segments(df, kind, min_rows):
+    """Row positions of every segment: {name: array of row numbers}"""
+    if kind == 'category':
+        columns = [c for c in df.columns if c.startswith(CATEGORY_PREFIX)]
+        segments = {c[len(CATEGORY_PREFIX):]: np.flatnonzero(df[c].fillna(0).to_numpy() > 0) for c in columns}
+    elif kind == 'product':
+        segments = {name: np.asarray(rows) for name, rows in df.groupby('Product Name').indices.items()}
+    else:
+        raise ValueError(f"Unknown segment kind: {kind}")
+    return {name: rows for name, rows in segments.items() if len(rows) >= min_rows}
+
+
+def train_segment(name, train_rows, epochs=200, batch_size=32):
+    """Train one segment's network on its rows of the shared matrix; returns its weights"""
+    import tensorflow as tf
+    from train import SalesPredictionModel
+
+    started = time.perf_counter()
+    X, y = _worker['arrays']['X'][train_rows], _worker['arrays']['y'][train_rows]
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    model = SalesPredictionModel().create_model(X.shape[1])
+    early_stopping = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=20, restore_best_weights=True
+    )
+    history = model.fit(
+        X_fit, y_fit, validation_data=(X_val, y_val),
+        epochs=epochs, batch_size=batch_size, callbacks=[early_stopping], verbose=0
+    )
+    return {
+        'name': name,
+        'weights': model.get_weights(),
+        'epochs_run': len(history.epoch),
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def train_segments(file_path, kind='category', min_rows=300, workers=None, epochs=200, batch_size=32,
+                   output_dir=SEGMENTS_DIR):
+    """Train every segment in a process pool and save the ones that beat a global model on their test rows"""
+    from train import SalesPredictionModel
+
+    sales_predictor = SalesPredictionModel()
+    X, y = sales_predictor.load_data(file_path)
+    df = pd.read_csv(file_path)
+    segments = find_segments(df, kind, min_rows)
+    if not segments:
+        print(f"No {kind} has at least {min_rows} rows")
+        return {}
+
+    X_scaled = sales_predictor.scaler_X.fit_transform(X).astype(np.float32)
+    y_scaled = sales_predictor.scaler_y.fit_transform(y.values.reshape(-1, 1)).ravel().astype(np.float32)
+    y_actual = y.to_numpy()
+
+    # Same 80/20 split inside every segment; test rows are scored by both models
+    splits = {
+        name: train_test_split(rows, test_size=0.2, random_state=42) for name, rows in segments.items()
+    }
+    # The global baseline (name None) trains on everything but the segments' test rows
+    held_out = np.unique(np.concatenate([test_rows for _, test_rows in splits.values()]))
+    global_rows = np.setdiff1d(np.arange(len(X_scaled)), held_out)
+
+    workers = workers or min(len(segments) + 1, os.cpu_count() or 1)
+    print(f"Training {len(segments)} {kind} models and a global baseline on {workers} worker(s)...")
+    shared = SharedArrays.create({'X': X_scaled, 'y': y_scaled})
+    started = time.perf_counter()
+    results = {}
+    try:
+        with spawn_pool(workers, initializer=_init_worker,
+                        initargs=(shared.descriptor, sales_predictor.scaler_y)) as pool:
+            futures = [pool.submit(train_segment, None, global_rows, epochs, batch_size)] + [
+                pool.submit(train_segment, name, train_rows, epochs, batch_size)
+                for name, (train_rows, _) in splits.items()
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['name']] = result
+    finally:
+        shared.close()
+
+    def predictions(weights, rows):
+        model = sales_predictor.create_model(X_scaled.shape[1])
+        model.set_weights(weights)
+        y_pred = sales_predictor.scaler_y.inverse_transform(
+            model.predict(X_scaled[rows], verbose=0).reshape(-1, 1)
+        ).ravel()
+        return model, y_pred
+
+    _, y_global = predictions(results[None]['weights'], held_out)
+    y_global = pd.Series(y_global, index=held_out)
+
+    index = {}
+    for name, (train_rows, test_rows) in splits.items():
+        result = results[name]
+        model, y_pred = predictions(result['weights'], test_rows)
+        mae = float(np.mean(np.abs(y_actual[test_rows] - y_pred)))
+        global_mae = float(np.mean(np.abs(y_actual[test_rows] - y_global[test_rows].to_numpy())))
+
+        kept = mae < global_mae
+        print(f"{name}: MAE ₱{mae:.2f} vs global ₱{global_mae:.2f} "
+              f"({result['epochs_run']} epochs, {result['seconds']}s) -> {'kept' if kept else 'global'}")
+        if not kept:
+            continue
+
+        directory = os.path.join(kind, slug(name))
+        sales_predictor.model = model
+        sales_predictor.metadata = {
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'model_type': 'mlp',
+            'segment': {'kind': kind, 'name': name},
+            'training_rows': int(len(train_rows)),
+            'epochs_run': result['epochs_run'],
+            'metrics': {'MAE': mae, 'global_MAE': global_mae}
+        }
+        # The segment's own rows and test errors, for the drift checks and intervals of the rows routed to it
+        sales_predictor.record_training_profile(X.iloc[train_rows])
+        sales_predictor.record_test_errors(y_actual[test_rows], y_pred)
+        sales_predictor.save_model(os.path.join(output_dir, directory), legacy_files=False)
+        index[name] = {
+            'dir': directory, 'version': sales_predictor.version,
+            'rows': int(len(segments[name])), 'mae': mae, 'global_mae': global_mae
+        }
+
+    # Keep the other kind's entries so category and product models can be used together
+    index_path = os.path.join(output_dir, 'index.json')
+    full_index = {}
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            full_index = json.load(f)
+    full_index[kind] = index
+    os.makedirs(output_dir, exist_ok=True)
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(full_index, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{len(index)} of {len(segments)} {kind} models kept "
+          f"({time.perf_counter() - started:.1f}s); index saved to {index_path}")
+    return index
+
+
+def main(argv):
+    kind = argv[0] if argv else 'category'
+    min_rows = int(argv[1]) if len(argv) > 1 else 300
+    workers = int(argv[2]) if len(argv) > 2 else None
+    epochs = int(argv[3]) if len(argv) > 3 else 200
+    train_segments("new_blk8_cafe_sales_2024.csv", kind, min_rows, workers, epochs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,53 +1,32 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import tensorflow as tf
-import seaborn as sns
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.base import BaseEstimator, RegressorMixin
-from sklearn.inspection import permutation_importance
 import joblib
 import os
-
-class KerasRegressor(BaseEstimator, RegressorMixin):
-    """
-    A bridge between Keras neural networks and scikit-learn's tools.
-    This wrapper lets us use Keras models with scikit-learn functions.
-    """
-    
-    def __init__(self, model=None, scaler_X=None, scaler_y=None):
-        """
-        Initialize with:
-        - model: The Keras neural network
-        - scaler_X: Tool to normalize input features
-        - scaler_y: Tool to normalize sales amounts
-        """
-        self.model = model
-        self.scaler_X = scaler_X
-        self.scaler_y = scaler_y
-    
-    def fit(self, X, y):
-        """Required by scikit-learn (not used here since we train separately)"""
-        return self
-    
-    def predict(self, X):
-        """
-        Make sales predictions:
-        1. Adjusts input numbers to same scale used in training
-        2. Uses neural network to predict
-        3. Converts prediction back to real money amounts
-        """
-        X_scaled = self.scaler_X.transform(X)
-        y_pred_scaled = self.model.predict(X_scaled).flatten()
-        y_pred = self.scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
-        return y_pred
-    
-    def score(self, X, y_true):
-        """Calculates how accurate predictions are (R² score)"""
-        y_pred = self.predict(X)
-        return r2_score(y_true, y_pred)
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+# The bundle format lives with the web app so both sides read and write the same file
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from model_bundle import BUNDLE_FILENAME, write_bundle, read_bundle
+from feature_importance import permutation_importance
+from prediction_intervals import residual_quantiles
+from drift_monitor import feature_profile
+from input_pipeline import (
+    write_shards, shard_dataset, generator_dataset, csv_paths, stream_statistics,
+    write_feature_shards, read_shard, sample_shards, EpochTimer, PROFILE_SAMPLE_ROWS,
+    RESIDUAL_SAMPLE_ROWS
+)
+from time_features import add_time_features
+from visualizations import (
+    DEFAULT_DPI, plot_metrics, plot_training_history, plot_predictions, plot_feature_importance,
+    run_stage
+)
 
 class SalesPredictionModel:
     """
@@ -72,18 +51,28 @@ class SalesPredictionModel:
         self.model = None    # Will hold our trained network
         self.feature_names = None  # Will remember what each input means
         self.history = None  # Will remember training progress
+        self.metadata = {}   # Training details stored in the model bundle
+        self.version = None  # Bundle version of the saved/loaded model
 
-    def load_data(self, file_path):
+    def load_data(self, file_path, time_features=False):
         """
         Prepare sales data for training:
         1. Load from CSV file
-        2. Keep only number columns
-        3. Fill empty spots with averages
-        4. Separate inputs from sales amounts
+        2. Optionally add each product's past sales (lags, rolling
+           averages) and day-of-week/month columns (see time_features.py)
+        3. Keep only number columns
+        4. Fill empty spots with averages
+        5. Separate inputs from sales amounts
         """
         try:
             # Load and clean data
             df = pd.read_csv(file_path)
+            # Where the training data ends, so backtests can stay out of sample
+            dates = pd.to_datetime(df['Date'], format='%d/%m/%Y', dayfirst=True, errors='coerce')
+            self.metadata['training_data_end'] = dates.max().strftime('%Y-%m-%d')
+            if time_features:
+                df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', dayfirst=True)
+                df = add_time_features(df)
             df_numeric = df.drop(columns=['Date', 'Product Name'])
             df_numeric = df_numeric.fillna(df_numeric.mean())
 
@@ -93,13 +82,29 @@ class SalesPredictionModel:
             # Separate features (X) and target (y)
             X = df_numeric.drop(columns=['Total Sales'])
             y = df_numeric['Total Sales']
+            self.record_training_profile(X)
 
             return X, y
         except Exception as e:
             print(f"Error loading data: {e}")
             return None, None
 
-    def create_model(self, input_shape, learning_rate=0.001):
+    def record_training_profile(self, X):
+        """
+        Remember how every feature of the training data is distributed
+        (quantile bins), so uploads can be checked for drift against it
+        """
+        self.metadata['feature_profile'] = feature_profile(X)
+
+    def record_test_errors(self, y_true, y_pred):
+        """
+        Remember the spread of the test-set errors in pesos (quantiles),
+        used for the prediction intervals around served forecasts
+        """
+        self.metadata['residual_quantiles'] = residual_quantiles(y_true, y_pred)
+
+    def create_model(self, input_shape, learning_rate=0.001, units=(64, 32), dropout=(0.3, 0.2),
+                     l2=0.001, decay_steps=100, decay_rate=0.9):
         """
         Build the brain of our system - the neural network:
         - Input layer: Receives the data
@@ -110,23 +115,25 @@ class SalesPredictionModel:
         - Output: Predicts the sales amount
         
         Uses smart learning rate that adjusts automatically
+
+        Layer sizes, dropout rates, L2 strength and the learning rate schedule
+        can be changed (hyperparameter_search.py tries different ones); the
+        defaults are the original network.
         """
-        model = tf.keras.Sequential([
-            tf.keras.layers.Input(shape=(input_shape,)),
-            tf.keras.layers.Dense(64, activation='relu', 
-                                 kernel_regularizer=tf.keras.regularizers.l2(0.001)),
-            tf.keras.layers.BatchNormalization(),
-            tf.keras.layers.Dropout(0.3),
-            tf.keras.layers.Dense(32, activation='relu', 
-                                 kernel_regularizer=tf.keras.regularizers.l2(0.001)),
-            tf.keras.layers.BatchNormalization(),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(1)  # Final sales prediction
-        ])
+        layers = [tf.keras.layers.Input(shape=(input_shape,))]
+        for layer_units, layer_dropout in zip(units, dropout):
+            layers += [
+                tf.keras.layers.Dense(layer_units, activation='relu', 
+                                     kernel_regularizer=tf.keras.regularizers.l2(l2)),
+                tf.keras.layers.BatchNormalization(),
+                tf.keras.layers.Dropout(layer_dropout)
+            ]
+        layers.append(tf.keras.layers.Dense(1))  # Final sales prediction
+        model = tf.keras.Sequential(layers)
 
         # Learning rate that automatically decreases over time
         lr_schedule = tf.keras.optimizers.schedules.ExponentialDecay(
-            learning_rate, decay_steps=100, decay_rate=0.9, staircase=True
+            learning_rate, decay_steps=decay_steps, decay_rate=decay_rate, staircase=True
         )
 
         # Configure the model's learning process
@@ -136,14 +143,12 @@ class SalesPredictionModel:
 
         return model
 
-    def train_model(self, X, y, test_size=0.2, epochs=200, batch_size=32):
+    def prepare_splits(self, X, y, test_size=0.2):
         """
-        Teach the model to predict sales:
-        1. Adjust all numbers to similar scales
-        2. Split data into training and test sets
-        3. Build the neural network structure
-        4. Train with automatic stopping if not improving
-        5. Remember training progress for analysis
+        Fit the scalers and split the scaled data once:
+        - 20% (test_size) held out for testing
+        - 20% of the rest held out for validation
+        Returns X_fit, X_val, X_test, y_fit, y_val, y_test
         """
         # Scale all numbers to be consistent
         X_scaled = self.scaler_X.fit_transform(X)
@@ -154,55 +159,258 @@ class SalesPredictionModel:
             X_scaled, y_scaled, test_size=test_size, random_state=42
         )
 
+        # Hold out 20% of training for validation, computed once instead of by Keras on every fit
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train, test_size=0.2, random_state=42
+        )
+        return X_fit, X_val, X_test, y_fit, y_val, y_test
+
+    def train_model(self, X, y, test_size=0.2, epochs=200, batch_size=32,
+                    pipeline='tfdata', shard_dir=None, hyperparameters=None):
+        """
+        Teach the model to predict sales:
+        1. Adjust all numbers to similar scales
+        2. Split data into training, validation and test sets (once)
+        3. Build the neural network structure
+        4. Train with automatic stopping if not improving
+        5. Remember training progress and speed for analysis
+
+        pipeline='tfdata' streams the training rows from preprocessed shard
+        files through tf.data (see input_pipeline.py); pipeline='arrays' hands
+        the NumPy arrays straight to Keras like before. Shards go to shard_dir,
+        or to a temporary folder that is removed afterwards. hyperparameters
+        are passed on to create_model.
+        """
+        if pipeline not in ('tfdata', 'arrays'):
+            raise ValueError(f"Unknown input pipeline: {pipeline}")
+
+        # Scale, then split into training, validation and test sets
+        X_fit, X_val, X_test, y_fit, y_val, y_test = self.prepare_splits(X, y, test_size)
+
         # Create the neural network structure
-        self.model = self.create_model(X_train.shape[1])
+        self.model = self.create_model(X_fit.shape[1], **(hyperparameters or {}))
         
         # Set up early stopping to prevent over-training
         early_stopping = tf.keras.callbacks.EarlyStopping(
             monitor='val_loss', patience=20, restore_best_weights=True
         )
+        timer = EpochTimer(len(X_fit), label=pipeline)
+
+        temporary_shards = shard_dir is None
+        if pipeline == 'tfdata':
+            shard_dir = shard_dir or tempfile.mkdtemp(prefix='sales-shards-')
+            train_data = shard_dataset(
+                write_shards(X_fit, y_fit, shard_dir), X_fit.shape[1], n_rows=len(X_fit),
+                batch_size=batch_size
+            )
+            val_data = (
+                tf.data.Dataset.from_tensor_slices((X_val.astype(np.float32), y_val.astype(np.float32)))
+                .batch(batch_size).cache().prefetch(tf.data.AUTOTUNE)
+            )
+            fit_args = {'x': train_data, 'validation_data': val_data}
+        else:
+            fit_args = {'x': X_fit, 'y': y_fit, 'validation_data': (X_val, y_val), 'batch_size': batch_size}
 
-        # Train the model (this is where learning happens)
-        history = self.model.fit(
-            X_train, y_train, 
-            validation_split=0.2,  # Use 20% of training for validation
-            epochs=epochs,         # Maximum training cycles
-            batch_size=batch_size, # Data processed in chunks
-            callbacks=[early_stopping], 
-            verbose=1
-        )
+        try:
+            # Train the model (this is where learning happens)
+            history = self.model.fit(
+                **fit_args,
+                epochs=epochs,         # Maximum training cycles
+                callbacks=[early_stopping, timer], 
+                verbose=1
+            )
+        finally:
+            if pipeline == 'tfdata' and temporary_shards:
+                shutil.rmtree(shard_dir, ignore_errors=True)
         
         # Remember training details for charts
         self.history = history
 
+        # Remember training details for the model bundle
+        self.metadata.update({
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'model_type': 'mlp',
+            'training_rows': int(X_fit.shape[0]),
+            'validation_rows': int(X_val.shape[0]),
+            'test_size': test_size,
+            'epochs': epochs,
+            'epochs_run': len(history.epoch),
+            'batch_size': batch_size,
+            'input_pipeline': pipeline,
+            'hyperparameters': hyperparameters or {},
+            'epoch_timing': timer.summary()
+        })
+
         return history, X_test, y_test
 
-    def save_model(self, directory='sales_prediction_model'):
+    def train_out_of_core(self, source, shard_dir='training_shards', test_size=0.2, epochs=200,
+                          batch_size=32):
+        """
+        Train on data too big for memory (a CSV file or a folder of CSVs):
+        1. One streaming pass works out feature columns, fill values and scalers
+        2. A second pass writes scaled train / validation / test shards to shard_dir
+        3. The network trains from the shards through a generator, one file at a time
+
+        Returns the training history and the test shard paths (see evaluate_shards).
+        """
+        paths = csv_paths(source)
+        if not paths:
+            raise ValueError(f"No CSV files found in {source}")
+
+        print(f"Reading statistics from {len(paths)} file(s)...")
+        stats = stream_statistics(paths)
+        self.feature_names = stats['feature_names']
+        self.scaler_X = stats['scaler_X']
+        self.scaler_y = stats['scaler_y']
+
+        print(f"Writing feature shards for {stats['rows']:,} rows to {shard_dir}...")
+        splits = write_feature_shards(paths, stats, shard_dir, test_size=test_size)
+        train, validation = splits['train'], splits['validation']
+        n_features = len(self.feature_names)
+
+        # Create the neural network structure
+        self.model = self.create_model(n_features)
+
+        early_stopping = tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss', patience=20, restore_best_weights=True
+        )
+        timer = EpochTimer(train['rows'], label='out-of-core')
+
+        history = self.model.fit(
+            generator_dataset(train['paths'], n_features, train['rows'], batch_size=batch_size),
+            validation_data=generator_dataset(
+                validation['paths'], n_features, validation['rows'], batch_size=batch_size, shuffle=False
+            ),
+            epochs=epochs,
+            callbacks=[early_stopping, timer],
+            verbose=1
+        )
+        self.history = history
+
+        self.metadata.update({
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'model_type': 'mlp',
+            'input_pipeline': 'out_of_core',
+            'source_files': len(paths),
+            'training_rows': train['rows'],
+            'validation_rows': validation['rows'],
+            'test_rows': splits['test']['rows'],
+            'test_size': test_size,
+            'epochs': epochs,
+            'epochs_run': len(history.epoch),
+            'batch_size': batch_size,
+            'fill_values': {k: float(v) for k, v in stats['fill_values'].items()},
+            'epoch_timing': timer.summary()
+        })
+        # Profiled from a sample: the training rows only exist as scaled shards
+        sample = sample_shards(train['paths'], train['rows'], PROFILE_SAMPLE_ROWS)[0].astype(np.float64)
+        self.record_training_profile(
+            pd.DataFrame(self.scaler_X.inverse_transform(sample), columns=self.feature_names).round(9)
+        )
+
+        return history, splits['test']['paths']
+
+    def evaluate_shards(self, paths):
+        """
+        Same metrics as evaluate_model, computed shard by shard so the test
+        set never has to fit in memory. The residual quantiles come from a
+        uniform sample of at most RESIDUAL_SAMPLE_ROWS test rows: each residual
+        gets a random key and the smallest keys are kept.
+        """
+        n = abs_error = sq_error = y_sum = y_sq_sum = 0.0
+        rng = np.random.default_rng(42)
+        residuals, keys = np.empty(0), np.empty(0)
+        for path in paths:
+            X, y_scaled = read_shard(path)
+            y_pred_scaled = self.model.predict(X, verbose=0).reshape(-1, 1).astype(np.float64)
+            y_pred = self.scaler_y.inverse_transform(y_pred_scaled).ravel()
+            y_true = self.scaler_y.inverse_transform(y_scaled.reshape(-1, 1).astype(np.float64)).ravel()
+            n += len(y_true)
+            abs_error += np.abs(y_true - y_pred).sum()
+            sq_error += np.square(y_true - y_pred).sum()
+            y_sum += y_true.sum()
+            y_sq_sum += np.square(y_true).sum()
+            residuals = np.concatenate([residuals, y_true - y_pred])
+            keys = np.concatenate([keys, rng.random(len(y_true))])
+            if len(residuals) > RESIDUAL_SAMPLE_ROWS:
+                rows = np.argpartition(keys, RESIDUAL_SAMPLE_ROWS)[:RESIDUAL_SAMPLE_ROWS]
+                residuals, keys = residuals[rows], keys[rows]
+
+        total_variation = y_sq_sum - y_sum * y_sum / n
+        metrics = {
+            'MAE': abs_error / n,
+            'RMSE': np.sqrt(sq_error / n),
+            'R²': 1 - sq_error / total_variation
+        }
+        self.metadata['metrics'] = {k: float(v) for k, v in metrics.items()}
+        self.record_test_errors(residuals, np.zeros_like(residuals))
+        return metrics
+
+    def cross_validate(self, X, y, folds=5, workers=None, epochs=200, batch_size=32, hyperparameters=None):
+        """
+        Score the network with k-fold cross-validation instead of one split:
+        - every fold trains at the same time in its own worker process
+        - returns per-fold scores and the mean of each metric with a 95% confidence interval
+        See cross_validation.py for details.
+        """
+        from cross_validation import run_cross_validation
+
+        fold_table, summary = run_cross_validation(
+            self, X, y, folds=folds, workers=workers, epochs=epochs,
+            batch_size=batch_size, hyperparameters=hyperparameters
+        )
+        self.metadata['cross_validation'] = summary
+        return fold_table, summary
+
+    def save_model(self, directory='sales_prediction_model', legacy_files=True):
         """
         Save everything needed to reuse the model later:
-        - Trained neural network
-        - Data scaling information
-        - Feature names for reference
+        - One bundle file (sales_model.spmb) with the network, scaling
+          information, feature names, training details and a checksum
+        - The older separate files too, unless legacy_files is False
+        Warns when the drift profile or error quantiles were never recorded.
         """
+        missing = [key for key in ('feature_profile', 'residual_quantiles') if key not in self.metadata]
+        if missing:
+            print(f"Warning: saving without {', '.join(missing)} (see record_training_profile / record_test_errors)")
+
         os.makedirs(directory, exist_ok=True)
-        self.model.save(os.path.join(directory, 'keras_model.keras'))
-        joblib.dump(self.scaler_X, os.path.join(directory, 'scaler_X.joblib'))
-        joblib.dump(self.scaler_y, os.path.join(directory, 'scaler_y.joblib'))
+        header = write_bundle(
+            os.path.join(directory, BUNDLE_FILENAME), self.model, self.scaler_X, self.scaler_y,
+            self.feature_names, metadata=self.metadata
+        )
+        self.version = header['model_version']
 
-        # Save feature names so we remember what each input means
-        with open(os.path.join(directory, 'feature_names.txt'), 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.feature_names))
+        if legacy_files:
+            self.model.save(os.path.join(directory, 'keras_model.keras'))
+            joblib.dump(self.scaler_X, os.path.join(directory, 'scaler_X.joblib'))
+            joblib.dump(self.scaler_y, os.path.join(directory, 'scaler_y.joblib'))
 
-        print(f"Model saved to {directory}")
+            # Save feature names so we remember what each input means
+            with open(os.path.join(directory, 'feature_names.txt'), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.feature_names))
+
+        print(f"Model {self.version} saved to {directory}")
 
     def load_model(self, directory='sales_prediction_model'):
         """
         Load a previously saved model:
-        - Neural network structure
-        - Scaling tools
-        - Feature information
+        - From the bundle file when there is one
+        - Otherwise from the separate network, scaler and feature files
         """
         try:
+            bundle_path = os.path.join(directory, BUNDLE_FILENAME)
+            if os.path.exists(bundle_path):
+                bundle = read_bundle(bundle_path)
+                self.model = bundle.build_model()
+                self.scaler_X = bundle.scaler_X
+                self.scaler_y = bundle.scaler_y
+                self.feature_names = bundle.feature_names
+                self.metadata = dict(bundle.metadata)
+                self.version = bundle.version
+                print(f"Model {self.version} loaded from {bundle_path}")
+                return True
+
             self.model = tf.keras.models.load_model(os.path.join(directory, 'keras_model.keras'), compile=True)
             self.scaler_X = joblib.load(os.path.join(directory, 'scaler_X.joblib'))
             self.scaler_y = joblib.load(os.path.join(directory, 'scaler_y.joblib'))
@@ -237,7 +445,10 @@ class SalesPredictionModel:
         rmse = np.sqrt(mse)
         r2 = r2_score(y_test_original, y_pred)
 
-        return {'MAE': mae, 'RMSE': rmse, 'R²': r2}
+        metrics = {'MAE': mae, 'RMSE': rmse, 'R²': r2}
+        self.metadata['metrics'] = {k: float(v) for k, v in metrics.items()}
+        self.record_test_errors(y_test_original, y_pred)
+        return metrics
 
     def predict_sales(self, input_features):
         """
@@ -264,107 +475,31 @@ class SalesPredictionModel:
 
         return prediction[0]  # Return single prediction
     
-    def visualize_metrics(self, metrics_dict, save_dir='model_visualizations'):
+    def predict_scenarios(self, base, ranges, df, top=10):
+        """
+        Predict sales for a whole grid of what-if scenarios at once:
+        - base: one scenario, like the input of predict_sales
+        - ranges: values to try per lever, e.g. {'Discount Applied (%)': {'min': 0, 'max': 30, 'steps': 31}}
+        - df: sales data (like the training CSV); Units Sold follows the levers along its demand response
+        - Returns every prediction plus the best combinations (see backend/scenarios.py)
+        """
+        from scenarios import SCENARIO_LEVERS, score_scenarios
+        from promotion_optimizer import demand_response
+        slopes = dict(zip(SCENARIO_LEVERS, demand_response(df, SCENARIO_LEVERS)))
+        return score_scenarios(base, ranges, self.model, self.scaler_X, self.scaler_y, self.feature_names,
+                               slopes=slopes, top=top)
+
+    def visualize_metrics(self, metrics_dict, save_dir='model_visualizations', dpi=DEFAULT_DPI):
         """
-        Create easy-to-understand charts showing model performance:
-        - Bar chart for error amounts
-        - Gauge meter for R² score
-        - Radar chart comparing metrics
-        - Summary explanation
+        Create easy-to-understand charts showing model performance
+        (error bars, R² gauge, radar chart and a summary, see visualizations.py)
         
         Saves as PNG image to specified folder
         """
-        os.makedirs(save_dir, exist_ok=True)
-        
-        # Create figure with multiple subplots
-        fig = plt.figure(figsize=(18, 10))
-        
-        # 1. Bar chart for error metrics
-        ax1 = fig.add_subplot(221)
-        error_metrics = {'MAE': metrics_dict['MAE'], 'RMSE': metrics_dict['RMSE']}
-        
-        bars = ax1.bar(error_metrics.keys(), error_metrics.values(), 
-                      color=['#3498db', '#e74c3c'], width=0.6)
-        ax1.set_title('Error Metrics', fontsize=14, fontweight='bold')
-        ax1.set_ylabel('Value (₱)', fontsize=12)
-        
-        # Add value labels on bars
-        for bar in bars:
-            height = bar.get_height()
-            ax1.text(bar.get_x() + bar.get_width()/2., height + 5,
-                    f'{height:.2f}', ha='center', fontsize=10)
-        
-        # 2. Gauge chart for R² score
-        ax2 = fig.add_subplot(222, polar=True)
-        r2_value = metrics_dict['R²']
-        
-        # Create color zones
-        theta = np.linspace(0.1, 1.9*np.pi, 100)
-        ax2.set_theta_direction(-1)
-        ax2.set_theta_zero_location('N')
-        
-        # Add colored arcs
-        for i, (start, end) in enumerate(zip([0, 0.3, 0.7], [0.3, 0.7, 1])):
-            ax2.bar(np.pi, end-start, width=1.8*np.pi, bottom=start, 
-                   color=['#f39c12', '#f1c40f', '#2ecc71'][i], alpha=0.7)
-        
-        # Add needle pointer
-        needle_angle = np.pi + 0.9*np.pi * (1 - r2_value)
-        ax2.plot([0, 0.8 * np.cos(needle_angle)], [0, 0.8 * np.sin(needle_angle)], 'k-', lw=2)
-        ax2.plot([0], [0], 'ko', markersize=8)
-        
-        # Add quality labels
-        ax2.text(np.pi+0.9*np.pi*0.85, 0.15, 'Excellent', ha='center', fontsize=10)
-        ax2.text(np.pi+0.9*np.pi*0.5, 0.15, 'Good', ha='center', fontsize=10)
-        ax2.text(np.pi+0.9*np.pi*0.15, 0.15, 'Poor', ha='center', fontsize=10)
-        
-        # 3. Metrics comparison radar chart
-        ax3 = fig.add_subplot(223, polar=True)
-        
-        # Normalize metrics for comparison
-        max_error = max(metrics_dict['MAE'], metrics_dict['RMSE'])
-        normalized_metrics = {
-            'R²': metrics_dict['R²'],
-            'MAE': 1 - (metrics_dict['MAE'] / max_error),
-            'RMSE': 1 - (metrics_dict['RMSE'] / max_error)
-        }
-        
-        # Plot radar
-        categories = list(normalized_metrics.keys())
-        values = list(normalized_metrics.values()) + [normalized_metrics['R²']]  # Close loop
-        
-        angles = [n / len(categories) * 2 * np.pi for n in range(len(categories))] + [0]
-        ax3.plot(angles, values, 'o-', linewidth=2)
-        ax3.fill(angles, values, alpha=0.25)
-        ax3.set_title('Normalized Performance Metrics', fontsize=14, fontweight='bold')
-        
-        # 4. Text summary
-        ax4 = fig.add_subplot(224)
-        ax4.axis('off')
-        
-        # Create interpretation text
-        mae_desc = f"MAE: {metrics_dict['MAE']:.2f} ₱\nAverage prediction error"
-        rmse_desc = f"RMSE: {metrics_dict['RMSE']:.2f} ₱\nPenalizes large errors more"
-        
-        if metrics_dict['R²'] >= 0.7:
-            r2_desc = f"R²: {metrics_dict['R²']:.3f}\nExcellent! Explains {metrics_dict['R²']*100:.1f}% of variation"
-        elif metrics_dict['R²'] >= 0.3:
-            r2_desc = f"R²: {metrics_dict['R²']:.3f}\nGood. Explains {metrics_dict['R²']*100:.1f}% of variation"
-        else:
-            r2_desc = f"R²: {metrics_dict['R²']:.3f}\nNeeds improvement. Explains {metrics_dict['R²']*100:.1f}%"
-        
-        summary_text = f"MODEL PERFORMANCE\n\n{mae_desc}\n\n{rmse_desc}\n\n{r2_desc}"
-        ax4.text(0.5, 0.5, summary_text, ha='center', va='center', fontsize=12,
-                bbox=dict(boxstyle="round", facecolor='#f8f9fa', alpha=0.7))
-        
-        # Save complete visualization
-        plt.tight_layout()
-        plt.savefig(os.path.join(save_dir, 'model_metrics.png'), dpi=300)
-        plt.close()
-        
+        plot_metrics(metrics_dict, save_dir, dpi)
         print(f"Saved metrics visualization to {save_dir}")
 
-    def visualize_training_history(self, history=None, save_dir='model_visualizations'):
+    def visualize_training_history(self, history=None, save_dir='model_visualizations', dpi=DEFAULT_DPI):
         """
         Create training progress charts:
         - Loss over time (MSE)
@@ -379,41 +514,18 @@ class SalesPredictionModel:
         if history is None:
             print("No training history available")
             return
-            
-        os.makedirs(save_dir, exist_ok=True)
-        
-        # Create figure with two side-by-side charts
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-        
-        # Loss chart
-        ax1.plot(history.history['loss'], label='Training', color='#3498db')
-        ax1.plot(history.history['val_loss'], label='Validation', color='#e74c3c')
-        ax1.set_title('Model Loss Over Time')
-        ax1.set_ylabel('Loss (MSE)')
-        ax1.legend()
-        
-        # MAE chart
-        ax2.plot(history.history['mae'], label='Training', color='#2ecc71')
-        ax2.plot(history.history['val_mae'], label='Validation', color='#9b59b6')
-        ax2.set_title('Prediction Error Over Time')
-        ax2.set_ylabel('MAE')
-        ax2.legend()
-        
-        # Mark early stopping if used
-        if len(history.epoch) < history.params['epochs']:
-            stop_epoch = len(history.epoch) - 1
-            for ax in (ax1, ax2):
-                ax.axvline(stop_epoch, color='red', linestyle='--', alpha=0.5)
-                ax.text(stop_epoch, ax.get_ylim()[0]*1.1, 'Early Stop', 
-                       color='red', rotation=90, va='bottom')
-        
-        plt.tight_layout()
-        plt.savefig(os.path.join(save_dir, 'training_history.png'), dpi=300)
-        plt.close()
-        
+
+        plot_training_history(history.history, history.params['epochs'], save_dir, dpi)
         print(f"Saved training history to {save_dir}")
 
-    def visualize_predictions(self, X_test, y_test, save_dir='model_visualizations'):
+    def test_predictions(self, X_test, y_test):
+        """Actual and predicted sales for the (scaled) test set, both in pesos"""
+        y_pred_scaled = self.model.predict(X_test, verbose=0).flatten()
+        y_pred = self.scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
+        y_true = self.scaler_y.inverse_transform(y_test.reshape(-1, 1)).flatten()
+        return y_true, y_pred
+
+    def visualize_predictions(self, X_test, y_test, save_dir='model_visualizations', dpi=DEFAULT_DPI):
         """
         Create prediction accuracy plot:
         - Actual vs predicted values
@@ -422,116 +534,115 @@ class SalesPredictionModel:
         
         Shows how close predictions are to reality
         """
-        os.makedirs(save_dir, exist_ok=True)
-        
-        # Get predictions in original units
-        y_pred_scaled = self.model.predict(X_test).flatten()
-        y_pred = self.scaler_y.inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
-        y_true = self.scaler_y.inverse_transform(y_test.reshape(-1, 1)).flatten()
-        
-        # Create scatter plot
-        plt.figure(figsize=(10, 8))
-        plt.scatter(y_true, y_pred, color='#3498db', alpha=0.6, s=80)
-        
-        # Add perfect prediction line
-        min_val = min(min(y_true), min(y_pred))
-        max_val = max(max(y_true), max(y_pred))
-        plt.plot([min_val, max_val], [min_val, max_val], 'r--')
-        
-        # Add labels and R²
-        plt.xlabel('Actual Sales (₱)')
-        plt.ylabel('Predicted Sales (₱)')
-        plt.title('Prediction Accuracy')
-        
-        r2 = r2_score(y_true, y_pred)
-        plt.text(min_val*1.05, max_val*0.9, f'R² = {r2:.3f}', 
-                bbox=dict(facecolor='white', alpha=0.8))
-        
-        plt.grid(True, linestyle='--', alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(os.path.join(save_dir, 'predictions_vs_actual.png'), dpi=300)
-        plt.close()
-        
+        plot_predictions(*self.test_predictions(X_test, y_test), save_dir, dpi)
         print(f"Saved prediction plot to {save_dir}")
 
 
-def feature_importance_plot(model, X, y, feature_names, n_repeats=10, 
-                          random_state=42, save_dir='model_visualizations'):
+def feature_importance_table(model, X, y, feature_names, n_repeats=10, random_state=42):
     """
-    Determine and visualize which factors most influence predictions:
+    Determine which factors most influence predictions:
     - Tests how much shuffling each feature reduces accuracy
-    - Creates horizontal bar chart
     - Includes variability measures
-    
-    Returns DataFrame with importance scores
+
+    Returns DataFrame with importance scores, most important first
     """
-    os.makedirs(save_dir, exist_ok=True)
-    
-    # Set up model for scikit-learn compatibility
-    keras_reg = KerasRegressor(
-        model=model.model,
-        scaler_X=model.scaler_X,
-        scaler_y=model.scaler_y
-    )
-    
-    # Calculate importance by testing each feature
+    # Shuffle every feature n_repeats times and score all copies in a few large batches
     result = permutation_importance(
-        keras_reg, X, y, 
+        model.model, model.scaler_X, model.scaler_y, X, y,
         n_repeats=n_repeats,  # Number of shuffle tests per feature
-        random_state=random_state,
-        n_jobs=-1  # Use all CPU cores
+        random_state=random_state
     )
     
     # Organize results
-    importance_df = pd.DataFrame({
+    return pd.DataFrame({
         'Feature': feature_names,
         'Importance': result.importances_mean,
         'Variability': result.importances_std
     }).sort_values('Importance', ascending=False)
+
+
+def feature_importance_plot(model, X, y, feature_names, n_repeats=10, 
+                          random_state=42, save_dir='model_visualizations', dpi=DEFAULT_DPI):
+    """
+    Determine and visualize which factors most influence predictions
+    (feature_importance_table plus a horizontal bar chart)
     
-    # Create visualization
-    plt.figure(figsize=(12, 8))
-    
-    # Plot bars with error ranges
-    plt.barh(
-        importance_df['Feature'], 
-        importance_df['Importance'], 
-        xerr=importance_df['Variability'],
-        color='#3498db', 
-        alpha=0.7
-    )
-    
-    plt.xlabel('Importance (Higher = More Impact)')
-    plt.title('Which Factors Most Affect Sales Predictions?')
-    plt.tight_layout()
-    
-    plt.savefig(os.path.join(save_dir, 'feature_importance.png'), dpi=300)
-    plt.close()
-    
+    Returns DataFrame with importance scores
+    """
+    importance_df = feature_importance_table(model, X, y, feature_names, n_repeats, random_state)
+    plot_feature_importance(importance_df, save_dir, dpi)
     print(f"Saved feature importance to {save_dir}")
     return importance_df
 
 
-def main():
+def create_visualizations(sales_predictor, performance, history, X_test=None, y_test=None,
+                          X=None, y=None, dpi=DEFAULT_DPI, workers=None, save_dir='model_visualizations'):
+    """
+    Visualization stage, run once the model is saved:
+    1. Work out what needs the model (test predictions, feature importance)
+    2. Draw all charts at the same time in a separate process
+       (see visualizations.py)
+
+    The prediction chart needs X_test / y_test and the importance chart X / y;
+    charts without their data are left out.
+    Returns the feature importance table (None without X / y).
+    """
+    charts = {
+        'metrics': (performance,),
+        'training_history': (history.history, history.params['epochs'])
+    }
+    if X_test is not None:
+        charts['predictions'] = sales_predictor.test_predictions(X_test, y_test)
+
+    importance_df = None
+    if X is not None:
+        importance_df = feature_importance_table(sales_predictor, X, y, sales_predictor.feature_names)
+        charts['feature_importance'] = (importance_df,)
+
+    run_stage(charts, save_dir, dpi, workers)
+    return importance_df
+
+
+def main_out_of_core(source, dpi=DEFAULT_DPI, visualize=True):
+    """
+    Out-of-core workflow for a folder of exports (python train.py --out-of-core <folder>):
+    train from on-disk shards, evaluate shard by shard, save the model, then the charts.
+    """
+    sales_predictor = SalesPredictionModel()
+
+    print("\nTraining model (out-of-core)...")
+    history, test_paths = sales_predictor.train_out_of_core(source)
+
+    performance = sales_predictor.evaluate_shards(test_paths)
+    print("\nModel Performance:")
+    print(f"- Average Error: ₱{performance['MAE']:.2f}")
+    print(f"- RMSE: ₱{performance['RMSE']:.2f}")
+    print(f"- R² Score: {performance['R²']:.3f}")
+
+    sales_predictor.save_model()
+
+    if visualize:
+        print("\nCreating visualizations...")
+        create_visualizations(sales_predictor, performance, history, dpi=dpi)
+
+
+def main(dpi=DEFAULT_DPI, visualize=True, time_features=False):
     """
     Complete workflow example:
     1. Load and prepare data
     2. Train model
     3. Evaluate performance
-    4. Create visualizations
-    5. Save model
+    4. Save model
+    5. Create visualizations (in parallel, skipped with visualize=False)
     6. Demonstrate prediction
     """
     # Initialize system
     sales_predictor = SalesPredictionModel()
     
     # Load and prepare data
-    X, y = sales_predictor.load_data("new_blk8_cafe_sales_2024.csv")
+    X, y = sales_predictor.load_data("new_blk8_cafe_sales_2024.csv", time_features=time_features)
 
     if X is not None and y is not None:
-        # Create output folder
-        os.makedirs('model_visualizations', exist_ok=True)
-        
         # Train model
         print("\nTraining model...")
         history, X_test, y_test = sales_predictor.train_model(X, y)
@@ -542,22 +653,18 @@ def main():
         print(f"- Average Error: ₱{performance['MAE']:.2f}")
         print(f"- RMSE: ₱{performance['RMSE']:.2f}")
         print(f"- R² Score: {performance['R²']:.3f}")
-        
-        # Create visualizations
-        print("\nCreating visualizations...")
-        sales_predictor.visualize_metrics(performance)
-        sales_predictor.visualize_training_history(history)
-        sales_predictor.visualize_predictions(X_test, y_test)
-        
-        # Show important features
-        importance_df = feature_importance_plot(
-            sales_predictor, X, y, sales_predictor.feature_names
-        )
-        print("\nTop 5 Important Features:")
-        print(importance_df.head(5).to_string(index=False))
 
-        # Save model for later
+        # Save model first, so the charts never hold it up
         sales_predictor.save_model()
+
+        if visualize:
+            # Create visualizations and show important features
+            print("\nCreating visualizations...")
+            importance_df = create_visualizations(
+                sales_predictor, performance, history, X_test, y_test, X, y, dpi=dpi
+            )
+            print("\nTop 5 Important Features:")
+            print(importance_df.head(5).to_string(index=False))
         
         # Demonstrate loading and prediction
         print("\nTesting saved model...")
@@ -582,7 +689,41 @@ def main():
         predicted_sales = loaded_model.predict_sales(example_input)
         print(f"\nPredicted Sales for Example: ₱{predicted_sales:.2f}")
         
-        print("\nAll visualizations saved to 'model_visualizations' folder")
+        if visualize:
+            print("\nAll visualizations saved to 'model_visualizations' folder")
+
+
+def command_options(argv):
+    """
+    Pull the optional flags out of the command line:
+    --dpi N sets the chart resolution, --no-plots skips the charts,
+    --time-features adds lag, rolling and calendar features.
+    Returns (remaining arguments, dpi, visualize, time_features)
+    """
+    argv = list(argv)
+    dpi, visualize, time_features = DEFAULT_DPI, True, False
+    if '--no-plots' in argv:
+        argv.remove('--no-plots')
+        visualize = False
+    if '--time-features' in argv:
+        argv.remove('--time-features')
+        time_features = True
+    if '--dpi' in argv:
+        position = argv.index('--dpi')
+        dpi = int(argv[position + 1])
+        del argv[position:position + 2]
+    return argv, dpi, visualize, time_features
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python train.py [--dpi N] [--no-plots] [--time-features] [--out-of-core <folder> | --cv [args] | --backtest [args]]
+    argv, dpi, visualize, time_features = command_options(sys.argv[1:])
+    if len(argv) > 1 and argv[0] == '--out-of-core':
+        main_out_of_core(argv[1], dpi, visualize)
+    elif argv and argv[0] == '--cv':
+        from cross_validation import main as cross_validation_main
+        sys.exit(cross_validation_main(argv[1:]))
+    elif argv and argv[0] == '--backtest':
+        from backtesting import main as backtesting_main
+        sys.exit(backtesting_main(argv[1:]))
+    else:
+        main(dpi, visualize, time_features)
\ No newline at end of file
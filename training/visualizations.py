@@ -0,0 +1,326 @@
+"""
+Training charts, drawn as a separate stage after the model is saved.
+
+Used by train.py (python train.py [--dpi N] [--no-plots]), or run from the
+training folder to redraw the last run's charts without training again:
+    python visualizations.py [chart data file] [dpi] [workers]
+
+How it works:
+1. Everything that needs the model (test set predictions, permutation
+   importance) is worked out in the training process and saved to
+   model_visualizations/chart_data.joblib
+2. This script then runs in its own process, so neither TensorFlow nor the
+   training process is involved in drawing, and draws each chart in its own
+   worker process with matplotlib's Agg backend (no display needed)
+3. The DPI can be lowered for quick runs (300 is print quality), or the
+   whole stage skipped with --no-plots so retraining is never held up by it;
+   a failed chart is reported but does not fail the training run
+
+Each plot_* function can also be called directly to draw one chart in the
+current process.
+"""
+import os
+import sys
+import time
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+DEFAULT_DPI = 300
+SAVE_DIR = 'model_visualizations'
+CHART_DATA_FILE = 'chart_data.joblib'
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_metrics(metrics_dict, save_dir=SAVE_DIR, dpi=DEFAULT_DPI):
+    """
+    Create easy-to-understand charts showing model performance:
+    - Bar chart for error amounts
+    - Gauge meter for R² score
+    - Radar chart comparing metrics
+    - Summary explanation
+    """
+    plt = _pyplot()
+    os.makedirs(save_dir, exist_ok=True)
+
+    # Create figure with multiple subplots
+    fig = plt.figure(figsize=(18, 10))
+
+    # 1. Bar chart for error metrics
+    ax1 = fig.add_subplot(221)
+    error_metrics = {'MAE': metrics_dict['MAE'], 'RMSE': metrics_dict['RMSE']}
+
+    bars = ax1.bar(error_metrics.keys(), error_metrics.values(),
+                  color=['#3498db', '#e74c3c'], width=0.6)
+    ax1.set_title('Error Metrics', fontsize=14, fontweight='bold')
+    ax1.set_ylabel('Value (₱)', fontsize=12)
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        ax1.text(bar.get_x() + bar.get_width()/2., height + 5,
+                f'{height:.2f}', ha='center', fontsize=10)
+
+    # 2. Gauge chart for R² score
+    ax2 = fig.add_subplot(222, polar=True)
+    r2_value = metrics_dict['R²']
+
+    ax2.set_theta_direction(-1)
+    ax2.set_theta_zero_location('N')
+
+    # Add colored arcs
+    for i, (start, end) in enumerate(zip([0, 0.3, 0.7], [0.3, 0.7, 1])):
+        ax2.bar(np.pi, end-start, width=1.8*np.pi, bottom=start,
+               color=['#f39c12', '#f1c40f', '#2ecc71'][i], alpha=0.7)
+
+    # Add needle pointer
+    needle_angle = np.pi + 0.9*np.pi * (1 - r2_value)
+    ax2.plot([0, 0.8 * np.cos(needle_angle)], [0, 0.8 * np.sin(needle_angle)], 'k-', lw=2)
+    ax2.plot([0], [0], 'ko', markersize=8)
+
+    # Add quality labels
+    ax2.text(np.pi+0.9*np.pi*0.85, 0.15, 'Excellent', ha='center', fontsize=10)
+    ax2.text(np.pi+0.9*np.pi*0.5, 0.15, 'Good', ha='center', fontsize=10)
+    ax2.text(np.pi+0.9*np.pi*0.15, 0.15, 'Poor', ha='center', fontsize=10)
+
+    # 3. Metrics comparison radar chart
+    ax3 = fig.add_subplot(223, polar=True)
+
+    # Normalize metrics for comparison
+    max_error = max(metrics_dict['MAE'], metrics_dict['RMSE'])
+    normalized_metrics = {
+        'R²': metrics_dict['R²'],
+        'MAE': 1 - (metrics_dict['MAE'] / max_error),
+        'RMSE': 1 - (metrics_dict['RMSE'] / max_error)
+    }
+
+    # Plot radar
+    categories = list(normalized_metrics.keys())
+    values = list(normalized_metrics.values()) + [normalized_metrics['R²']]  # Close loop
+
+    angles = [n / len(categories) * 2 * np.pi for n in range(len(categories))] + [0]
+    ax3.plot(angles, values, 'o-', linewidth=2)
+    ax3.fill(angles, values, alpha=0.25)
+    ax3.set_title('Normalized Performance Metrics', fontsize=14, fontweight='bold')
+
+    # 4. Text summary
+    ax4 = fig.add_subplot(224)
+    ax4.axis('off')
+
+    # Create interpretation text
+    mae_desc = f"MAE: {metrics_dict['MAE']:.2f} ₱\nAverage prediction error"
+    rmse_desc = f"RMSE: {metrics_dict['RMSE']:.2f} ₱\nPenalizes large errors more"
+
+    if metrics_dict['R²'] >= 0.7:
+        r2_desc = f"R²: {metrics_dict['R²']:.3f}\nExcellent! Explains {metrics_dict['R²']*100:.1f}% of variation"
+    elif metrics_dict['R²'] >= 0.3:
+        r2_desc = f"R²: {metrics_dict['R²']:.3f}\nGood. Explains {metrics_dict['R²']*100:.1f}% of variation"
+    else:
+        r2_desc = f"R²: {metrics_dict['R²']:.3f}\nNeeds improvement. Explains {metrics_dict['R²']*100:.1f}%"
+
+    summary_text = f"MODEL PERFORMANCE\n\n{mae_desc}\n\n{rmse_desc}\n\n{r2_desc}"
+    ax4.text(0.5, 0.5, summary_text, ha='center', va='center', fontsize=12,
+            bbox=dict(boxstyle="round", facecolor='#f8f9fa', alpha=0.7))
+
+    # Save complete visualization
+    path = os.path.join(save_dir, 'model_metrics.png')
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi)
+    plt.close()
+    return path
+
+
+def plot_training_history(history, max_epochs, save_dir=SAVE_DIR, dpi=DEFAULT_DPI):
+    """
+    Create training progress charts from a Keras history dict (History.history):
+    - Loss over time (MSE)
+    - Error over time (MAE)
+    - Marks early stopping point (fewer epochs run than max_epochs)
+    """
+    plt = _pyplot()
+    os.makedirs(save_dir, exist_ok=True)
+
+    # Create figure with two side-by-side charts
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+
+    # Loss chart
+    ax1.plot(history['loss'], label='Training', color='#3498db')
+    ax1.plot(history['val_loss'], label='Validation', color='#e74c3c')
+    ax1.set_title('Model Loss Over Time')
+    ax1.set_ylabel('Loss (MSE)')
+    ax1.legend()
+
+    # MAE chart
+    ax2.plot(history['mae'], label='Training', color='#2ecc71')
+    ax2.plot(history['val_mae'], label='Validation', color='#9b59b6')
+    ax2.set_title('Prediction Error Over Time')
+    ax2.set_ylabel('MAE')
+    ax2.legend()
+
+    # Mark early stopping if used
+    epochs_run = len(history['loss'])
+    if epochs_run < max_epochs:
+        stop_epoch = epochs_run - 1
+        for ax in (ax1, ax2):
+            ax.axvline(stop_epoch, color='red', linestyle='--', alpha=0.5)
+            ax.text(stop_epoch, ax.get_ylim()[0]*1.1, 'Early Stop',
+                   color='red', rotation=90, va='bottom')
+
+    path = os.path.join(save_dir, 'training_history.png')
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi)
+    plt.close()
+    return path
+
+
+def plot_predictions(y_true, y_pred, save_dir=SAVE_DIR, dpi=DEFAULT_DPI):
+    """
+    Create prediction accuracy plot (values in pesos):
+    - Actual vs predicted values
+    - Perfect prediction line
+    - R² score displayed
+    """
+    from sklearn.metrics import r2_score
+
+    plt = _pyplot()
+    os.makedirs(save_dir, exist_ok=True)
+
+    # Create scatter plot
+    plt.figure(figsize=(10, 8))
+    plt.scatter(y_true, y_pred, color='#3498db', alpha=0.6, s=80)
+
+    # Add perfect prediction line
+    min_val = min(min(y_true), min(y_pred))
+    max_val = max(max(y_true), max(y_pred))
+    plt.plot([min_val, max_val], [min_val, max_val], 'r--')
+
+    # Add labels and R²
+    plt.xlabel('Actual Sales (₱)')
+    plt.ylabel('Predicted Sales (₱)')
+    plt.title('Prediction Accuracy')
+
+    r2 = r2_score(y_true, y_pred)
+    plt.text(min_val*1.05, max_val*0.9, f'R² = {r2:.3f}',
+            bbox=dict(facecolor='white', alpha=0.8))
+
+    path = os.path.join(save_dir, 'predictions_vs_actual.png')
+    plt.grid(True, linestyle='--', alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi)
+    plt.close()
+    return path
+
+
+def plot_feature_importance(importance_df, save_dir=SAVE_DIR, dpi=DEFAULT_DPI):
+    """
+    Horizontal bar chart of the permutation importance table
+    (Feature, Importance, Variability columns) with variability as error bars
+    """
+    plt = _pyplot()
+    os.makedirs(save_dir, exist_ok=True)
+
+    plt.figure(figsize=(12, 8))
+
+    # Plot bars with error ranges
+    plt.barh(
+        importance_df['Feature'],
+        importance_df['Importance'],
+        xerr=importance_df['Variability'],
+        color='#3498db',
+        alpha=0.7
+    )
+
+    plt.xlabel('Importance (Higher = More Impact)')
+    plt.title('Which Factors Most Affect Sales Predictions?')
+    plt.tight_layout()
+
+    path = os.path.join(save_dir, 'feature_importance.png')
+    plt.savefig(path, dpi=dpi)
+    plt.close()
+    return path
+
+
+CHARTS = {
+    'metrics': plot_metrics,
+    'training_history': plot_training_history,
+    'predictions': plot_predictions,
+    'feature_importance': plot_feature_importance
+}
+
+
+def _draw(name, args, save_dir, dpi):
+    started = time.perf_counter()
+    path = CHARTS[name](*args, save_dir=save_dir, dpi=dpi)
+    return name, path, time.perf_counter() - started
+
+
+def render_charts(charts, save_dir=SAVE_DIR, dpi=DEFAULT_DPI, workers=None):
+    """
+    Draw several charts at once. charts is {chart name: args} using the
+    names in CHARTS, e.g. {'metrics': (performance,)}; the args must be
+    plain data (dicts, arrays, DataFrames) since they go to other processes.
+    workers=0 draws them one after another in this process.
+    Returns {chart name: saved file}.
+    """
+    started = time.perf_counter()
+    saved = {}
+    if workers == 0:
+        results = [_draw(name, args, save_dir, dpi) for name, args in charts.items()]
+    else:
+        workers = workers or min(len(charts), os.cpu_count() or 1)
+        # Spawned, not forked, in case this is a process with TensorFlow threads running
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_draw, name, args, save_dir, dpi) for name, args in charts.items()]
+            results = [future.result() for future in as_completed(futures)]
+
+    for name, path, seconds in results:
+        print(f"Saved {name} chart to {path} ({seconds:.1f}s)")
+        saved[name] = path
+    print(f"Drew {len(saved)} charts at {dpi} dpi in {time.perf_counter() - started:.1f}s")
+    return saved
+
+
+def run_stage(charts, save_dir=SAVE_DIR, dpi=DEFAULT_DPI, workers=None):
+    """
+    Save the chart data and draw the charts in a separate process
+    (python visualizations.py ...). Returns True when every chart was drawn.
+    """
+    import joblib
+
+    os.makedirs(save_dir, exist_ok=True)
+    data_path = os.path.join(save_dir, CHART_DATA_FILE)
+    joblib.dump(charts, data_path)
+
+    command = [sys.executable, os.path.abspath(__file__), data_path, str(dpi)]
+    if workers is not None:
+        command.append(str(workers))
+    finished = subprocess.run(command)
+    if finished.returncode != 0:
+        print(f"Charts were not all drawn (exit code {finished.returncode}); "
+              f"redraw them with: python visualizations.py {data_path}")
+    return finished.returncode == 0
+
+
+def main(argv):
+    import joblib
+
+    data_path = argv[0] if argv else os.path.join(SAVE_DIR, CHART_DATA_FILE)
+    dpi = int(argv[1]) if len(argv) > 1 else DEFAULT_DPI
+    workers = int(argv[2]) if len(argv) > 2 else None
+
+    charts = joblib.load(data_path)
+    render_charts(charts, os.path.dirname(data_path) or '.', dpi, workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,118 @@
+"""
+Helpers for training several models at once in worker processes.
+
+- core_slices(): split the available CPU cores into one group per worker
+- pin_worker(): pin a worker to its cores and size TensorFlow's thread pools
+  to match (call it before TensorFlow starts any threads)
+- SharedArrays: put NumPy arrays in shared memory once, so every worker reads
+  the same copy instead of receiving its own pickled one
+- spawn_pool(): a process pool whose workers each take one core slice
+"""
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def core_slices(workers):
+    """Split the CPU cores this process may use into one group per worker"""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    if workers >= len(cores):
+        # More workers than cores: one core each, shared round-robin
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    return [[int(core) for core in part] for part in np.array_split(cores, workers)]
+
+
+def pin_worker(cores):
+    """Pin this process to cores and give TensorFlow one intra-op thread per core"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(len(cores))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _init_pool_worker(slices, initializer, initargs):
+    cores = slices.get()
+    pin_worker(cores)
+    if initializer:
+        initializer(cores, *initargs)
+
+
+def spawn_pool(workers, initializer=None, initargs=()):
+    """
+    A ProcessPoolExecutor with spawned (not forked) workers, so each one starts
+    TensorFlow with its own thread settings. Every worker is pinned to its own
+    core slice, then runs initializer(cores, *initargs).
+
+    The slices travel in a plain queue handed to the workers as they start
+    (no Manager process that would outlive the pool).
+    """
+    context = multiprocessing.get_context('spawn')
+    slices = context.Queue()
+    for cores in core_slices(workers):
+        slices.put(cores)
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=context,
+        initializer=_init_pool_worker, initargs=(slices, initializer, initargs)
+    )
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays in shared memory.
+
+    The creating process calls SharedArrays.create({...}) and passes
+    .descriptor (names, shapes, dtypes, a few bytes) to the workers, which
+    call SharedArrays.attach(descriptor) to get read-only views without
+    copying. The creator calls close() when the workers are done.
+    """
+
+    def __init__(self, blocks, arrays, owner):
+        self._blocks = blocks
+        self.arrays = arrays
+        self._owner = owner
+
+    @classmethod
+    def create(cls, arrays):
+        blocks, views = {}, {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            blocks[name], views[name] = block, view
+        return cls(blocks, views, owner=True)
+
+    @property
+    def descriptor(self):
+        return {
+            name: (self._blocks[name].name, array.shape, array.dtype.str)
+            for name, array in self.arrays.items()
+        }
+
+    @classmethod
+    def attach(cls, descriptor):
+        # Spawned workers share the creator's resource tracker, so attaching
+        # here does not make the block go away when a worker exits
+        blocks, views = {}, {}
+        for name, (block_name, shape, dtype) in descriptor.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            view.flags.writeable = False
+            blocks[name], views[name] = block, view
+        return cls(blocks, views, owner=False)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self):
+        self.arrays = {}
+        for block in self._blocks.values():
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = {}